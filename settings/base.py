@@ -138,11 +138,15 @@ DATE_INPUT_FORMATS = ['%d/%m/%y', '%Y/%m/%d']
 # STATIC_URL = '/static/'
 
 # Project settings
-# xml schema file defines what a valid export xml file looks like
-# XML_SCHEMA_VER defines which schemas are supported
+# xml schema file defines what a valid export xml file looks like. Each schema version is kept in
+# files/ted_schema, e.g. 'R2.0.9.S03.E01' in files/ted_schema/R2_0_9_S03_E01
+# SUPPORTED_SCHEMAS defines which schemas are supported
 # https://publications.europa.eu/en/web/eu-vocabularies/tedschemas
 XML_SCHEMA_FILE_NAME = 'TED_EXPORT.xsd'
 SUPPORTED_SCHEMAS = ['R2.0.9.S02.E01', 'R2.0.9.S03.E01']
+# If XML_PARSER_HUGE_TREE is True, TED xml files are parsed without libxml2's limits on the depth
+# of the tree and the size of text nodes. Only needed for exceptionally large notices
+XML_PARSER_HUGE_TREE = False
 
 # XML schema defines date str as (20yymmdd -- where 20yy = year, mm = month, dd = day)
 # Converted to python `datetime` format
@@ -161,6 +165,90 @@ TARGET_CONTRACT_NATURE_CODE = '2' # Supplies
 TED_FTP_ROOT = 'ftp.ted.europa.eu'
 TED_FTP_USERNAME = 'guest'
 TED_FTP_PASSWORD = 'guest'
+# Maximum number of ftp connections opened at the same time when backfilling daily packages. This is
+# also the number of idle logged in sessions kept for reuse by `tasks.ftp.FTP_SESSION_POOL`
+TED_FTP_MAX_CONNECTIONS = 3
+# Idle ftp sessions are checked with a NOOP before reuse if idle for longer than TED_FTP_KEEPALIVE
+TED_FTP_KEEPALIVE = 30 # seconds
+# Daily package folder listings are cached using the default cache
+TED_FTP_LISTING_CACHE_TIMEOUT = 300 # seconds
+# Number of attempts made to download a daily package. Failed downloads are kept and resumed from
+# where they stopped using the ftp REST command
+TED_FTP_DOWNLOAD_ATTEMPTS = 3
+
+# Daily package ingestion
+# BULK_TENDER_CREATE_WORKERS defines how many processes are used to pre-filter daily package files.
+# 0 or 1 filters files one at a time in the calling process
+# BULK_TENDER_CREATE_BATCH_SIZE defines how many files are sent to each process at a time
+BULK_TENDER_CREATE_WORKERS = 0
+BULK_TENDER_CREATE_BATCH_SIZE = 50
+# BULK_TENDER_CREATE_WRITE_BATCH_SIZE defines how many files are written to the database in a single
+# transaction. Progress is checkpointed after each transaction
+BULK_TENDER_CREATE_WRITE_BATCH_SIZE = 200
+# A smaller batch is written once BULK_TENDER_CREATE_CHECKPOINT_MEMBERS files have been read
+# since the last checkpoint, or BULK_TENDER_CREATE_CHECKPOINT_SECONDS have passed, so a run that
+# times out before a batch fills up still resumes part way through the daily package
+BULK_TENDER_CREATE_CHECKPOINT_MEMBERS = 500
+BULK_TENDER_CREATE_CHECKPOINT_SECONDS = 5
+# If processing times out, `bulk_tender_create_task` is retried to resume from its checkpoint
+BULK_TENDER_CREATE_MAX_RETRIES = 10
+BULK_TENDER_CREATE_RETRY_DELAY = 5 # seconds
+# If BULK_TENDER_CREATE_PIPELINE is True, `get_daily_package_task` processes the daily package as a
+# pipeline of download, parse and commit tasks with BULK_TENDER_CREATE_SHARDS parse tasks. The
+# pipeline uses a celery chord so needs a CELERY_RESULT_BACKEND that supports chords
+BULK_TENDER_CREATE_PIPELINE = False
+BULK_TENDER_CREATE_SHARDS = 4
+# If BULK_TENDER_CREATE_STREAMING is True, `bulk_tender_create` processes daily packages while they
+# download. Up to STREAMING_BUFFER_BLOCKS 64KB blocks are held in memory waiting to be processed
+BULK_TENDER_CREATE_STREAMING = False
+STREAMING_BUFFER_BLOCKS = 64
+# Each daily package is downloaded to its own folder in TEMP_FILES_DIR and is claimed by one worker
+# at a time. A claim not released, e.g. the worker was killed, expires after
+# DAILY_PACKAGE_CLAIM_TIMEOUT
+DAILY_PACKAGE_CLAIM_TIMEOUT = 600 # seconds
+# If DAILY_PACKAGE_VALIDATE_SCHEMA is True, daily package files that pass the pre-filter are
+# validated against their xml schema and skipped if they aren't valid. The schemas are loaded when
+# each celery worker process starts
+DAILY_PACKAGE_VALIDATE_SCHEMA = False
+
+# Daily package mirror
+# Daily packages downloaded from the TED ftp are copied to DAILY_PACKAGE_MIRROR_STORAGE, created
+# with DAILY_PACKAGE_MIRROR_OPTIONS, so they can be processed again without downloading them.
+# `sync_daily_package_mirror_task` mirrors packages published in the last
+# DAILY_PACKAGE_MIRROR_SYNC_DAYS days. Tasks with a time limit only read from the mirror, so the
+# upload doesn't count against their limit
+DAILY_PACKAGE_MIRROR_ENABLED = True
+DAILY_PACKAGE_MIRROR_STORAGE = 'tedsearch.storage_backends.PackageMirrorStorage'
+DAILY_PACKAGE_MIRROR_OPTIONS = {}
+DAILY_PACKAGE_MIRROR_LOCATION = 'daily-packages'
+DAILY_PACKAGE_MIRROR_SYNC_DAYS = 7
+
+# Catch-up ingestion
+# `catch_up_daily_packages_task` compares the daily packages published on the TED ftp in the last
+# CATCH_UP_DAYS days with their `DailyPackageDownloadStatus` entries and starts processing the
+# packages that are missing or didn't complete. At most CATCH_UP_MAX_PACKAGES packages are
+# processed at the same time. Packages still in error after CATCH_UP_MAX_ATTEMPTS attempts, e.g.
+# an archive missing from the ftp server, aren't tried again
+CATCH_UP_DAYS = 30
+CATCH_UP_MAX_PACKAGES = 3
+CATCH_UP_MAX_ATTEMPTS = 3
+
+# Caches
+# The default cache keeps the TED ftp listings. The NOTICE_RECORD_CACHE cache keeps the data read
+# from TED xml files, keyed by the checksum of the file, see `tenders.helpers.read_notice_record`.
+# The least recently used entries are dropped once it holds MAX_ENTRIES files
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+    },
+    'notice_records': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'notice-records',
+        'TIMEOUT': 86400, # seconds
+        'OPTIONS': {'MAX_ENTRIES': 10000}
+    }
+}
+NOTICE_RECORD_CACHE = 'notice_records'
 
 DJANGO_TABLES2_TEMPLATE = 'django_tables2/bootstrap4.html'
 
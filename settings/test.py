@@ -3,6 +3,9 @@ Django settings for testing the tedsearch project.
 '''
 
 
+import atexit
+import shutil
+import tempfile
 import warnings
 
 from .base import *
@@ -19,3 +22,11 @@ warnings.simplefilter('ignore', ResourceWarning)
 # Override this to use the `test` location on AWS S3 when testing forms
 MEDIA_LOCATION = 'test'
 MEDIA_URL = 'https://%s/%s/' % (AWS_S3_CUSTOM_DOMAIN, MEDIA_LOCATION)
+
+# Keep the daily package mirror in a new temporary folder on the local file system for each test
+# run, and delete it once the run finishes so nothing is carried over to the next run
+DAILY_PACKAGE_MIRROR_STORAGE = 'django.core.files.storage.FileSystemStorage'
+DAILY_PACKAGE_MIRROR_OPTIONS = {
+    'location': tempfile.mkdtemp(prefix='tedsearch-' + DAILY_PACKAGE_MIRROR_LOCATION + '-')
+}
+atexit.register(shutil.rmtree, DAILY_PACKAGE_MIRROR_OPTIONS['location'], ignore_errors=True)
@@ -8,12 +8,67 @@ from django.contrib import admin
 from tasks import models
 
 
+class DailyPackageMetricsInline(admin.TabularInline):
+    '''
+    Custom `DailyPackageMetrics` class defines inline display on `DailyPackageDownloadStatus`
+    '''
+
+    model = models.DailyPackageMetrics
+    extra = 0
+    can_delete = False
+
+    fields = readonly_fields = (
+        'added', 'bytes_downloaded', 'download_seconds', 'extract_seconds', 'parse_seconds',
+        'write_seconds', 'validate_seconds', 'members_scanned', 'members_matched',
+        'members_invalid', 'query_count', 'peak_memory'
+    )
+
+    def has_add_permission(self, request, obj=None):
+        '''
+        Override disables add option in the admin
+        '''
+
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        '''
+        Override disables change/edit option in the admin
+        '''
+
+        return False
+
+
 class DailyPackageDownloadStatusAdmin(admin.ModelAdmin):
     '''
     Custom `DailyPackageDownloadStatus` class defines admin display
     '''
 
-    list_display = ('file_name', 'file_date', 'added', 'modified', 'status', 'status_msg')
+    list_display = (
+        'file_name', 'file_date', 'added', 'modified', 'status', 'status_msg', 'catch_up_attempts'
+    )
+    inlines = [DailyPackageMetricsInline]
+
+    def has_add_permission(self, request):
+        '''
+        Override disables add option in the admin
+        '''
+
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        '''
+        Override disables change/edit option in the admin
+        '''
+
+        return False
+
+
+class DailyPackageMirrorAdmin(admin.ModelAdmin):
+    '''
+    Custom `DailyPackageMirror` class defines admin display
+    '''
+
+    list_display = ('file_name', 'file_date', 'added', 'modified', 'size', 'checksum')
 
     def has_add_permission(self, request):
         '''
@@ -52,5 +107,30 @@ class EmailNotificationStatusAdmin(admin.ModelAdmin):
         return False
 
 
+class PendingContractAwardNoticeAdmin(admin.ModelAdmin):
+    '''
+    Custom `PendingContractAwardNotice` class defines admin display
+    '''
+
+    list_display = ('ojs_ref', 'ref_notice_ojs', 'status_entry', 'added')
+    exclude = ('xml_data',)
+
+    def has_add_permission(self, request):
+        '''
+        Override disables add option in the admin
+        '''
+
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        '''
+        Override disables change/edit option in the admin
+        '''
+
+        return False
+
+
 admin.site.register(models.DailyPackageDownloadStatus, DailyPackageDownloadStatusAdmin)
+admin.site.register(models.DailyPackageMirror, DailyPackageMirrorAdmin)
 admin.site.register(models.EmailNotificationStatus, EmailNotificationStatusAdmin)
+admin.site.register(models.PendingContractAwardNotice, PendingContractAwardNoticeAdmin)
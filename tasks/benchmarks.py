@@ -0,0 +1,403 @@
+'''
+Benchmarks for the daily package ingestion used by `tasks.helpers.bulk_tender_create`
+
+Synthetic daily packages are built from the F02 and F03 TED xml files in `settings.TEST_FILES_DIR`
+and served from the local ftp stand-in `tasks.fake_ftp.FakeFTP`, so the benchmarks run offline and
+can be repeated to track regressions
+'''
+
+
+import copy
+import io
+import os
+import random
+import shutil
+import tarfile
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from lxml import etree
+
+from tasks import ftp, helpers, metrics
+from tasks.fake_ftp import FakeFTP
+from tasks.models import DailyPackageDownloadStatus
+from tenders import parsing, records, xpaths
+
+
+# F02 contract notice and F03 contract award notice templates for each schema version. Each award
+# notice template references a contract notice, which is replaced with a synthetic one
+NOTICE_TEMPLATES = {
+    'R2.0.9.S02.E01': {
+        'F02': '2017-OJS238-493624.xml',
+        'F03': '2017-OJS247-518290.xml'
+    },
+    'R2.0.9.S03.E01': {
+        'F02': '2018-OJS191-431371.xml',
+        'F03': '2019-OJS072-170256.xml'
+    }
+}
+
+# NC_CONTRACT_NATURE code given to notices that shouldn't match. "1" is Works
+UNMATCHED_CONTRACT_NATURE_CODE = '1'
+
+def create_synthetic_daily_package(dir_path, file_name, notice_count, match_rate=0.05,
+                                   award_rate=0.5, lot_counts=(1, 10),
+                                   schema_versions=tuple(NOTICE_TEMPLATES), seed=0):
+    '''
+    Method creates a synthetic daily package .tar.gz archive file called `file_name` in `dir_path`
+    containing `notice_count` TED xml files, and returns its path
+
+     * `match_rate` of the files are supply contracts for pharmaceutical products, so pass the
+       pre-filter. The rest are works contracts and are rejected
+     * `award_rate` of the matching files are F03 contract award notices referencing an F02
+       contract notice earlier in the package. The rest are F02 contract notices
+     * Each notice has a random number of lots between the `lot_counts` tuple limits and a random
+       schema version from `schema_versions`
+
+    Each notice has a new ojs_ref so every matching file is new to the database. `seed` makes the
+    package repeatable
+    '''
+
+    rng = random.Random(seed)
+
+    package_dir = file_name.split('.')[0]
+    year = package_dir[:4]
+    ojs_no = int(package_dir[-3:])
+
+    matching_count = round(notice_count * match_rate)
+    award_count = int(matching_count * award_rate)
+    contract_count = matching_count - award_count
+
+    # An award notice needs a contract notice to reference
+    if not contract_count:
+        award_count = 0
+
+    # Contract notices are numbered before the award notices that reference them
+    notice_specs = [('F02', True)] * contract_count + [('F03', True)] * award_count + \
+        [(rng.choice(['F02', 'F03']), False) for _ in range(notice_count - matching_count)]
+
+    templates = {}
+    contract_notices = []
+
+    file_path = os.path.join(dir_path, file_name)
+
+    with tarfile.open(file_path, 'w:gz') as tar:
+        # Daily packages start with their folder
+        folder = tarfile.TarInfo(package_dir)
+        folder.type = tarfile.DIRTYPE
+        folder.mode = 0o755
+
+        tar.addfile(folder)
+
+        for doc_no, (form, matching) in enumerate(notice_specs, start=100000):
+            schema_version = rng.choice(schema_versions)
+            template_name = NOTICE_TEMPLATES[schema_version][form]
+
+            if template_name not in templates:
+                templates[template_name] = etree.parse(
+                    os.path.join(settings.TEST_FILES_DIR, template_name)
+                ).getroot()
+
+            ojs_ref = '{}/S {:03d}-{:06d}'.format(year, ojs_no, doc_no)
+
+            if form == 'F03' and matching:
+                # Award the lots of one of the contract notices
+                ref_notice, lot_count = contract_notices[doc_no % len(contract_notices)]
+
+            else:
+                ref_notice, lot_count = None, rng.randint(*lot_counts)
+
+            if form == 'F02' and matching:
+                contract_notices.append((ojs_ref, lot_count))
+
+            xml_data = create_synthetic_notice(
+                templates[template_name], ojs_ref, lot_count, ref_notice, matching
+            )
+
+            member = tarfile.TarInfo('{}/{:06d}_{}.xml'.format(package_dir, doc_no, year))
+            member.size = len(xml_data)
+
+            tar.addfile(member, io.BytesIO(xml_data))
+
+    return file_path
+
+
+def create_synthetic_notice(template_root, ojs_ref, lot_count, ref_notice=None, matching=True):
+    '''
+    Method returns the bytes of a TED xml file copied from the F02 or F03 `template_root` with
+    the following changes:
+
+     * NO_DOC_OJS and DOC_ID are set from `ojs_ref`
+     * The lots are replaced with `lot_count` copies of the first lot, numbered from 1
+     * For F03 files, REF_NOTICE is set to `ref_notice`
+     * If `matching` is False, the contract nature is set to works so the pre-filter rejects it
+    '''
+
+    root = copy.deepcopy(template_root)
+    n_s = parsing.create_namespaces_dict(root)
+
+    root.xpath('def:CODED_DATA_SECTION/def:NOTICE_DATA/def:NO_DOC_OJS', namespaces=n_s)[0].text = \
+        ojs_ref
+    root.set('DOC_ID', '{}-{}'.format(ojs_ref[-6:], ojs_ref[:4]))
+
+    if ref_notice:
+        root.xpath('def:CODED_DATA_SECTION/def:NOTICE_DATA/def:REF_NOTICE/def:NO_DOC_OJS',
+                   namespaces=n_s)[0].text = ref_notice
+
+    if not matching:
+        root.xpath('def:CODED_DATA_SECTION/def:CODIF_DATA/def:NC_CONTRACT_NATURE',
+                   namespaces=n_s)[0].set('CODE', UNMATCHED_CONTRACT_NATURE_CODE)
+
+    # Lots are described by OBJECT_DESCR, and also AWARD_CONTRACT in F03 files
+    for lot_xpath in ['//def:OBJECT_CONTRACT/def:OBJECT_DESCR', '//def:AWARD_CONTRACT']:
+        lots = root.xpath(lot_xpath, namespaces=n_s)
+
+        if not lots:
+            continue
+
+        parent = lots[0].getparent()
+        index = parent.index(lots[0])
+
+        for lot in lots:
+            parent.remove(lot)
+
+        for lot_no in range(1, lot_count + 1):
+            lot = copy.deepcopy(lots[0])
+            lot.set('ITEM', str(lot_no))
+            lot.xpath('def:LOT_NO', namespaces=n_s)[0].text = str(lot_no)
+
+            parent.insert(index + lot_no - 1, lot)
+
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8')
+
+
+def measure_stage(stage, items, func):
+    '''
+    Method calls `func` and returns a tuple of its return value and a dictionary of measurements
+    for the benchmark `stage`, where `items` is the number of files handled by the stage
+
+     * `seconds`: time taken
+     * `per_second`: files handled per second
+     * `queries`: number of database queries made
+     * `peak_rss`: peak resident set size of the process so far, see
+       `tasks.metrics.get_peak_rss`
+    '''
+
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+
+        return_value = func()
+
+        seconds = time.perf_counter() - start
+
+    return return_value, {
+        'stage': stage,
+        'items': items,
+        'seconds': seconds,
+        'per_second': items / seconds if seconds else 0.0,
+        'queries': len(queries),
+        'peak_rss': metrics.get_peak_rss()
+    }
+
+
+def run_ingest_benchmark(package_paths, workers=0):
+    '''
+    Method creates new `tenders` and `lots` from each daily package .tar.gz archive file in
+    `package_paths`, served by `FakeFTP`, and returns a list of stage measurements from
+    `measure_stage` for each package
+
+     * `download`: `transfer_daily_package_file`
+     * `filter`: `iter_daily_package_candidates` with `workers` processes
+     * `parse`: `tenders.parsing.get_xml_root` with `strip_lots` for every candidate file
+     * `write`: `create_tenders_from_candidates`, which parses the candidates again
+
+    Everything written to the database is rolled back. `FakeFTP` is called through a
+    `FtpSessionPool` of its own with its own listing cache, and files are downloaded to a new
+    temporary folder, so a running ingest isn't affected. The daily package mirror isn't used
+    '''
+
+    results = []
+
+    temp_files_dir = tempfile.mkdtemp()
+
+    packages = {os.path.basename(package_path): package_path for package_path in package_paths}
+
+    FakeFTP.reset(packages)
+
+    session_pool = ftp.FtpSessionPool(
+        connect=lambda: (True, FakeFTP(settings.TED_FTP_ROOT)),
+        listing_cache=LocMemCache('tasks.benchmarks', {})
+    )
+
+    try:
+        with transaction.atomic():
+            for file_name in sorted(packages):
+                status_entry = DailyPackageDownloadStatus.objects.create(file_name=file_name)
+
+                members_scanned = sum(
+                    1 for _ in helpers.iter_daily_package_members(packages[file_name])
+                )
+
+                upload_file_path = os.path.join(temp_files_dir, file_name)
+
+                return_str, download = measure_stage(
+                    'download', members_scanned,
+                    lambda: ftp.transfer_daily_package_file(
+                        file_name, upload_file_path, session_pool=session_pool
+                    )
+                )
+
+                if not return_str.startswith('226'):
+                    raise RuntimeError(return_str)
+
+                candidates, prefilter = measure_stage(
+                    'filter', members_scanned,
+                    lambda: list(helpers.iter_daily_package_candidates(upload_file_path, workers))
+                )
+
+                _, parse = measure_stage(
+                    'parse', len(candidates),
+                    lambda: [parsing.get_xml_root(io.BytesIO(xml_data), strip_lots=True)
+                             for _, xml_data in candidates]
+                )
+
+                _, write = measure_stage(
+                    'write', len(candidates),
+                    lambda: helpers.create_tenders_from_candidates(status_entry, candidates)
+                )
+
+                results.append({
+                    'file_name': file_name,
+                    'notices': members_scanned,
+                    'candidates': len(candidates),
+                    'contract_notices': status_entry.contract_notice_count,
+                    'contract_award_notices': status_entry.contract_award_notice_count,
+                    'stages': [download, prefilter, parse, write]
+                })
+
+                os.remove(upload_file_path)
+
+            # Leave the database as it was
+            transaction.set_rollback(True)
+
+    finally:
+        shutil.rmtree(temp_files_dir)
+
+        session_pool.clear()
+        session_pool.listing_cache.clear()
+
+    return results
+
+
+def run_parser_benchmark(file_paths, repeat=20):
+    '''
+    Method parses each TED xml file in `file_paths` `repeat` times, first with lxml's default
+    parser then with the shared parser from `tenders.parsing.get_xml_parser`, and returns a
+    dictionary of measurements for each parser, keyed by 'default' and 'shared':
+
+     * `seconds`: time taken
+     * `nodes`: number of elements and text nodes in the trees of the files. Each node is held in
+       memory for as long as its tree is, so this is a measure of the memory used by the trees
+
+    Both parsers are checked to give the same `tenders.records.NoticeRecord` for each file
+    '''
+
+    results = {}
+    xml_roots = {}
+
+    # `etree.parse` uses lxml's default parser if it isn't given one
+    for label, get_parser in [('default', lambda: None),
+                              ('shared', parsing.get_xml_parser)]:
+        start = time.perf_counter()
+
+        for _ in range(repeat):
+            xml_roots[label] = [
+                etree.parse(file_path, get_parser()).getroot() for file_path in file_paths
+            ]
+
+        seconds = time.perf_counter() - start
+
+        results[label] = {
+            'seconds': seconds,
+            'nodes': sum(
+                1 + (elem.text is not None) + (elem.tail is not None)
+                for root in xml_roots[label] for elem in root.iter()
+            )
+        }
+
+    for default_root, shared_root in zip(xml_roots['default'], xml_roots['shared']):
+        if records.extract_notice_record(default_root) != \
+            records.extract_notice_record(shared_root):
+            raise RuntimeError('Shared parser read different data.')
+
+    return results
+
+
+def run_xpath_benchmark(file_paths, repeat=20):
+    '''
+    Method evaluates every xpath constant in `tenders.xpaths` on each TED xml file in `file_paths`
+    `repeat` times, first as a string with `element.xpath` then with the precompiled
+    `tenders.xpaths.evaluate`, and returns a dictionary of measurements:
+
+     * `evaluations`: number of xpaths evaluated in each way
+     * `string_seconds`: time taken by `element.xpath`
+     * `compiled_seconds`: time taken by `tenders.xpaths.evaluate`
+     * `speedup`: `string_seconds` divided by `compiled_seconds`
+
+    Both ways are checked to return the same results
+    '''
+
+    xpath_strs = [
+        value for name, value in sorted(vars(xpaths).items())
+        if name.isupper() and isinstance(value, str)
+    ]
+
+    xml_roots = []
+
+    for file_path in file_paths:
+        root = etree.parse(file_path).getroot()
+
+        xml_roots.append((root, parsing.create_namespaces_dict(root)))
+
+    # Compile the xpaths outside the timings, like a worker that has already read a file
+    compiled_results = [
+        [xpaths.evaluate(root, xpath_str, n_s) for xpath_str in xpath_strs]
+        for root, n_s in xml_roots
+    ]
+
+    string_results = [
+        [root.xpath(xpath_str, namespaces=n_s) for xpath_str in xpath_strs]
+        for root, n_s in xml_roots
+    ]
+
+    if compiled_results != string_results:
+        raise RuntimeError('Precompiled xpaths returned different results.')
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for root, n_s in xml_roots:
+            for xpath_str in xpath_strs:
+                root.xpath(xpath_str, namespaces=n_s)
+
+    string_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for root, n_s in xml_roots:
+            for xpath_str in xpath_strs:
+                xpaths.evaluate(root, xpath_str, n_s)
+
+    compiled_seconds = time.perf_counter() - start
+
+    return {
+        'evaluations': repeat * len(xml_roots) * len(xpath_strs),
+        'string_seconds': string_seconds,
+        'compiled_seconds': compiled_seconds,
+        'speedup': string_seconds / compiled_seconds if compiled_seconds else 0.0
+    }
@@ -0,0 +1,155 @@
+'''
+Local stand-in for the TED ftp server used by the tests and benchmarks of the `tasks` Django app
+'''
+
+
+import ftplib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+class FakeFTP():
+    '''
+    Local stand-in for `ftplib.FTP` that serves daily packages from `settings.TEST_FILES_DIR`
+    instead of the TED ftp server. Tests use `tasks.tests.helpers.use_fake_ftp` to patch
+    `ftplib.FTP` with this class, benchmarks log in sessions of their own with it
+
+    `packages` maps each daily package file name on the fake server to the file in
+    `settings.TEST_FILES_DIR`, or an absolute file path, that is served for it. The number of
+    connections made and open at the same time are tracked in `connections_made` and
+    `max_open_connections`, the number of MLSD calls in `listings_made` and the number of bytes
+    retrieved in `bytes_sent`
+
+    If `failures` is set, that many transfers drop the connection after sending
+    `fail_after_bytes` bytes, like a connection lost part way through a download. If
+    `rest_supported` is False, transfers from an offset are refused like a server that doesn't
+    support the REST command
+    '''
+
+    packages = {}
+    transfer_delay = 0 # seconds
+    failures = 0
+    fail_after_bytes = 1000
+    rest_supported = True
+
+    lock = threading.Lock()
+    connections_made = 0
+    listings_made = 0
+    bytes_sent = 0
+    open_connections = 0
+    max_open_connections = 0
+
+    def __init__(self, host, user=None, passwd=None):
+        self.directory = '/'
+        self.dropped = False
+
+        with FakeFTP.lock:
+            FakeFTP.connections_made += 1
+            FakeFTP.open_connections += 1
+            FakeFTP.max_open_connections = max(FakeFTP.max_open_connections,
+                                               FakeFTP.open_connections)
+
+    @classmethod
+    def reset(cls, packages, transfer_delay=0):
+        '''
+        Sets the daily packages served and clears the counts
+        '''
+
+        cls.packages = packages
+        cls.transfer_delay = transfer_delay
+        cls.failures = 0
+        cls.fail_after_bytes = 1000
+        cls.rest_supported = True
+        cls.connections_made = 0
+        cls.listings_made = 0
+        cls.bytes_sent = 0
+        cls.open_connections = 0
+        cls.max_open_connections = 0
+
+    def check_connection(self):
+        '''
+        Raises `EOFError` like `ftplib.FTP` does if the server has dropped the connection
+        '''
+
+        if self.dropped:
+            raise EOFError
+
+    def close(self):
+        with FakeFTP.lock:
+            FakeFTP.open_connections -= 1
+
+    def cwd(self, path):
+        self.check_connection()
+
+        self.directory = os.path.join(self.directory, path)
+
+        return '250 Directory successfully changed.'
+
+    def mlsd(self, path='', facts=None):
+        self.check_connection()
+
+        FakeFTP.listings_made += 1
+
+        file_names = [
+            file_name for file_name in self.packages
+            if os.path.join(self.directory, path) == \
+                '/daily-packages/{}/{}'.format(file_name[:4], file_name[4:6])
+        ]
+
+        if not file_names:
+            raise ftplib.error_perm('550 Failed to change directory.')
+
+        for file_name in sorted(file_names):
+            file_path = os.path.join(settings.TEST_FILES_DIR, self.packages[file_name])
+
+            yield (file_name, {
+                'type': 'file', 'size': str(os.path.getsize(file_path)),
+                'modify': time.strftime('%Y%m%d%H%M%S', time.gmtime(os.path.getmtime(file_path)))
+            })
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        self.check_connection()
+
+        file_name = cmd[len('RETR '):]
+
+        if file_name not in self.packages or \
+            self.directory != '/daily-packages/{}/{}'.format(file_name[:4], file_name[4:6]):
+            raise ftplib.error_perm('550 ' + file_name + ': No such file or directory')
+
+        if rest and not self.rest_supported:
+            raise ftplib.error_perm('502 REST command not implemented.')
+
+        time.sleep(self.transfer_delay)
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, self.packages[file_name])
+
+        with open(file_path, 'rb') as package_file:
+            # Carry on from the REST offset
+            package_file.seek(rest or 0)
+
+            if FakeFTP.failures:
+                FakeFTP.failures -= 1
+
+                # Send part of the file then drop the connection
+                block = package_file.read(self.fail_after_bytes)
+
+                FakeFTP.bytes_sent += len(block)
+                callback(block)
+
+                self.dropped = True
+
+                raise EOFError
+
+            for block in iter(lambda: package_file.read(blocksize), b''):
+                FakeFTP.bytes_sent += len(block)
+                callback(block)
+
+        return '226 Transfer complete'
+
+    def voidcmd(self, cmd):
+        self.check_connection()
+
+        return '200 NOOP ok.'
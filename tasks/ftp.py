@@ -0,0 +1,497 @@
+'''
+Functions and classes for calling the TED ftp server from the `tasks` Django app
+'''
+
+
+import ftplib
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+STREAMING_BLOCK_SIZE = 64 * 1024 # bytes
+
+DOWNLOAD_CANCELLED_MSG = 'Download cancelled.'
+
+# Suffix of daily package files that are still downloading, or whose download failed part way
+PARTIAL_DOWNLOAD_SUFFIX = '.part'
+
+
+class FtpSessionPool():
+    '''
+    Pool of logged in `ftplib.FTP` sessions to the TED ftp server so each ftp call doesn't need a
+    new connection and login
+
+     * Up to `settings.TED_FTP_MAX_CONNECTIONS` idle sessions are kept for reuse
+     * Sessions idle for longer than `settings.TED_FTP_KEEPALIVE` seconds are checked with a NOOP
+       before they are reused, and replaced if the server has dropped them
+     * Sessions aren't shared with forked processes, e.g. celery workers, as the socket belongs to
+       the parent process
+
+    Use `run` to call the ftp server with a session from the pool
+
+    New sessions are logged in with `connect`, by default `connect_to_ftp`. Listings of the
+    server's folders are cached in `listing_cache`, by default the default cache, see
+    `get_daily_package_listing`. A pool for another server, e.g. a benchmark's local stand-in,
+    should be given a cache of its own so its listings aren't mixed up with the TED ftp's
+    '''
+
+    def __init__(self, connect=None, listing_cache=None):
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.idle_sessions = []
+        self.connect = connect
+        self.listing_cache = listing_cache or cache
+
+    def acquire(self):
+        '''
+        Returns a tuple of (`ftplib.FTP` session, `reused` boolean). Uses an idle session from the
+        pool if there is one that is still alive, otherwise logs in a new session
+
+        Raises `ftplib.Error` if a new session can't connect
+        '''
+
+        while True:
+            with self.lock:
+                # Sessions opened by a parent process can't be used in this one
+                if self.pid != os.getpid():
+                    self.pid = os.getpid()
+                    self.idle_sessions = []
+
+                if not self.idle_sessions:
+                    break
+
+                ftp, last_used = self.idle_sessions.pop()
+
+            if time.monotonic() - last_used < settings.TED_FTP_KEEPALIVE:
+                return (ftp, True)
+
+            # Check the session hasn't timed out on the server
+            try:
+                ftp.voidcmd('NOOP')
+
+                return (ftp, True)
+
+            except ftplib.all_errors:
+                self.discard(ftp)
+
+        connection_successful, ftp = (self.connect or connect_to_ftp)()
+
+        if not connection_successful:
+            raise ftplib.Error('Could not connect to the ftp.')
+
+        return (ftp, False)
+
+    def clear(self):
+        '''
+        Closes all the idle sessions in the pool
+        '''
+
+        with self.lock:
+            idle_sessions, self.idle_sessions = self.idle_sessions, []
+
+        for ftp, _ in idle_sessions:
+            self.discard(ftp)
+
+    @staticmethod
+    def discard(ftp):
+        '''
+        Closes `ftp` without raising an error if the connection has already dropped
+        '''
+
+        try:
+            ftp.close()
+
+        except ftplib.all_errors:
+            pass
+
+    def release(self, ftp):
+        '''
+        Returns `ftp` to the pool for reuse, or closes it if the pool is full
+        '''
+
+        with self.lock:
+            if self.pid == os.getpid() and \
+                len(self.idle_sessions) < settings.TED_FTP_MAX_CONNECTIONS:
+                self.idle_sessions.append((ftp, time.monotonic()))
+
+                return
+
+        self.discard(ftp)
+
+    def run(self, func):
+        '''
+        Calls `func` with a logged in `ftplib.FTP` session from the pool and returns the result
+
+         * `ftplib.error_perm` errors are replies from the server, e.g. a file doesn't exist, so
+           the session is returned to the pool and the error is raised
+         * Any other error from `ftplib.all_errors` means the connection has failed so the session
+           is discarded. If the session was reused, it may have been dropped while idle so `func`
+           is called again with a new session
+        '''
+
+        ftp, reused = self.acquire()
+
+        try:
+            result = func(ftp)
+
+        except ftplib.error_perm:
+            self.release(ftp)
+            raise
+
+        except ftplib.all_errors:
+            self.discard(ftp)
+
+            if not reused:
+                raise
+
+            # Reconnect and try again
+            ftp, _ = self.acquire()
+
+            try:
+                result = func(ftp)
+
+            except ftplib.error_perm:
+                self.release(ftp)
+                raise
+
+            except ftplib.all_errors:
+                self.discard(ftp)
+                raise
+
+        self.release(ftp)
+
+        return result
+
+
+FTP_SESSION_POOL = FtpSessionPool()
+
+
+class DownloadCancelledError(ftplib.Error):
+    '''
+    Raised by `DownloadBuffer` to stop a download once the reader has stopped
+    '''
+
+
+class DownloadBuffer():
+    '''
+    Bounded buffer that passes the blocks of a file downloading in one thread to a reader in
+    another thread, e.g. `tarfile` in stream mode
+
+     * The download thread adds blocks with `write` and calls `finish` once done. `write` waits
+       while `settings.STREAMING_BUFFER_BLOCKS` blocks are waiting to be read
+     * The reader reads the file with `read`, which waits for blocks to arrive
+     * If the reader stops early it should call `close`, so the download stops rather than
+       waiting for blocks to be read
+    '''
+
+    def __init__(self):
+        self.blocks = queue.Queue(settings.STREAMING_BUFFER_BLOCKS)
+        self.pending = b''
+        self.closed = False
+        self.finished = False
+
+    def close(self):
+        '''
+        Stops any more blocks being added to the buffer
+        '''
+
+        self.closed = True
+
+    def finish(self):
+        '''
+        Marks the end of the file. If the download failed, the reader sees a truncated file
+        '''
+
+        try:
+            self.put(None)
+
+        except DownloadCancelledError:
+            # Reader has already stopped
+            pass
+
+    def put(self, block):
+        '''
+        Adds `block` to the buffer, waiting until there is space. Raises `DownloadCancelledError`
+        to abort the download if the buffer has been closed
+        '''
+
+        while True:
+            if self.closed:
+                raise DownloadCancelledError(DOWNLOAD_CANCELLED_MSG)
+
+            try:
+                self.blocks.put(block, timeout=0.1)
+
+                return
+
+            except queue.Full:
+                continue
+
+    def read(self, size=-1):
+        '''
+        Returns up to `size` bytes of the file, or the rest of the file if `size` is negative.
+        Returns empty bytes at the end of the file
+        '''
+
+        while not self.finished and (size < 0 or len(self.pending) < size):
+            block = self.blocks.get()
+
+            if block is None:
+                self.finished = True
+
+            else:
+                self.pending += block
+
+        if size < 0:
+            size = len(self.pending)
+
+        data, self.pending = self.pending[:size], self.pending[size:]
+
+        return data
+
+    def write(self, block):
+        '''
+        Adds a downloaded `block` to the buffer. Used as the `ftplib.FTP.retrbinary` callback
+        '''
+
+        self.put(block)
+
+
+def check_daily_package_exists(date):
+    '''
+    Method checks whether a daily package .tar.gz archive file exists on the TED ftp server for
+    the input `date` `datetime.date` object
+
+    If a daily package exists, return the filename otherwise return None
+    '''
+
+    # Return None by default
+    return_file_name = None
+
+    # See whether a vaild daily package file is in the listing for the month. The folder is listed
+    # again if the package isn't in a cached listing, as it may have been published since
+    try:
+        for file_name in get_daily_package_listing(date.year, date.month,
+                                                   file_name_prefix=date.strftime('%Y%m%d')):
+
+            # Check if the file_name is the expected format for the input date. If it is,
+            # return it
+            if file_name.startswith(date.strftime('%Y%m%d')):
+                return_file_name = file_name
+                break
+
+    except ftplib.all_errors:
+        # If error, fail silently and just return None by default
+        pass
+
+    return return_file_name
+
+
+def connect_to_ftp():
+    '''
+    Method tries to connect to the ftp using credentials supplied in `django.conf.settings`.
+
+     * If successful, return a tuple of (True, `ftplib.FTP` instance)
+     * If unsuccessful, return a tuple of (False, None)
+    '''
+
+    # Try to connect to host
+    try:
+        ftp = ftplib.FTP(settings.TED_FTP_ROOT, user=settings.TED_FTP_USERNAME,
+                         passwd=settings.TED_FTP_PASSWORD)
+        connection_successful = True
+
+    except ConnectionRefusedError:
+        ftp = None
+        connection_successful = False
+
+    return (connection_successful, ftp)
+
+
+def get_daily_package_listing(year, month, session_pool=None, file_name_prefix=None):
+    '''
+    Method returns a dictionary of the files in the daily packages folder on the TED ftp server for
+    the input `year` and `month` integers. Keys are file names and values are the MLSD facts for
+    the file, e.g. size and modify
+
+    The listing is cached for `settings.TED_FTP_LISTING_CACHE_TIMEOUT` seconds so repeat checks,
+    e.g. by `DailyPackageDownloadForm` and then a task, don't call the ftp server again. Raises an
+    error from `ftplib.all_errors` if the folder can't be listed
+
+    If `file_name_prefix` is supplied and no file in the cached listing starts with it, the folder
+    is listed again, so a daily package published since the listing was cached is found
+
+    The server is called with `session_pool` if supplied, otherwise `FTP_SESSION_POOL`, and the
+    listing is cached in the pool's `listing_cache`
+    '''
+
+    session_pool = session_pool or FTP_SESSION_POOL
+
+    path = '/daily-packages/{:d}/{:02d}'.format(year, month)
+    cache_key = 'ted_ftp_listing:' + path
+
+    listing = session_pool.listing_cache.get(cache_key)
+
+    if listing is not None and file_name_prefix and \
+        not any(file_name.startswith(file_name_prefix) for file_name in listing):
+        listing = None
+
+    if listing is None:
+        listing = session_pool.run(lambda ftp: dict(ftp.mlsd(path=path)))
+
+        session_pool.listing_cache.set(
+            cache_key, listing, settings.TED_FTP_LISTING_CACHE_TIMEOUT
+        )
+
+    return listing
+
+
+def list_daily_packages(start_date, end_date):
+    '''
+    Method returns a sorted list of the file names of the daily package .tar.gz archive files on
+    the TED ftp server published between the `start_date` and `end_date` `datetime.date` objects
+    inclusive
+
+    The daily packages for each month are listed with `get_daily_package_listing`. If a month
+    can't be listed, e.g. it doesn't exist on the ftp server yet, it is skipped
+    '''
+
+    file_names = []
+
+    year, month = start_date.year, start_date.month
+
+    while (year, month) <= (end_date.year, end_date.month):
+        try:
+            for file_name in get_daily_package_listing(year, month):
+
+                # Only include daily packages published in the date range
+                if start_date.strftime('%Y%m%d') <= file_name[:8] <= \
+                    end_date.strftime('%Y%m%d') and file_name.endswith('.tar.gz'):
+                    file_names.append(file_name)
+
+        except ftplib.all_errors:
+            # If error, fail silently and move on to the next month
+            pass
+
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    return sorted(file_names)
+
+
+def transfer_daily_package_file(file_name, destination_file_path, on_block=None,
+                                session_pool=None):
+    '''
+    Method retrieves a daily package .tar.gz archive file from the TED ftp server and saves it to
+    `destination_file_path`. The file retrieved is defined by the input `file_name` string
+
+     * The file is downloaded to a `PARTIAL_DOWNLOAD_SUFFIX` file, which is kept if the download
+       fails. The next attempt carries on from the end of the partial file using REST, so only
+       the missing bytes are downloaded
+     * If the ftp server refuses to carry on from the end of the partial file, the whole file is
+       downloaded again
+     * Up to `settings.TED_FTP_DOWNLOAD_ATTEMPTS` attempts are made if the connection fails
+     * Once downloaded, the file size is checked against the MLSD size fact before the file is
+       moved to its final location
+
+    If supplied, `on_block` is called with every block of the file in order, including the blocks
+    already in the partial file. The server is called with `session_pool` if supplied, otherwise
+    `FTP_SESSION_POOL`
+
+    Doesn't use the database so can be called from other threads. Returns a string indicating an
+    error or success
+    '''
+
+    session_pool = session_pool or FTP_SESSION_POOL
+
+    part_file_path = destination_file_path + PARTIAL_DOWNLOAD_SUFFIX
+
+    try:
+        expected_size = get_daily_package_listing(
+            int(file_name[:4]), int(file_name[4:6]), session_pool
+        ).get(file_name, {}).get('size')
+
+    except ftplib.all_errors:
+        # Size can't be checked
+        expected_size = None
+
+    if os.path.isfile(part_file_path):
+        if expected_size and os.path.getsize(part_file_path) >= int(expected_size):
+            # Partial file can't be carried on from, e.g. the file on the ftp has been replaced
+            os.remove(part_file_path)
+
+        elif on_block:
+            # Pass on the blocks downloaded by an earlier attempt
+            with open(part_file_path, 'rb') as part_file:
+                for block in iter(lambda: part_file.read(STREAMING_BLOCK_SIZE), b''):
+                    on_block(block)
+
+    def retrieve(ftp):
+        # Change directory to the correct location defined by the filename. Use an absolute path
+        # as the session may have been used from another directory before
+        ftp.cwd('/daily-packages/{}/{}'.format(file_name[:4], file_name[4:6]))
+
+        with open(part_file_path, 'ab') as part_file:
+            offset = part_file.tell()
+            # Number of bytes retrieved that have already been passed to `on_block`
+            skip_bytes = 0
+
+            def write(block):
+                nonlocal skip_bytes
+
+                part_file.write(block)
+
+                if on_block and len(block) > skip_bytes:
+                    on_block(block[skip_bytes:])
+
+                skip_bytes = max(skip_bytes - len(block), 0)
+
+            # Retrieve correct file, carrying on from the end of the partial file
+            try:
+                return ftp.retrbinary('RETR ' + file_name, write, blocksize=STREAMING_BLOCK_SIZE,
+                                      rest=offset or None)
+
+            except ftplib.error_perm:
+                if not offset or part_file.tell() > offset:
+                    raise
+
+            # The server refused to carry on from the offset, e.g. it doesn't support REST, so
+            # retrieve the whole file. The blocks in the partial file have already been passed to
+            # `on_block` so aren't passed again
+            part_file.truncate(0)
+            skip_bytes = offset
+
+            return ftp.retrbinary('RETR ' + file_name, write, blocksize=STREAMING_BLOCK_SIZE)
+
+    for _ in range(settings.TED_FTP_DOWNLOAD_ATTEMPTS):
+        try:
+            return_str = session_pool.run(retrieve)
+            break
+
+        except (ftplib.error_perm, DownloadCancelledError) as err:
+            # Trying again won't help
+            return_str = str(err)
+            break
+
+        except ftplib.all_errors as err:
+            return_str = str(err)
+
+    if not return_str.startswith('226'):
+        # Keep the partial file so the next attempt only downloads the missing bytes, unless
+        # nothing was downloaded
+        if os.path.isfile(part_file_path) and not os.path.getsize(part_file_path):
+            os.remove(part_file_path)
+
+    elif expected_size and os.path.getsize(part_file_path) != int(expected_size):
+        os.remove(part_file_path)
+
+        return_str = 'Downloaded file size does not match the size on the ftp.'
+
+    else:
+        os.replace(part_file_path, destination_file_path)
+
+    return return_str
@@ -3,16 +3,159 @@ Helper functions for the `tasks` Django app
 '''
 
 
-import ftplib
+import collections
+import concurrent.futures
+import datetime
+import io
+import itertools
 import os
 import shutil
 import tarfile
+import time
+import zlib
 
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 
-from tasks.models import DailyPackageDownloadStatus
-from tenders import helpers, models
-from tenders.xpaths import TD_DOCUMENT_TYPE_CODE
+from tasks import ftp, metrics, mirror
+from tasks.models import DailyPackageDownloadStatus, DailyPackageMirror, PendingContractAwardNotice
+from tenders import helpers, models, parsing
+
+
+# Errors raised when reading a daily package archive that is not valid
+ARCHIVE_ERRORS = (tarfile.TarError, EOFError, zlib.error)
+
+ARCHIVE_ERROR_MSG = 'Uploaded .tar.gz archive file is not a valid TED bulk download.'
+
+
+def backfill_daily_packages(start_date, end_date, progress=None, reprocess=False):
+    '''
+    Method creates new `tenders` and `lots` from every daily package on the TED ftp server
+    published between the `start_date` and `end_date` `datetime.date` objects inclusive
+
+     * Packages are found using `list_daily_packages`. Packages already `COMPLETE` are skipped
+     * If `reprocess` is True, the packages in the daily package mirror are processed again
+       instead, including packages already `COMPLETE`, without using the ftp server
+     * Up to `settings.TED_FTP_MAX_CONNECTIONS` packages are downloaded at the same time, each
+       from the daily package mirror if it's there, otherwise over its own ftp connection
+     * Each package is processed in publication order with `ingest_daily_package` as soon as it
+       is downloaded, while the next packages download, and is then deleted
+     * Each package is claimed with `status_entry.claim` from when its download starts until it
+       is finished, and the claim is renewed before the package is processed. Packages another
+       worker is processing are skipped
+
+    Progress is recorded on the `DailyPackageDownloadStatus` entry for each package. If supplied,
+    `progress` is called with each entry once its package is finished
+
+    Returns a list of the `DailyPackageDownloadStatus` entries processed
+    '''
+
+    status_entries = []
+
+    if reprocess:
+        file_names = DailyPackageMirror.objects.filter(
+            file_date__date__range=(start_date, end_date)
+        ).order_by('file_name').values_list('file_name', flat=True)
+
+    else:
+        file_names = ftp.list_daily_packages(start_date, end_date)
+
+    for file_name in file_names:
+        status_entry, _ = DailyPackageDownloadStatus.objects.get_or_create(file_name=file_name)
+
+        if reprocess or status_entry.status != DailyPackageDownloadStatus.COMPLETE:
+            status_entries.append(status_entry)
+
+    mirror_entries = DailyPackageMirror.objects.in_bulk(
+        [status_entry.file_name for status_entry in status_entries], field_name='file_name'
+    ) if settings.DAILY_PACKAGE_MIRROR_ENABLED else {}
+
+    waiting_entries = iter(status_entries)
+    downloads = collections.deque()
+    processed_entries = []
+
+    # Only file transfers run in the pool threads so all database access stays in this thread
+    with concurrent.futures.ThreadPoolExecutor(settings.TED_FTP_MAX_CONNECTIONS) as executor:
+
+        def start_next_download():
+            for status_entry in waiting_entries:
+                # Leave packages another worker is processing
+                if not status_entry.claim():
+                    continue
+
+                status_entry.reset_checkpoint()
+                status_entry.set_status(DailyPackageDownloadStatus.DOWNLOADING)
+                status_entry.start_run_metrics()
+
+                def fetch(status_entry=status_entry):
+                    with metrics.record_stage_duration(status_entry, 'download_seconds'):
+                        return fetch_daily_package_file(
+                            status_entry.file_name, mirror_entries.get(status_entry.file_name)
+                        )
+
+                downloads.append((status_entry, executor.submit(fetch)))
+
+                return
+
+        for _ in range(settings.TED_FTP_MAX_CONNECTIONS):
+            start_next_download()
+
+        try:
+            # Process the packages in publication order so contract award notices can find
+            # contract notices published in earlier packages
+            while downloads:
+                status_entry, download = downloads.popleft()
+
+                try:
+                    return_str = download.result()
+
+                    # Keep the pool busy while this package is processed
+                    start_next_download()
+
+                    # The claim may have run out while earlier packages were processed. Leave the
+                    # package if another worker has claimed it since
+                    if not status_entry.renew_claim():
+                        continue
+
+                    upload_file_path = get_daily_package_file_path(status_entry.file_name)
+
+                    with metrics.record_run_metrics(status_entry):
+                        # Copy new downloads to the mirror
+                        if settings.DAILY_PACKAGE_MIRROR_ENABLED and \
+                            return_str.startswith('226') and \
+                            return_str != mirror.MIRROR_RETURN_STR:
+                            mirror.mirror_daily_package_file(
+                                status_entry.file_name, upload_file_path
+                            )
+
+                        # Record if error. Success is code 226, otherwise error
+                        if return_str.startswith('226'):
+                            metrics.record_download_size(status_entry, upload_file_path)
+
+                            ingest_daily_package(status_entry, upload_file_path)
+
+                        else:
+                            status_entry.set_status(DailyPackageDownloadStatus.ERROR, return_str)
+
+                    clear_daily_package_workspace(
+                        status_entry.file_name, keep_partial_downloads=True
+                    )
+
+                finally:
+                    status_entry.release()
+
+                processed_entries.append(status_entry)
+
+                if progress:
+                    progress(status_entry)
+
+        finally:
+            # Release the packages left downloading if processing stopped part way through
+            for status_entry, _ in downloads:
+                status_entry.release()
+
+    return processed_entries
 
 
 def bulk_tender_create(status_entry):
@@ -21,214 +164,847 @@ def bulk_tender_create(status_entry):
     `status_entry` is a `DailyPackageDownloadStatus` entry used to log progress and record errors
     when method is called from a celery task
 
-     * Grabs file from FTP server
-     * Extracts to a temp location
-     * Loops through each file and creates new `tenders` and `lots` if file contains data we are
-       interested in
+     * Grabs file from FTP server using `download_daily_package`
+     * Creates new `tenders` and `lots` from the file using `ingest_daily_package`
+     * If `settings.BULK_TENDER_CREATE_STREAMING` is True and the file needs to be downloaded
+       from the FTP server, the two steps are overlapped using `stream_daily_package`
+
+    Progress is checkpointed on `status_entry` as files are processed. If a previous run timed
+    out, processing carries on from the file after `status_entry.last_member_name`. Measurements
+    of the run are recorded using `record_run_metrics`
+
+    The daily package is claimed with `status_entry.claim` while it is processed, so other workers
+    can process other daily packages at the same time. Returns `True` once processed, or `False`
+    if another worker is already processing the daily package
     '''
 
-    extract_dir = None
+    if not status_entry.claim():
+        return False
 
-    # Make sure the required temp folder exists
-    if not os.path.exists(settings.TEMP_FILES_DIR):
-        os.mkdir(settings.TEMP_FILES_DIR)
+    try:
+        with metrics.record_run_metrics(status_entry):
+            if settings.BULK_TENDER_CREATE_STREAMING and can_stream_daily_package(status_entry):
+                # Process the files as they download
+                stream_daily_package(status_entry)
 
-    # if uploaded file exists, try and grab this from S3
-    upload_file_path = os.path.join(settings.TEMP_FILES_DIR, status_entry.file_name)
+            else:
+                upload_file_path = download_daily_package(status_entry)
 
-    status_entry.set_status(DailyPackageDownloadStatus.DOWNLOADING)
+                # Process the files if status is not an error
+                if not status_entry.is_error():
+                    ingest_daily_package(status_entry, upload_file_path)
 
-    # Use ftp to retrieve file to temp location
-    return_str = retrieve_daily_package_file(status_entry.file_name)
+        # Delete the files as we have now finished. Keep partial downloads so a failed download
+        # can be carried on from where it stopped next time
+        clear_daily_package_workspace(status_entry.file_name, keep_partial_downloads=True)
 
-    # Record if error. Success is code 226, otherwise error
-    if not return_str.startswith('226'):
-        status_entry.set_status(DailyPackageDownloadStatus.ERROR, return_str)
+    finally:
+        status_entry.release()
 
-    # Extract the file if status is not an error
-    if not status_entry.is_error():
+    return True
 
-        status_entry.set_status(DailyPackageDownloadStatus.PROCESSING)
 
-        if tarfile.is_tarfile(upload_file_path):
-            # If valid, extract the files to a new directory defined by the archive
-            tar = tarfile.open(upload_file_path)
+def can_stream_daily_package(status_entry):
+    '''
+    Returns `True` if the daily package for `status_entry` has to be downloaded from the TED ftp
+    server, so it can be processed with `stream_daily_package`, otherwise `False`
 
-            # Check whether the first member in archive is a directory. If it is, extract
-            if tar.getmembers():
-                if tar.getmembers()[0].isdir():
-                    tar.extractall(settings.TEMP_FILES_DIR)
+    The package doesn't need downloading if it is still on disk from a previous run that timed
+    out, or if it is in the daily package mirror
+    '''
 
-                    # Save this location for later
-                    extract_dir = os.path.join(settings.TEMP_FILES_DIR, tar.getnames()[0])
+    upload_file_path = get_daily_package_file_path(status_entry.file_name)
 
-            # Whatever happens, close the file
-            tar.close()
+    if status_entry.is_resumable() and os.path.isfile(upload_file_path):
+        return False
 
-        if not extract_dir:
-            # File has not extracted properly, not a tar archive so raise error
-            status_entry.set_status(
-                DailyPackageDownloadStatus.ERROR,
-                'Uploaded .tar.gz archive file is not a valid TED bulk download.'
-            )
+    return not (settings.DAILY_PACKAGE_MIRROR_ENABLED and
+                DailyPackageMirror.objects.filter(file_name=status_entry.file_name).exists())
+
+
+def commit_daily_package_shards(status_entry, shard_results):
+    '''
+    Method creates new `tenders` and `lots` from the candidate files returned by
+    `parse_daily_package_shard` for each shard of the daily package defined by `status_entry`
+
+    Candidates are processed in archive order, carrying on from `status_entry.last_member_name`
+    if a previous attempt timed out. Once finished, `status_entry` is set to `COMPLETE` and the
+    temporary files are deleted. Measurements of the commit are recorded using
+    `record_run_metrics`
+    '''
 
-    # Process the files if status is not an error
     if not status_entry.is_error():
+        candidates = sorted(itertools.chain.from_iterable(shard_results))
+
+        member_names = [member_name for _, member_name, _ in candidates]
+
+        # Skip the candidates already processed by a previous attempt
+        if status_entry.last_member_name in member_names:
+            candidates = candidates[member_names.index(status_entry.last_member_name) + 1:]
+
+        with metrics.record_run_metrics(status_entry):
+            create_tenders_from_candidates(
+                status_entry,
+                ((member_name, xml_str.encode('latin-1')) for _, member_name, xml_str in candidates)
+            )
 
-        contract_award_notice_ids = []
-        contract_notice_ids = []
+            complete_daily_package(status_entry)
 
-        # Loop through all files in `extract_dir`
-        for file in os.listdir(extract_dir):
+    clear_daily_package_workspace(status_entry.file_name)
+
+
+def complete_daily_package(status_entry):
+    '''
+    Method sets `status_entry` to `COMPLETE` with a message reporting the number of new
+    `ContractNotice` and `ContractAwardNotice` entries created across all runs
+    '''
+
+    if status_entry.contract_award_notice_count or status_entry.contract_notice_count:
+        msg_str = str(status_entry.contract_award_notice_count) + \
+                  ' new Contract Award Notice(s) and ' + \
+                  str(status_entry.contract_notice_count) + ' new Contract Notice(s) ' + \
+                  'added to the database successfully.'
+
+    else:
+        msg_str = 'Uploaded file processed successfully but no valid Contract Award ' + \
+                  'Notice data was found.'
+
+    status_entry.set_status(DailyPackageDownloadStatus.COMPLETE, msg_str)
+
+
+def create_tenders_from_candidates(status_entry, candidates):
+    '''
+    Method loops through `candidates`, an iterable of `(member_name, xml_data)` tuples, and creates
+    new `ContractNotice` or `ContractAwardNotice` entries and lots for each file that passes
+    `check_xml`. Files whose `xml_data` is None were read but rejected by the pre-filter, see
+    `iter_daily_package_candidates`, and only move the checkpoint on
+
+    Files are written to the database in batches using `write_daily_package_batch`, and progress is
+    checkpointed on `status_entry` after each batch. A batch is written when it holds
+    `settings.BULK_TENDER_CREATE_WRITE_BATCH_SIZE` files, or when
+    `settings.BULK_TENDER_CREATE_CHECKPOINT_MEMBERS` files have been read or
+    `settings.BULK_TENDER_CREATE_CHECKPOINT_SECONDS` seconds have passed since the last checkpoint,
+    so a run that times out resumes from the last file read rather than the start of the package
+
+    The time spent waiting for `candidates` is recorded as the extract duration of the run
+
+    Once every batch is written, contract award notices parked by an earlier batch or daily
+    package whose contract notice has now arrived are created using
+    `resolve_pending_contract_award_notices`
+    '''
 
-            root, n_s = helpers.get_xml_root(os.path.join(extract_dir, file))
+    candidates = iter(candidates)
 
-            is_valid, _ = helpers.check_xml(root, n_s)
+    batch = []
+    # Last file read and number of files read since the last checkpoint
+    member_name = None
+    member_count = 0
+    checkpoint_time = time.monotonic()
 
-            if is_valid:
-                # Create new `ContractNotice` or `ContractAwardNotice` entry and lots using task
-                new_tender = helpers.create_new_tender(root, n_s)
+    while True:
+        with metrics.record_stage_duration(status_entry, 'extract_seconds'):
+            candidate = next(candidates, None)
 
-                doc_type_code = root.xpath(TD_DOCUMENT_TYPE_CODE, namespaces=n_s)
+        if candidate:
+            member_name, xml_data = candidate
+            member_count += 1
 
-                if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-                    contract_award_notice_ids.append(new_tender.id)
+            if xml_data is not None:
+                batch.append(candidate)
 
-                elif doc_type_code == settings.CONTRACT_NOTICE_CODE:
-                    contract_notice_ids.append(new_tender.id)
+        if member_name and (
+                not candidate or
+                len(batch) >= settings.BULK_TENDER_CREATE_WRITE_BATCH_SIZE or
+                member_count >= settings.BULK_TENDER_CREATE_CHECKPOINT_MEMBERS or
+                time.monotonic() - checkpoint_time >= settings.BULK_TENDER_CREATE_CHECKPOINT_SECONDS
+        ):
+            if status_entry.run_metrics:
+                status_entry.run_metrics.members_matched += len(batch)
 
-        # Return a queryset of the new `ContractNotice` and `ContractAwardNotice` entries
-        contract_award_notice_qs = models.ContractAwardNotice.objects.filter(
-            id__in=contract_award_notice_ids
+            write_daily_package_batch(status_entry, batch, member_name)
+
+            batch = []
+            member_name = None
+            member_count = 0
+            checkpoint_time = time.monotonic()
+
+        if not candidate:
+            break
+
+    with metrics.record_stage_duration(status_entry, 'write_seconds'):
+        resolved_count = resolve_pending_contract_award_notices()
+
+    if resolved_count:
+        status_entry.set_checkpoint(
+            status_entry.last_member_name, contract_award_notice_count=resolved_count
         )
-        contract_notice_qs = models.ContractNotice.objects.filter(id__in=contract_notice_ids)
 
-        if contract_award_notice_qs.exists() or contract_notice_qs.exists():
-            msg_str = str(contract_award_notice_qs.count()) +  ' new Contract Award Notice(s) ' + \
-                      'and ' + str(contract_notice_qs.count()) + ' new Contract Notice(s) ' + \
-                      'added to the database successfully.'
+
+def download_daily_package(status_entry):
+    '''
+    Method retrieves the daily package .tar.gz archive file defined by `status_entry.file_name`
+    from the TED ftp server and returns the path of the downloaded file
+
+     * If processing of the file is not being resumed, the checkpoint on `status_entry` is reset
+     * If processing is being resumed and the file is still on disk, it is not downloaded again
+     * If the download fails, `status_entry` is set to `ERROR`
+    '''
+
+    upload_file_path = get_daily_package_file_path(status_entry.file_name)
+
+    if not status_entry.is_resumable():
+        # Start from the beginning
+        status_entry.reset_checkpoint()
+
+    # The archive is kept on timeout so only download it if we don't have it already
+    if not status_entry.is_resumable() or not os.path.isfile(upload_file_path):
+
+        status_entry.set_status(DailyPackageDownloadStatus.DOWNLOADING)
+
+        # Use ftp to retrieve file to temp location
+        with metrics.record_stage_duration(status_entry, 'download_seconds'):
+            return_str = retrieve_daily_package_file(status_entry.file_name)
+
+        # Record if error. Success is code 226, otherwise error
+        if not return_str.startswith('226'):
+            status_entry.set_status(DailyPackageDownloadStatus.ERROR, return_str)
 
         else:
-            msg_str = 'Uploaded file processed successfully but no valid Contract Award ' + \
-                      'Notice data was found.'
+            metrics.record_download_size(status_entry, upload_file_path)
+
+    return upload_file_path
+
+
+def clear_daily_package_workspace(file_name, keep_partial_downloads=False):
+    '''
+    Method removes the workspace folder of the daily package defined by the input `file_name`
+    string using `clear_temp_files_dir`, see `get_daily_package_workspace`. Other daily packages'
+    workspaces are left alone
+
+    If `keep_partial_downloads` is True, a partially downloaded daily package is kept so its
+    download can be carried on from where it stopped
+    '''
+
+    workspace_dir = os.path.join(settings.TEMP_FILES_DIR, file_name.split('.')[0])
+
+    if not os.path.isdir(workspace_dir):
+        return
 
-        status_entry.set_status(DailyPackageDownloadStatus.COMPLETE, msg_str)
+    clear_temp_files_dir(keep_partial_downloads, workspace_dir)
 
-    # Delete all the files as we have now finished
-    clear_temp_files_dir()
+    if not os.listdir(workspace_dir):
+        os.rmdir(workspace_dir)
 
 
-def connect_to_ftp():
+def clear_temp_files_dir(keep_partial_downloads=False, dir_path=None):
     '''
-    Method tries to connect to the ftp using credentials supplied in `django.conf.settings`.
+    Method removes all files and folders in the `TEMP_FILES_DIR`, or in `dir_path` if supplied,
+    e.g. a daily package workspace
 
-     * If successful, return a tuple of (True, `ftplib.FTP` instance)
-     * If unsuccessful, return a tuple of (False, None)
+    If `keep_partial_downloads` is True, partially downloaded daily packages are kept so their
+    download can be carried on from where it stopped
     '''
 
-    # Try to connect to host
+    dir_path = dir_path or settings.TEMP_FILES_DIR
+
+    for filename in os.listdir(dir_path):
+        file_path = os.path.join(dir_path, filename)
+
+        if keep_partial_downloads and filename.endswith(ftp.PARTIAL_DOWNLOAD_SUFFIX):
+            continue
+
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+        elif os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+
+    return True
+
+
+def fetch_daily_package_file(file_name, mirror_entry=None):
+    '''
+    Method saves the daily package .tar.gz archive file defined by the input `file_name` string to
+    a temporary location, copying it from the daily package mirror using `mirror_entry` if
+    supplied, otherwise retrieving it from the TED ftp server
+
+    Doesn't use the database so can be called from other threads. Returns a string indicating an
+    error or success
+    '''
+
+    destination_file_path = get_daily_package_file_path(file_name)
+
+    if mirror_entry and mirror.restore_daily_package_file(mirror_entry, destination_file_path):
+        return mirror.MIRROR_RETURN_STR
+
+    return ftp.transfer_daily_package_file(file_name, destination_file_path)
+
+
+def filter_daily_package_member(member):
+    '''
+    Method runs the `check_xml_header` pre-filter over a `(member_name, xml_data)` tuple read from
+    a daily package archive
+
+     * If the file could contain data we are interested in, return the tuple unmodified
+     * If not, return None
+
+    Defined at module level so it can be sent to pool worker processes by
+    `iter_daily_package_candidates`
+    '''
+
+    _, xml_data = member
+
+    if parsing.check_xml_header(io.BytesIO(xml_data)):
+        return member
+
+    return None
+
+
+def find_incomplete_daily_packages(start_date, end_date):
+    '''
+    Method returns a sorted list of the file names of the daily packages on the TED ftp server
+    published between the `start_date` and `end_date` `datetime.date` objects inclusive that
+    haven't been processed successfully:
+
+     * Packages without a `DailyPackageDownloadStatus` entry
+     * Packages with an entry that isn't `COMPLETE`, e.g. `ERROR` or `TIMEOUT`. `ERROR` packages
+       are left out once `catch_up_daily_packages_task` has tried them
+       `settings.CATCH_UP_MAX_ATTEMPTS` times, so a package that can't be processed isn't retried
+       forever
+
+    Packages being processed are left out. These are packages claimed by a worker, see
+    `DailyPackageDownloadStatus.claim`, or downloading or processing within the last
+    `settings.DAILY_PACKAGE_CLAIM_TIMEOUT` seconds
+    '''
+
+    file_names = ftp.list_daily_packages(start_date, end_date)
+    status_entries = DailyPackageDownloadStatus.objects.in_bulk(file_names, field_name='file_name')
+
+    now = timezone.now()
+    stalled_before = now - datetime.timedelta(seconds=settings.DAILY_PACKAGE_CLAIM_TIMEOUT)
+
+    incomplete_file_names = []
+
+    for file_name in file_names:
+        status_entry = status_entries.get(file_name)
+
+        if status_entry:
+            if status_entry.status == DailyPackageDownloadStatus.COMPLETE:
+                continue
+
+            if status_entry.claimed_until and status_entry.claimed_until > now:
+                continue
+
+            if status_entry.is_error() and \
+                status_entry.catch_up_attempts >= settings.CATCH_UP_MAX_ATTEMPTS:
+                continue
+
+            if status_entry.status in [DailyPackageDownloadStatus.DOWNLOADING,
+                                       DailyPackageDownloadStatus.PROCESSING] and \
+                status_entry.modified > stalled_before:
+                continue
+
+        incomplete_file_names.append(file_name)
+
+    return incomplete_file_names
+
+
+def get_daily_package_file_path(file_name):
+    '''
+    Method returns the path the daily package .tar.gz archive file defined by the input
+    `file_name` string is downloaded to, in its workspace from `get_daily_package_workspace`
+    '''
+
+    return os.path.join(get_daily_package_workspace(file_name), file_name)
+
+
+def get_daily_package_workspace(file_name):
+    '''
+    Method returns the path of the workspace folder for the daily package defined by the input
+    `file_name` string, creating it if it doesn't exist
+
+    Each daily package has its own folder in `settings.TEMP_FILES_DIR`, e.g. 20190802_201901, so
+    packages can be downloaded and processed at the same time without touching each other's
+    files. The folder is named after the package so a retry finds the files of an earlier attempt
+    '''
+
+    workspace_dir = os.path.join(settings.TEMP_FILES_DIR, file_name.split('.')[0])
+
+    os.makedirs(workspace_dir, exist_ok=True)
+
+    return workspace_dir
+
+
+def ingest_daily_package(status_entry, upload_file_path, fileobj=None):
+    '''
+    Method creates new `tenders` and `lots` from the daily package .tar.gz archive file at
+    `upload_file_path` that has been downloaded for `status_entry`
+
+     * Streams each file out of the archive using `iter_daily_package_members`
+     * Creates new `tenders` and `lots` if file contains data we are interested in
+     * Sets `status_entry` to `COMPLETE`, or `ERROR` if the archive is not valid
+
+    Progress is checkpointed on `status_entry` as files are processed. If a previous run timed
+    out, processing carries on from the file after `status_entry.last_member_name`
+
+    If `fileobj` is supplied, the archive is read from it while it downloads, see
+    `stream_daily_package`
+    '''
+
+    status_entry.set_status(DailyPackageDownloadStatus.PROCESSING)
+
     try:
-        ftp = ftplib.FTP(settings.TED_FTP_ROOT, user=settings.TED_FTP_USERNAME,
-                         passwd=settings.TED_FTP_PASSWORD)
-        connection_successful = True
+        # Loop through the files in the archive that pass the `check_xml_header` pre-filter
+        create_tenders_from_candidates(
+            status_entry,
+            iter_daily_package_candidates(
+                upload_file_path, settings.BULK_TENDER_CREATE_WORKERS,
+                status_entry.last_member_name, fileobj, status_entry.run_metrics,
+                include_rejected=True
+            )
+        )
 
-    except ConnectionRefusedError:
-        ftp = None
-        connection_successful = False
+    except ARCHIVE_ERRORS:
+        # File is not a tar archive or is corrupt so raise error
+        status_entry.set_status(DailyPackageDownloadStatus.ERROR, ARCHIVE_ERROR_MSG)
 
-    return (connection_successful, ftp)
+    else:
+        complete_daily_package(status_entry)
 
 
-def check_daily_package_exists(date):
+def iter_daily_package_candidates(file_path, workers=0, resume_after=None, fileobj=None,
+                                  run_metrics=None, include_rejected=False):
     '''
-    Method checks whether a daily package .tar.gz archive file exists on the TED ftp server for
-    the input `date` `datetime.date` object
+    Generator yields a `(member_name, xml_data)` tuple for each file in the daily package .tar.gz
+    archive at `file_path` that passes `filter_daily_package_member`. Files are yielded in archive
+    order
+
+    If `include_rejected` is True, a `(member_name, None)` tuple is also yielded for each file that
+    doesn't pass, so the caller can checkpoint the files read
 
-    If a daily package exists, return the filename otherwise return None
+     * If `workers` is greater than 1, the pre-filter is spread across a pool of `workers`
+       processes. Files are sent to the pool in batches of `settings.BULK_TENDER_CREATE_BATCH_SIZE`
+       per process so memory stays bounded
+     * Otherwise files are filtered one at a time in this process
+
+    Only plain bytes are passed to and from the pool. Anything that touches the database is left
+    to the caller in the parent process
+
+    `resume_after` and `fileobj` are passed to `iter_daily_package_members`. If supplied, the
+    `members_scanned` count of the `run_metrics` `DailyPackageMetrics` entry is increased for each
+    file read
     '''
 
-    # Return None by default
-    return_file_name = None
+    def read_members():
+        for member_name, member_file in iter_daily_package_members(file_path, resume_after,
+                                                                   fileobj):
+            if run_metrics:
+                run_metrics.members_scanned += 1
+
+            yield member_name, member_file.read()
+
+    members = read_members()
+
+    if workers > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            batch_size = workers * settings.BULK_TENDER_CREATE_BATCH_SIZE
+
+            batch = list(itertools.islice(members, batch_size))
+
+            while batch:
+                for member, candidate in zip(batch, executor.map(
+                        filter_daily_package_member, batch,
+                        chunksize=settings.BULK_TENDER_CREATE_BATCH_SIZE
+                )):
+                    if candidate:
+                        yield candidate
+
+                    elif include_rejected:
+                        yield member[0], None
+
+                batch = list(itertools.islice(members, batch_size))
+
+    else:
+        for member in members:
+            if filter_daily_package_member(member):
+                yield member
+
+            elif include_rejected:
+                yield member[0], None
 
-    # Try to connect to host
-    connection_successful, ftp = connect_to_ftp()
 
-    # Construct the correct file path and see whether a vaild daily package file is there
-    if connection_successful:
+def iter_daily_package_members(file_path, resume_after=None, fileobj=None):
+    '''
+    Generator yields a `(member_name, member_file)` tuple for each file in the daily package
+    .tar.gz archive at `file_path`
+
+    The archive is read as a stream (`r|gz` mode) so nothing is extracted to disk. Each
+    `member_file` is only readable until the next member is requested. If `fileobj` is supplied,
+    e.g. a `DownloadBuffer`, the archive is read from it instead of from `file_path`
+
+    If `resume_after` is a member name, files up to and including that member are skipped without
+    being read. Used to carry on processing from a checkpoint
+
+    Raises `tarfile.ReadError` if the archive is not a valid TED bulk download, i.e. it is empty or
+    the first member is not the package directory
+    '''
+
+    with tarfile.open(file_path, mode='r|gz', fileobj=fileobj) as tar:
+        is_empty = True
+
+        for member in tar:
+            # A valid daily package is a single directory containing the xml files
+            if is_empty and not member.isdir():
+                raise tarfile.ReadError('First member of archive is not a directory.')
+
+            is_empty = False
+
+            if resume_after:
+                # Still skipping files that were processed by a previous run
+                if member.name == resume_after:
+                    resume_after = None
+
+            elif member.isfile():
+                yield member.name, tar.extractfile(member)
+
+        if is_empty:
+            raise tarfile.ReadError('Archive is empty.')
+
+
+def parse_daily_package_shard(status_entry, shard_index, shard_count):
+    '''
+    Method runs the `check_xml_header` pre-filter over one shard of the files in the daily package
+    .tar.gz archive defined by `status_entry`. The shard is every `shard_count`th file starting
+    from `shard_index`
+
+    Returns a list of `(member_index, member_name, xml_str)` tuples for the candidate files in the
+    shard. `xml_str` is the raw file decoded as latin-1, which maps each byte to one character so
+    the tuple can be serialised to json and encoded back to the original bytes exactly
+
+    The archive is downloaded once by `download_daily_package` before the shards start. If it
+    isn't on this machine, it is copied from the daily package mirror to a file of the shard's own
+    rather than downloaded from the ftp server again. If the archive is missing or not valid,
+    `status_entry` is set to `ERROR` and an empty list is returned
+    '''
+
+    candidates = []
+
+    upload_file_path = get_daily_package_file_path(status_entry.file_name)
+    shard_file_path = '{}.{:d}'.format(upload_file_path, shard_index)
+
+    if not status_entry.is_error():
+        # Shards may run on a different machine to the download
+        if not os.path.isfile(upload_file_path) and settings.DAILY_PACKAGE_MIRROR_ENABLED:
+            mirror_entry = DailyPackageMirror.objects.filter(
+                file_name=status_entry.file_name
+            ).first()
+
+            if mirror_entry and mirror.restore_daily_package_file(mirror_entry, shard_file_path):
+                upload_file_path = shard_file_path
+
         try:
-            for file_name, _ in ftp.mlsd(
-                    path='daily-packages/{:d}/{:02d}'.format(date.year, date.month)):
+            for member_index, (member_name, member_file) in enumerate(
+                    iter_daily_package_members(upload_file_path)):
 
-                # Check if the file_name is the expected format for the input date. If it is,
-                # return it
-                if file_name.startswith(date.strftime('%Y%m%d')):
-                    return_file_name = file_name
-                    break
+                # Files outside this shard are skipped without being read
+                if member_index % shard_count == shard_index:
+                    xml_data = member_file.read()
 
-        except ftplib.all_errors:
-            # If error, fail silently and just return None by default
-            pass
+                    if parsing.check_xml_header(io.BytesIO(xml_data)):
+                        candidates.append((member_index, member_name, xml_data.decode('latin-1')))
 
-        ftp.close()
+        except ARCHIVE_ERRORS + (OSError, ):
+            # File is missing, not a tar archive or is corrupt so raise error
+            status_entry.set_status(DailyPackageDownloadStatus.ERROR, ARCHIVE_ERROR_MSG)
 
-    return return_file_name
+            candidates = []
 
+        if upload_file_path == shard_file_path:
+            os.remove(shard_file_path)
 
-def clear_temp_files_dir():
+    return candidates
+
+
+def resolve_pending_contract_award_notices():
     '''
-    Method removes all files and folders in the `TEMP_FILES_DIR`
+    Method creates new `ContractAwardNotice` entries and lots from the `PendingContractAwardNotice`
+    entries whose contract notice is now in the database, and returns the number created
+
+    The pending entries are found with a single query joined to the `ContractNotice` table and
+    are deleted once handled, including those that no longer pass `check_notice_record`, e.g.
+    because the award notice has been created by another route
     '''
 
-    for filename in os.listdir(settings.TEMP_FILES_DIR):
-        file_path = os.path.join(settings.TEMP_FILES_DIR, filename)
+    pending_entries = list(PendingContractAwardNotice.objects.filter(
+        ref_notice_ojs__in=models.ContractNotice.objects.values('ojs_ref')
+    ))
 
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+    if not pending_entries:
+        return 0
 
-        elif os.path.isdir(file_path):
-            shutil.rmtree(file_path)
+    lot_sources = {
+        pending_entry.ojs_ref: bytes(pending_entry.xml_data) for pending_entry in pending_entries
+    }
 
-    return True
+    notice_records = [
+        notice_record for notice_record, _ in (
+            helpers.read_notice_record(xml_data) for xml_data in lot_sources.values()
+        )
+        if notice_record is not None
+    ]
+
+    with transaction.atomic():
+        known_ojs_refs = helpers.get_known_ojs_refs(notice_records)
+
+        new_entries = helpers.create_new_tenders([
+            notice_record for notice_record in notice_records
+            if helpers.check_notice_record(notice_record, known_ojs_refs)[0]
+        ], lot_sources)
+
+        PendingContractAwardNotice.objects.filter(
+            pk__in=[pending_entry.pk for pending_entry in pending_entries]
+        ).delete()
+
+    return len(new_entries)
 
 
 def retrieve_daily_package_file(file_name):
     '''
-    Method retrieves a daily package .tar.gz archive file from the TED ftp server and saves it to
-    a temporary location. The file retrieved is defined by the input `file_name` string
+    Method retrieves a daily package .tar.gz archive file and saves it to a temporary location.
+    The file retrieved is defined by the input `file_name` string
+
+     * If the file is in the daily package mirror, it is copied from there
+     * Otherwise it is retrieved from the TED ftp server
 
     `check_daily_package_exists` should be called first to confirm the file exists on the ftp
-    server
+    server. Files retrieved from the ftp server aren't added to the mirror here, as the upload could
+    push the calling task past its time limit. `sync_daily_package_mirror_task` mirrors them later
 
     Returns a string indicating an error or success
     '''
 
-    destination_file_path = os.path.join(settings.TEMP_FILES_DIR, file_name)
+    mirror_entry = None
+
+    if settings.DAILY_PACKAGE_MIRROR_ENABLED:
+        mirror_entry = DailyPackageMirror.objects.filter(file_name=file_name).first()
+
+    return fetch_daily_package_file(file_name, mirror_entry)
+
+
+def stream_daily_package(status_entry):
+    '''
+    Method creates new `tenders` and `lots` from the daily package defined by `status_entry` while
+    it downloads from the TED ftp server, so download and processing times overlap
+
+     * `stream_daily_package_file` downloads the file in another thread into a `DownloadBuffer`
+     * `ingest_daily_package` reads the archive from the buffer in this thread as blocks arrive
+     * The file is also saved to its workspace as it downloads, so processing can carry on from
+       it if the task times out after the download finished
+     * If the download fails part way, the partial file is kept and the next attempt carries on
+       from it, passing the blocks already downloaded to the buffer first
+
+    If the download fails, `status_entry` is set to `ERROR`. The file isn't added to the daily
+    package mirror, see `retrieve_daily_package_file`
+    '''
+
+    upload_file_path = get_daily_package_file_path(status_entry.file_name)
 
-    # Try to connect to host
-    connection_successful, ftp = connect_to_ftp()
+    if not status_entry.is_resumable():
+        # Start from the beginning
+        status_entry.reset_checkpoint()
+
+    download_buffer = ftp.DownloadBuffer()
+
+    def download_file():
+        with metrics.record_stage_duration(status_entry, 'download_seconds'):
+            return stream_daily_package_file(status_entry.file_name, download_buffer)
+
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        download = executor.submit(download_file)
 
-    # Construct the correct file path and see whether a vaild daily package file is there
-    if connection_successful:
         try:
-            # Change directory to the correct location defined by the filename
-            ftp.cwd('daily-packages/{}/{}'.format(file_name[:4], file_name[4:6]))
+            ingest_daily_package(status_entry, upload_file_path, download_buffer)
 
-            # Retrieve correct file and save to temp location
-            return_str = ftp.retrbinary(
-                'RETR ' + file_name, open(destination_file_path, 'wb').write
-            )
+            # The archive can end before the last blocks, so let the download finish to save the
+            # whole file
+            if not status_entry.is_error():
+                while download_buffer.read(ftp.STREAMING_BLOCK_SIZE):
+                    pass
 
-        except ftplib.all_errors as err:
-            # If there is an error, an empty file may have been created so clear the
-            # `TEMP_FILES_DIR`
-            clear_temp_files_dir()
+        finally:
+            # Stop the download if processing stopped early, e.g. the task timed out
+            download_buffer.close()
 
-            return_str = str(err)
+        return_str = download.result()
 
-        ftp.close()
+    # Record if error. Success is code 226, otherwise error. If the download was cancelled because
+    # processing stopped, e.g. the archive wasn't valid, keep that error instead
+    if not return_str.startswith('226'):
+        if return_str != ftp.DOWNLOAD_CANCELLED_MSG:
+            status_entry.set_status(DailyPackageDownloadStatus.ERROR, return_str)
 
     else:
-        # There was an error in the connection so return this
-        return_str = 'Could not connect to the ftp.'
+        metrics.record_download_size(status_entry, upload_file_path)
+
+
+def stream_daily_package_file(file_name, download_buffer):
+    '''
+    Method retrieves a daily package .tar.gz archive file from the TED ftp server using
+    `transfer_daily_package_file`, adding each block to `download_buffer` as it arrives. The file
+    retrieved is defined by the input `file_name` string
+
+    Doesn't use the database so can be called from other threads. Returns a string indicating an
+    error or success
+    '''
+
+    try:
+        return_str = ftp.transfer_daily_package_file(
+            file_name, get_daily_package_file_path(file_name), download_buffer.write
+        )
+
+    finally:
+        download_buffer.finish()
 
     return return_str
+
+
+def sync_daily_package_mirror(start_date, end_date):
+    '''
+    Method copies the daily packages on the TED ftp server published between the `start_date` and
+    `end_date` `datetime.date` objects inclusive to the daily package mirror
+
+    Packages are compared with the mirror using the size and modify MLSD facts, so only new or
+    changed packages are downloaded. Returns a list of the file names mirrored
+    '''
+
+    file_names = ftp.list_daily_packages(start_date, end_date)
+    mirror_entries = DailyPackageMirror.objects.in_bulk(file_names, field_name='file_name')
+
+    mirrored_file_names = []
+
+    for file_name in file_names:
+        facts = ftp.get_daily_package_listing(int(file_name[:4]), int(file_name[4:6]))[file_name]
+        mirror_entry = mirror_entries.get(file_name)
+
+        if mirror_entry and mirror_entry.matches_ftp_facts(facts):
+            continue
+
+        upload_file_path = get_daily_package_file_path(file_name)
+
+        if fetch_daily_package_file(file_name).startswith('226'):
+            mirror.mirror_daily_package_file(file_name, upload_file_path, facts)
+            mirrored_file_names.append(file_name)
+
+        clear_daily_package_workspace(file_name, keep_partial_downloads=True)
+
+    return mirrored_file_names
+
+
+def write_daily_package_batch(status_entry, batch, last_member_name=None):
+    '''
+    Method creates new `ContractNotice` and `ContractAwardNotice` entries and lots from `batch`, a
+    list of `(member_name, xml_data)` tuples, and checkpoints `status_entry` in a single transaction
+
+    The checkpoint is set to `last_member_name` if supplied, e.g. the last file read from the
+    archive when it was rejected by the pre-filter, otherwise to the last file in `batch`
+
+    Contract notices are written before contract award notices so an award notice can reference a
+    contract notice from the same batch. The ojs_refs already in the database are looked up for
+    the whole batch at once using `get_known_ojs_refs`, so processing a package again only costs
+    a couple of queries per batch. Files are read with `tenders.helpers.read_notice_record`, so
+    files read before aren't parsed again
+
+    Contract award notices that are only rejected because their contract notice isn't in the
+    database yet are kept as `PendingContractAwardNotice` entries, see
+    `resolve_pending_contract_award_notices`
+
+    If `settings.DAILY_PACKAGE_VALIDATE_SCHEMA` is True, files that aren't valid against their xml
+    schema are skipped. Only files that pass `tenders.helpers.check_notice_content` are validated
+    '''
+
+    notice_records = {
+        settings.CONTRACT_NOTICE_CODE: [], settings.CONTRACT_AWARD_NOTICE_CODE: []
+    }
+    lot_sources = {}
+
+    with metrics.record_stage_duration(status_entry, 'parse_seconds'):
+        for _, xml_data in batch:
+            # The lots are read from `xml_data` when the entries are written, so they aren't kept
+            # in the record
+            notice_record, content_errors = helpers.read_notice_record(xml_data)
+
+            # Skip the file if it contains invalid syntax or data we don't want, so it isn't
+            # looked up in the database
+            if notice_record is not None and not content_errors:
+                notice_records[notice_record.doc_type_code].append(notice_record)
+                lot_sources[notice_record.ojs_ref] = xml_data
+
+    if settings.DAILY_PACKAGE_VALIDATE_SCHEMA:
+        with metrics.record_stage_duration(status_entry, 'validate_seconds'):
+            for doc_type_code, doc_type_records in notice_records.items():
+                valid_records = []
+
+                for notice_record in doc_type_records:
+                    # The lots aren't in the record's tree, so the whole file is read again
+                    root, _ = parsing.get_xml_root(io.BytesIO(lot_sources[notice_record.ojs_ref]))
+                    is_valid, _ = parsing.check_xml_schema(root)
+
+                    if is_valid:
+                        valid_records.append(notice_record)
+
+                    elif status_entry.run_metrics:
+                        status_entry.run_metrics.members_invalid += 1
+
+                notice_records[doc_type_code] = valid_records
+
+    new_entry_counts = {}
+
+    with metrics.record_stage_duration(status_entry, 'write_seconds'), transaction.atomic():
+        known_ojs_refs = helpers.get_known_ojs_refs(
+            list(itertools.chain.from_iterable(notice_records.values()))
+        )
+
+        pending_entries = []
+
+        for doc_type_code in [settings.CONTRACT_NOTICE_CODE, settings.CONTRACT_AWARD_NOTICE_CODE]:
+            valid_records = []
+
+            for notice_record in notice_records[doc_type_code]:
+                is_valid, error_list = helpers.check_notice_record(notice_record, known_ojs_refs)
+
+                if is_valid:
+                    valid_records.append(notice_record)
+
+                # Keep the award notice if the missing contract notice is the only error
+                elif doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE and \
+                    len(error_list) == 1 and \
+                    notice_record.ref_notice_ojs not in known_ojs_refs[models.ContractNotice]:
+                    pending_entries.append(PendingContractAwardNotice(
+                        ojs_ref=notice_record.ojs_ref,
+                        ref_notice_ojs=notice_record.ref_notice_ojs,
+                        status_entry=status_entry, xml_data=lot_sources[notice_record.ojs_ref]
+                    ))
+
+            new_entries = helpers.create_new_tenders(valid_records, lot_sources)
+
+            # Contract award notices are checked after the contract notices are written, so award
+            # notices can find the contract notices from this batch
+            if doc_type_code == settings.CONTRACT_NOTICE_CODE:
+                known_ojs_refs[models.ContractNotice].update(
+                    new_entry.ojs_ref for new_entry in new_entries
+                )
+
+            new_entry_counts[doc_type_code] = len(new_entries)
+
+        # Award notices already pending from a previous run are left as they are
+        PendingContractAwardNotice.objects.bulk_create(pending_entries, ignore_conflicts=True)
+
+        # Record progress in case the task times out
+        status_entry.set_checkpoint(
+            last_member_name or batch[-1][0],
+            contract_notice_count=new_entry_counts[settings.CONTRACT_NOTICE_CODE],
+            contract_award_notice_count=new_entry_counts[settings.CONTRACT_AWARD_NOTICE_CODE]
+        )
+
+    # Show progress of the run, e.g. on the `bulk_upload_progress` page
+    metrics.save_run_metrics(status_entry)
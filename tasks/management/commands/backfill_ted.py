@@ -0,0 +1,86 @@
+'''
+Management command to create new `tenders` and `lots` from every TED daily package published in a
+date range
+'''
+
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import helpers
+from tasks.tasks import backfill_daily_packages_task
+
+
+def parse_date(date_str):
+    '''
+    Returns a `datetime.date` object from a '%d/%m/%Y' `date_str` command line argument
+    '''
+
+    try:
+        return datetime.datetime.strptime(date_str, '%d/%m/%Y').date()
+
+    except ValueError:
+        raise CommandError('"{}" is not a valid date. Use the format dd/mm/yyyy.'.format(date_str))
+
+
+class Command(BaseCommand):
+    '''
+    Lists the daily packages on the TED ftp server between `--from` and `--to`, downloads them
+    over up to `settings.TED_FTP_MAX_CONNECTIONS` connections and creates new `tenders` and
+    `lots` from each one using `tasks.helpers.backfill_daily_packages`
+
+    With `--reprocess`, the daily packages in the package mirror are processed again without
+    using the ftp server, e.g. after a fix to how notices are read
+    '''
+
+    help = 'Create new tenders and lots from every TED daily package published in a date range.'
+
+    def add_arguments(self, parser):
+        '''
+        Defines the command line arguments
+        '''
+
+        parser.add_argument('--from', dest='from_date', required=True,
+                            help='First publication date to backfill, dd/mm/yyyy.')
+        parser.add_argument('--to', dest='to_date', required=True,
+                            help='Last publication date to backfill, dd/mm/yyyy.')
+        parser.add_argument('--reprocess', action='store_true',
+                            help='Process the daily packages in the package mirror again, ' +
+                            'including packages already processed.')
+        parser.add_argument('--delay', action='store_true',
+                            help='Run the backfill in a celery task rather than in this process.')
+
+    def handle(self, *args, **options):
+        '''
+        Runs the backfill and writes a line of progress for each daily package
+        '''
+
+        from_date = parse_date(options['from_date'])
+        to_date = parse_date(options['to_date'])
+
+        if from_date > to_date:
+            raise CommandError('--from date must not be after --to date.')
+
+        if options['delay']:
+            backfill_daily_packages_task.delay(
+                options['from_date'], options['to_date'], options['reprocess']
+            )
+
+            self.stdout.write('backfill_daily_packages_task started.')
+
+        else:
+            status_entries = helpers.backfill_daily_packages(
+                from_date, to_date, progress=self.write_progress, reprocess=options['reprocess']
+            )
+
+            self.stdout.write('{:d} daily package(s) processed.'.format(len(status_entries)))
+
+    def write_progress(self, status_entry):
+        '''
+        Writes the status of a finished daily package
+        '''
+
+        self.stdout.write('{}: {} {}'.format(
+            status_entry.file_name, status_entry.get_status_display(), status_entry.status_msg
+        ))
@@ -0,0 +1,55 @@
+'''
+Management command to compare the serial and parallel daily package pre-filter used by
+`tasks.helpers.bulk_tender_create`
+'''
+
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from tasks import helpers
+
+
+class Command(BaseCommand):
+    '''
+    Times `iter_daily_package_candidates` over a local daily package .tar.gz archive for each
+    requested number of worker processes. Nothing is written to the database
+    '''
+
+    help = 'Benchmark the serial and parallel pre-filter of a daily package .tar.gz archive.'
+
+    def add_arguments(self, parser):
+        '''
+        Defines the command line arguments
+        '''
+
+        parser.add_argument('file_path', help='Path to a daily package .tar.gz archive.')
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[0, 2, 4],
+            help='Numbers of worker processes to benchmark. 0 is the serial path.'
+        )
+
+    def handle(self, *args, **options):
+        '''
+        Runs the benchmark and writes a line of results for each number of workers
+        '''
+
+        members_scanned = sum(
+            1 for _ in helpers.iter_daily_package_members(options['file_path'])
+        )
+
+        for workers in options['workers']:
+            start = time.perf_counter()
+
+            candidates = sum(
+                1 for _ in helpers.iter_daily_package_candidates(options['file_path'], workers)
+            )
+
+            duration = time.perf_counter() - start
+
+            self.stdout.write(
+                '{:d} worker(s): {:d} of {:d} file(s) matched in {:.2f}s ({:.0f} files/s)'.format(
+                    workers, candidates, members_scanned, duration, members_scanned / duration
+                )
+            )
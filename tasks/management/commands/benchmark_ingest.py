@@ -0,0 +1,109 @@
+'''
+Management command to benchmark the daily package ingestion used by
+`tasks.helpers.bulk_tender_create` end to end
+'''
+
+
+import datetime
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import benchmarks
+
+
+class Command(BaseCommand):
+    '''
+    Builds synthetic daily packages with `tasks.benchmarks.create_synthetic_daily_package`, or uses
+    the daily packages given with `--package-file`, and runs `tasks.benchmarks.run_ingest_benchmark`
+    over them against the local ftp stand-in. Writes the files/s, database queries and peak RSS
+    for each stage of each package
+
+    Nothing is left in the database and the TED ftp server isn't used
+    '''
+
+    help = 'Benchmark the download, filter, parse and write stages of daily package ingestion.'
+
+    def add_arguments(self, parser):
+        '''
+        Defines the command line arguments
+        '''
+
+        parser.add_argument('--packages', type=int, default=1,
+                            help='Number of synthetic daily packages to build.')
+        parser.add_argument('--notices', type=int, default=2000,
+                            help='Number of xml files in each synthetic daily package.')
+        parser.add_argument('--match-rate', type=float, default=0.05,
+                            help='Fraction of the xml files that pass the pre-filter.')
+        parser.add_argument('--award-rate', type=float, default=0.5,
+                            help='Fraction of the matching xml files that are contract award ' +
+                            'notices.')
+        parser.add_argument('--lots', type=int, nargs=2, default=[1, 10], metavar=('MIN', 'MAX'),
+                            help='Range of the number of lots in each notice.')
+        parser.add_argument('--schemas', nargs='+', default=list(benchmarks.NOTICE_TEMPLATES),
+                            choices=list(benchmarks.NOTICE_TEMPLATES),
+                            help='Schema versions of the notices.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed for the synthetic daily packages.')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Number of pre-filter worker processes. 0 is the serial path.')
+        parser.add_argument('--package-file', nargs='+', dest='package_files',
+                            help='Benchmark these daily package .tar.gz archives instead of ' +
+                            'synthetic ones.')
+
+    def handle(self, *args, **options):
+        '''
+        Runs the benchmark and writes the results
+        '''
+
+        if not 0 <= options['match_rate'] <= 1 or not 0 <= options['award_rate'] <= 1:
+            raise CommandError('--match-rate and --award-rate must be between 0 and 1.')
+
+        if not 0 < options['lots'][0] <= options['lots'][1]:
+            raise CommandError('--lots must be a range of at least 1 lot.')
+
+        package_dir = tempfile.mkdtemp()
+
+        try:
+            package_paths = options['package_files'] or [
+                benchmarks.create_synthetic_daily_package(
+                    package_dir,
+                    '{:%Y%m%d}_{:%Y}{:02d}.tar.gz'.format(
+                        datetime.date(2019, 1, 1) + datetime.timedelta(days=index),
+                        datetime.date(2019, 1, 1), index + 1
+                    ),
+                    options['notices'], match_rate=options['match_rate'],
+                    award_rate=options['award_rate'], lot_counts=tuple(options['lots']),
+                    schema_versions=options['schemas'], seed=options['seed'] + index
+                )
+                for index in range(options['packages'])
+            ]
+
+            try:
+                results = benchmarks.run_ingest_benchmark(package_paths, options['workers'])
+
+            except RuntimeError as err:
+                raise CommandError(err)
+
+        finally:
+            shutil.rmtree(package_dir)
+
+        for result in results:
+            self.stdout.write(
+                '{file_name}: {notices:d} file(s), {candidates:d} candidate(s), '
+                '{contract_notices:d} contract notice(s) and {contract_award_notices:d} '
+                'contract award notice(s) created'.format(**result)
+            )
+
+            for stage in result['stages']:
+                self.stdout.write(
+                    '  {stage:<8} {items:>7d} file(s) in {seconds:7.3f}s ({per_second:9.0f} '
+                    'files/s), {queries:5d} queries, peak RSS {peak_rss:d}KB'.format(**stage)
+                )
+
+            seconds = sum(stage['seconds'] for stage in result['stages'])
+
+            self.stdout.write('  {:<8} {:>7d} file(s) in {:7.3f}s ({:9.0f} files/s)'.format(
+                'total', result['notices'], seconds, result['notices'] / seconds
+            ))
@@ -0,0 +1,63 @@
+'''
+Management command to compare the default lxml parser with the shared parser used to read TED xml
+files
+'''
+
+
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import benchmarks
+
+
+class Command(BaseCommand):
+    '''
+    Runs `tasks.benchmarks.run_parser_benchmark` over the TED xml files given with `--xml-file`, or
+    the xml files in `settings.TEST_FILES_DIR`, and writes the time taken by each parser and the
+    size of the trees they build. Nothing is written to the database
+    '''
+
+    help = 'Benchmark the default lxml parser against the shared parser used to read TED xml files.'
+
+    def add_arguments(self, parser):
+        '''
+        Defines the command line arguments
+        '''
+
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of times each file is parsed.')
+        parser.add_argument('--xml-file', nargs='+', dest='xml_files',
+                            help='Benchmark these TED xml files instead of the test files.')
+
+    def handle(self, *args, **options):
+        '''
+        Runs the benchmark and writes the results
+        '''
+
+        file_paths = options['xml_files'] or sorted(
+            glob.glob(os.path.join(settings.TEST_FILES_DIR, '*-OJS*.xml'))
+        )
+
+        try:
+            results = benchmarks.run_parser_benchmark(file_paths, options['repeat'])
+
+        except RuntimeError as err:
+            raise CommandError(err)
+
+        parses = len(file_paths) * options['repeat']
+
+        for label in ['default', 'shared']:
+            self.stdout.write(
+                '{:<8} {:>7d} parse(s) in {:7.3f}s ({:9.0f} per second), {:d} nodes'.format(
+                    label, parses, results[label]['seconds'],
+                    parses / results[label]['seconds'], results[label]['nodes']
+                )
+            )
+
+        self.stdout.write('Shared parser is {:.1f}x faster and builds {:.0%} of the nodes.'.format(
+            results['default']['seconds'] / results['shared']['seconds'],
+            results['shared']['nodes'] / results['default']['nodes']
+        ))
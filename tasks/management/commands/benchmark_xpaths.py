@@ -0,0 +1,55 @@
+'''
+Management command to compare string xpaths with the precompiled xpaths in `tenders.xpaths`
+'''
+
+
+import glob
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks import benchmarks
+
+
+class Command(BaseCommand):
+    '''
+    Runs `tasks.benchmarks.run_xpath_benchmark` over the TED xml files given with `--xml-file`, or
+    the xml files in `settings.TEST_FILES_DIR`, and writes the time taken by each way of
+    evaluating the xpaths. Nothing is written to the database
+    '''
+
+    help = 'Benchmark string xpaths against the precompiled xpaths used to read TED xml files.'
+
+    def add_arguments(self, parser):
+        '''
+        Defines the command line arguments
+        '''
+
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of times each xpath is evaluated on each file.')
+        parser.add_argument('--xml-file', nargs='+', dest='xml_files',
+                            help='Benchmark these TED xml files instead of the test files.')
+
+    def handle(self, *args, **options):
+        '''
+        Runs the benchmark and writes the results
+        '''
+
+        file_paths = options['xml_files'] or sorted(
+            glob.glob(os.path.join(settings.TEST_FILES_DIR, '*-OJS*.xml'))
+        )
+
+        try:
+            results = benchmarks.run_xpath_benchmark(file_paths, options['repeat'])
+
+        except RuntimeError as err:
+            raise CommandError(err)
+
+        for label, seconds in [('string', results['string_seconds']),
+                               ('compiled', results['compiled_seconds'])]:
+            self.stdout.write('{:<8} {:>7d} evaluation(s) in {:7.3f}s ({:9.0f} per second)'.format(
+                label, results['evaluations'], seconds, results['evaluations'] / seconds
+            ))
+
+        self.stdout.write('Precompiled xpaths are {:.1f}x faster.'.format(results['speedup']))
@@ -0,0 +1,98 @@
+'''
+Functions for recording `DailyPackageMetrics` measurements of daily package runs in the `tasks`
+Django app
+'''
+
+
+import contextlib
+import os
+import resource
+import time
+
+from django.db import connection
+
+
+def get_peak_rss():
+    '''
+    Returns the peak resident set size of this process, or of its largest finished child process
+    if larger, e.g. a pre-filter worker process. In kilobytes on Linux
+    '''
+
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def record_download_size(status_entry, file_path):
+    '''
+    Method records the size of the daily package downloaded to `file_path` on the
+    `DailyPackageMetrics` entry for the run in progress on `status_entry`, if there is one
+    '''
+
+    if status_entry.run_metrics and os.path.isfile(file_path):
+        status_entry.run_metrics.bytes_downloaded = os.path.getsize(file_path)
+
+
+@contextlib.contextmanager
+def record_run_metrics(status_entry):
+    '''
+    Context manager records a `DailyPackageMetrics` entry for the run of the daily package for
+    `status_entry` inside the `with` block
+
+     * The entry is created using `status_entry.start_run_metrics`, unless one has already been
+       started for the run
+     * Database queries made in this thread are counted
+     * The entry is saved with the peak memory when the block exits, including when it raises,
+       e.g. if the task times out, so the slow stage can be seen
+
+    The entry is also saved after each batch of files is written, see `save_run_metrics`
+    '''
+
+    metrics = status_entry.run_metrics or status_entry.start_run_metrics()
+
+    def count_query(execute, sql, params, many, context):
+        metrics.query_count += 1
+
+        return execute(sql, params, many, context)
+
+    try:
+        with connection.execute_wrapper(count_query):
+            yield metrics
+
+    finally:
+        save_run_metrics(status_entry)
+
+        status_entry.run_metrics = None
+
+
+@contextlib.contextmanager
+def record_stage_duration(status_entry, field_name):
+    '''
+    Context manager adds the time taken by the `with` block to the `field_name` duration of the
+    `DailyPackageMetrics` entry for the run in progress on `status_entry`, if there is one
+
+    Doesn't use the database so can be used from other threads
+    '''
+
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        metrics = status_entry.run_metrics
+
+        if metrics:
+            setattr(metrics, field_name, getattr(metrics, field_name) + time.perf_counter() - start)
+
+
+def save_run_metrics(status_entry):
+    '''
+    Method saves the `DailyPackageMetrics` entry for the run in progress on `status_entry` with the
+    peak memory so far, if there is one
+    '''
+
+    metrics = status_entry.run_metrics
+
+    if metrics:
+        metrics.peak_memory = get_peak_rss()
+        metrics.save()
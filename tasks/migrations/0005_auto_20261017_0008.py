@@ -0,0 +1,28 @@
+# Generated by Django 2.2.2 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_auto_20200329_2038'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailypackagedownloadstatus',
+            name='contract_award_notice_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='New Contract Award Notices'),
+        ),
+        migrations.AddField(
+            model_name='dailypackagedownloadstatus',
+            name='contract_notice_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='New Contract Notices'),
+        ),
+        migrations.AddField(
+            model_name='dailypackagedownloadstatus',
+            name='last_member_name',
+            field=models.CharField(blank=True, max_length=140, null=True, verbose_name='Last File Processed'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.2 on 2026-10-16 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_auto_20261017_0008'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPackageMirror',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added', models.DateTimeField(auto_now_add=True, verbose_name='Added Timestamp')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Modified Timestamp')),
+                ('file_name', models.CharField(max_length=140, unique=True, verbose_name='File Name')),
+                ('file_date', models.DateTimeField(verbose_name='File Date')),
+                ('size', models.BigIntegerField(verbose_name='Size (bytes)')),
+                ('checksum', models.CharField(max_length=64, verbose_name='SHA-256 Checksum')),
+                ('ftp_modify', models.CharField(blank=True, max_length=20, null=True, verbose_name='FTP Modified Timestamp')),
+            ],
+            options={
+                'verbose_name': 'Daily Package Mirror',
+                'verbose_name_plural': 'Daily Package Mirrors',
+                'ordering': ['-file_date'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.2 on 2026-10-16 23:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_dailypackagemirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPackageMetrics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added', models.DateTimeField(auto_now_add=True, verbose_name='Added Timestamp')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Modified Timestamp')),
+                ('bytes_downloaded', models.BigIntegerField(default=0, verbose_name='Bytes Downloaded')),
+                ('download_seconds', models.FloatField(default=0, verbose_name='Download Duration')),
+                ('extract_seconds', models.FloatField(default=0, verbose_name='Extract Duration')),
+                ('parse_seconds', models.FloatField(default=0, verbose_name='Parse Duration')),
+                ('write_seconds', models.FloatField(default=0, verbose_name='Write Duration')),
+                ('members_scanned', models.PositiveIntegerField(default=0, verbose_name='Files Scanned')),
+                ('members_matched', models.PositiveIntegerField(default=0, verbose_name='Files Matched')),
+                ('query_count', models.PositiveIntegerField(default=0, verbose_name='Database Queries')),
+                ('peak_memory', models.BigIntegerField(default=0, verbose_name='Peak Memory (KB)')),
+                ('status_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tasks.DailyPackageDownloadStatus')),
+            ],
+            options={
+                'verbose_name': 'Daily Package Metrics',
+                'verbose_name_plural': 'Daily Package Metrics',
+                'ordering': ['-added'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.2 on 2026-10-16 23:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_dailypackagemetrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingContractAwardNotice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added', models.DateTimeField(auto_now_add=True, verbose_name='Added Timestamp')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='Modified Timestamp')),
+                ('ojs_ref', models.CharField(max_length=17, unique=True, verbose_name='OJS Reference')),
+                ('ref_notice_ojs', models.CharField(db_index=True, max_length=17, verbose_name='Contract Notice OJS Reference')),
+                ('xml_data', models.BinaryField(verbose_name='XML Data')),
+                ('status_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='tasks.DailyPackageDownloadStatus')),
+            ],
+            options={
+                'verbose_name': 'Pending Contract Award Notice',
+                'verbose_name_plural': 'Pending Contract Award Notices',
+                'ordering': ['-added'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.2 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_pendingcontractawardnotice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailypackagedownloadstatus',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Claimed Until'),
+        ),
+    ]
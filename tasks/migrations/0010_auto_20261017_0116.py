@@ -0,0 +1,23 @@
+# Generated by Django 2.2.2 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_dailypackagedownloadstatus_claimed_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailypackagemetrics',
+            name='members_invalid',
+            field=models.PositiveIntegerField(default=0, verbose_name='Files Invalid'),
+        ),
+        migrations.AddField(
+            model_name='dailypackagemetrics',
+            name='validate_seconds',
+            field=models.FloatField(default=0, verbose_name='Validate Duration'),
+        ),
+    ]
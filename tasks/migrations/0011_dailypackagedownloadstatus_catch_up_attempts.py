@@ -0,0 +1,18 @@
+# Generated by Django 2.2.2 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_auto_20261017_0116'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dailypackagedownloadstatus',
+            name='catch_up_attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Catch-up Attempts'),
+        ),
+    ]
@@ -0,0 +1,108 @@
+'''
+Functions for the daily package mirror used by the `tasks` Django app
+
+Daily packages downloaded from the TED ftp server are copied to the mirror storage so they can be
+processed again without downloading them, see `settings.DAILY_PACKAGE_MIRROR_STORAGE`
+'''
+
+
+import ftplib
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import get_storage_class
+
+from tasks import ftp
+from tasks.models import DailyPackageMirror
+
+
+# Success string returned when a daily package is copied from the daily package mirror
+MIRROR_RETURN_STR = '226 Retrieved from daily package mirror.'
+
+MIRROR_BLOCK_SIZE = 1024 * 1024 # bytes
+
+
+def get_daily_package_mirror_storage():
+    '''
+    Returns the storage used for the daily package mirror, defined by
+    `settings.DAILY_PACKAGE_MIRROR_STORAGE` and `settings.DAILY_PACKAGE_MIRROR_OPTIONS`
+    '''
+
+    return get_storage_class(settings.DAILY_PACKAGE_MIRROR_STORAGE)(
+        **settings.DAILY_PACKAGE_MIRROR_OPTIONS
+    )
+
+
+def mirror_daily_package_file(file_name, file_path, facts=None):
+    '''
+    Method copies the daily package .tar.gz archive file at `file_path` to the daily package
+    mirror and records it in a `DailyPackageMirror` entry for `file_name`, which is returned
+
+    `facts` are the MLSD facts for the file on the ftp server. If not supplied, they are looked up
+    using `get_daily_package_listing`. The file is only copied if the mirror doesn't already have
+    a file with the same checksum
+    '''
+
+    if facts is None:
+        try:
+            facts = ftp.get_daily_package_listing(int(file_name[:4]), int(file_name[4:6])) \
+                .get(file_name, {})
+
+        except ftplib.all_errors:
+            facts = {}
+
+    checksum = hashlib.sha256()
+
+    with open(file_path, 'rb') as package_file:
+        for block in iter(lambda: package_file.read(MIRROR_BLOCK_SIZE), b''):
+            checksum.update(block)
+
+    mirror_entry = DailyPackageMirror.objects.filter(file_name=file_name).first() or \
+        DailyPackageMirror(file_name=file_name)
+
+    mirror_entry.checksum = checksum.hexdigest()
+    mirror_entry.size = os.path.getsize(file_path)
+    mirror_entry.ftp_modify = facts.get('modify')
+
+    storage = get_daily_package_mirror_storage()
+
+    if not storage.exists(mirror_entry.storage_name):
+        with open(file_path, 'rb') as package_file:
+            storage.save(mirror_entry.storage_name, File(package_file))
+
+    mirror_entry.save()
+
+    return mirror_entry
+
+
+def restore_daily_package_file(mirror_entry, destination_file_path):
+    '''
+    Method copies the daily package .tar.gz archive file recorded by `mirror_entry` from the daily
+    package mirror to `destination_file_path`
+
+    Returns `True` if successful, or `False` if the file isn't in the mirror storage or its
+    checksum doesn't match. Doesn't use the database so can be called from other threads
+    '''
+
+    storage = get_daily_package_mirror_storage()
+
+    if not storage.exists(mirror_entry.storage_name):
+        return False
+
+    checksum = hashlib.sha256()
+
+    with storage.open(mirror_entry.storage_name, 'rb') as mirror_file, \
+        open(destination_file_path, 'wb') as destination_file:
+        for block in iter(lambda: mirror_file.read(MIRROR_BLOCK_SIZE), b''):
+            checksum.update(block)
+            destination_file.write(block)
+
+    if checksum.hexdigest() != mirror_entry.checksum:
+        # Mirrored file is corrupt so don't use it
+        os.remove(destination_file_path)
+
+        return False
+
+    return True
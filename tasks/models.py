@@ -5,6 +5,7 @@ Models for the `tasks` Django app
 
 import datetime
 
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -39,6 +40,19 @@ class DailyPackageDownloadStatus(models.Model):
     file_date = models.DateTimeField('File Date')
     status = models.PositiveIntegerField('Status', choices=STATUS_CHOICES, default=IDLE)
     status_msg = models.CharField('Status Message', max_length=400, null=True, blank=True)
+    # Checkpoint used to resume processing if a task times out
+    last_member_name = models.CharField('Last File Processed', max_length=140, null=True,
+                                        blank=True)
+    contract_notice_count = models.PositiveIntegerField('New Contract Notices', default=0)
+    contract_award_notice_count = models.PositiveIntegerField('New Contract Award Notices',
+                                                              default=0)
+    # Set while a worker is processing the daily package, see `claim`
+    claimed_until = models.DateTimeField('Claimed Until', null=True, blank=True)
+    # Number of times `catch_up_daily_packages_task` has started processing the daily package
+    catch_up_attempts = models.PositiveIntegerField('Catch-up Attempts', default=0)
+
+    # `DailyPackageMetrics` entry for the run in progress, see `start_run_metrics`. Not stored
+    run_metrics = None
 
     class Meta:
         app_label = 'tasks'
@@ -46,6 +60,35 @@ class DailyPackageDownloadStatus(models.Model):
         verbose_name = 'Daily Package Download Status'
         verbose_name_plural = 'Daily Package Download Statuses'
 
+    def claim(self):
+        '''
+        Claims the daily package for this worker for `settings.DAILY_PACKAGE_CLAIM_TIMEOUT`
+        seconds. Returns `True` if claimed, or `False` if another worker has already claimed it
+
+        The claim is made with a single conditional update so only one worker can succeed. Release
+        the claim with `release`
+        '''
+
+        now = timezone.now()
+        claimed_until = now + datetime.timedelta(seconds=settings.DAILY_PACKAGE_CLAIM_TIMEOUT)
+
+        claimed = DailyPackageDownloadStatus.objects.filter(pk=self.pk).filter(
+            models.Q(claimed_until__isnull=True) | models.Q(claimed_until__lt=now)
+        ).update(claimed_until=claimed_until)
+
+        if claimed:
+            self.claimed_until = claimed_until
+
+        return bool(claimed)
+
+    def get_latest_metrics(self):
+        '''
+        Returns the `DailyPackageMetrics` entry for the latest run, or None if there hasn't been a
+        run
+        '''
+
+        return self.dailypackagemetrics_set.order_by('-added', '-pk').first()
+
     def is_error(self):
         '''
         Returns `True` if `self.status` is an error, otherwise `False`
@@ -53,6 +96,82 @@ class DailyPackageDownloadStatus(models.Model):
 
         return self.status == self.ERROR
 
+    def is_resumable(self):
+        '''
+        Returns `True` if processing of the daily package was started but did not finish, otherwise
+        `False`
+
+        If `True`, processing can carry on from the file after `last_member_name`
+        '''
+
+        return self.status in [self.PROCESSING, self.TIMEOUT]
+
+    def release(self):
+        '''
+        Releases a claim on the daily package made with `claim`
+
+        If the claim has run out and another worker has claimed the daily package since, their
+        claim is left alone
+        '''
+
+        DailyPackageDownloadStatus.objects.filter(
+            pk=self.pk, claimed_until=self.claimed_until
+        ).update(claimed_until=None)
+
+        self.claimed_until = None
+
+    def renew_claim(self):
+        '''
+        Extends a claim made with `claim` to `settings.DAILY_PACKAGE_CLAIM_TIMEOUT` seconds from
+        now. Returns `True` if renewed, or `False` if the claim has run out and another worker has
+        claimed the daily package since
+        '''
+
+        claimed_until = timezone.now() + \
+            datetime.timedelta(seconds=settings.DAILY_PACKAGE_CLAIM_TIMEOUT)
+
+        renewed = DailyPackageDownloadStatus.objects.filter(
+            pk=self.pk, claimed_until=self.claimed_until
+        ).update(claimed_until=claimed_until)
+
+        if renewed:
+            self.claimed_until = claimed_until
+
+        return bool(renewed)
+
+    def reset_checkpoint(self):
+        '''
+        Clears the checkpoint fields and saves them so processing of the daily package starts from
+        the beginning
+        '''
+
+        self.last_member_name = None
+        self.contract_notice_count = 0
+        self.contract_award_notice_count = 0
+
+        self.save(update_fields=[
+            'last_member_name', 'contract_notice_count', 'contract_award_notice_count', 'modified'
+        ])
+
+    def set_checkpoint(self, member_name, contract_notice_count=0, contract_award_notice_count=0):
+        '''
+        Records that the daily package files up to and including `member_name` have been processed
+        and saves the checkpoint fields
+
+        `contract_notice_count` and `contract_award_notice_count` are the number of new entries
+        created from the files since the last checkpoint and are added to the running counts
+        '''
+
+        self.last_member_name = member_name
+        self.contract_notice_count += contract_notice_count
+        self.contract_award_notice_count += contract_award_notice_count
+
+        # Only save the checkpoint fields so the claim and the catch-up attempts, which are updated
+        # in the database directly, aren't overwritten
+        self.save(update_fields=[
+            'last_member_name', 'contract_notice_count', 'contract_award_notice_count', 'modified'
+        ])
+
     def save(self, *args, **kwargs):
         '''
         Override save method to populate `file_date` on initial save
@@ -70,7 +189,7 @@ class DailyPackageDownloadStatus(models.Model):
 
     def set_status(self, status, *args):
         '''
-        Sets the `status` field if a member of `STATUS_CHOICES` and saves the entry
+        Sets the `status` field if a member of `STATUS_CHOICES` and saves the status fields
 
         Also sets `status_msg` if a message string is supplied
         '''
@@ -81,7 +200,17 @@ class DailyPackageDownloadStatus(models.Model):
             if args:
                 self.status_msg = args[0]
 
-            self.save()
+            self.save(update_fields=['status', 'status_msg', 'modified'])
+
+    def start_run_metrics(self):
+        '''
+        Creates a new `DailyPackageMetrics` entry for a run of the daily package, keeps it in
+        `run_metrics` and returns it
+        '''
+
+        self.run_metrics = DailyPackageMetrics.objects.create(status_entry=self)
+
+        return self.run_metrics
 
     def __str__(self):
         '''
@@ -91,6 +220,117 @@ class DailyPackageDownloadStatus(models.Model):
         return self.file_name
 
 
+class DailyPackageMetrics(models.Model):
+    '''
+    Defines database table structure for `DailyPackageMetrics` entries
+
+    Records measurements of one run of a `DailyPackageDownloadStatus` daily package, so the slow
+    stage can be found if the run times out. Durations are in seconds
+    '''
+
+    added = models.DateTimeField('Added Timestamp', auto_now_add=True)
+    modified = models.DateTimeField('Modified Timestamp', auto_now=True)
+    status_entry = models.ForeignKey(DailyPackageDownloadStatus, on_delete=models.CASCADE)
+    bytes_downloaded = models.BigIntegerField('Bytes Downloaded', default=0)
+    download_seconds = models.FloatField('Download Duration', default=0)
+    # Reading files out of the archive and the `check_xml_header` pre-filter
+    extract_seconds = models.FloatField('Extract Duration', default=0)
+    parse_seconds = models.FloatField('Parse Duration', default=0)
+    write_seconds = models.FloatField('Write Duration', default=0)
+    # Only used if `settings.DAILY_PACKAGE_VALIDATE_SCHEMA` is True
+    validate_seconds = models.FloatField('Validate Duration', default=0)
+    members_scanned = models.PositiveIntegerField('Files Scanned', default=0)
+    members_matched = models.PositiveIntegerField('Files Matched', default=0)
+    members_invalid = models.PositiveIntegerField('Files Invalid', default=0)
+    query_count = models.PositiveIntegerField('Database Queries', default=0)
+    # Peak resident set size of the process, see `tasks.metrics.get_peak_rss`
+    peak_memory = models.BigIntegerField('Peak Memory (KB)', default=0)
+
+    class Meta:
+        app_label = 'tasks'
+        ordering = ['-added']
+        verbose_name = 'Daily Package Metrics'
+        verbose_name_plural = 'Daily Package Metrics'
+
+    def __str__(self):
+        '''
+        Defines the return string for a `DailyPackageMetrics` entry
+        '''
+
+        return '{} {}'.format(self.status_entry, self.added)
+
+
+class DailyPackageMirror(models.Model):
+    '''
+    Defines database table structure for `DailyPackageMirror` entries
+
+    Records a daily package .tar.gz archive file that has been copied from the TED ftp server to
+    the package mirror storage, so it can be processed again without downloading it. Files are
+    stored under their checksum using `storage_name`
+    '''
+
+    added = models.DateTimeField('Added Timestamp', auto_now_add=True)
+    modified = models.DateTimeField('Modified Timestamp', auto_now=True)
+    file_name = models.CharField('File Name', max_length=140, unique=True)
+    file_date = models.DateTimeField('File Date')
+    size = models.BigIntegerField('Size (bytes)')
+    checksum = models.CharField('SHA-256 Checksum', max_length=64)
+    # MLSD "modify" fact for the file on the ftp server, e.g. 20190802093013
+    ftp_modify = models.CharField('FTP Modified Timestamp', max_length=20, null=True, blank=True)
+
+    class Meta:
+        app_label = 'tasks'
+        ordering = ['-file_date']
+        verbose_name = 'Daily Package Mirror'
+        verbose_name_plural = 'Daily Package Mirrors'
+
+    def matches_ftp_facts(self, facts):
+        '''
+        Returns `True` if the MLSD `facts` dictionary for the file on the ftp server match the
+        mirrored file, otherwise `False`
+
+        Facts not supplied by the ftp server are not compared
+        '''
+
+        if 'size' in facts and int(facts['size']) != self.size:
+            return False
+
+        if 'modify' in facts and facts['modify'] != self.ftp_modify:
+            return False
+
+        return True
+
+    @property
+    def storage_name(self):
+        '''
+        Returns the name of the file in the package mirror storage
+        '''
+
+        return self.checksum + '.tar.gz'
+
+    def save(self, *args, **kwargs):
+        '''
+        Override save method to populate `file_date` on initial save
+
+        This should be grabbed from the date string in the `file_name` e.g. 20190801_2019147.tar.gz
+        '''
+
+        if self.pk is None:
+            self.file_date = timezone.make_aware(
+                datetime.datetime.strptime(self.file_name[:8], '%Y%m%d')
+            )
+
+        # Call default save
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        '''
+        Defines the return string for a `DailyPackageMirror` entry
+        '''
+
+        return self.file_name
+
+
 class EmailNotificationStatus(models.Model):
     '''
     Defines database table structure for `EmailNotificationStatus` entries
@@ -144,3 +384,36 @@ class EmailNotificationStatus(models.Model):
         '''
 
         return datetime.datetime.strftime(self.publication_date, '%d/%m/%Y')
+
+
+class PendingContractAwardNotice(models.Model):
+    '''
+    Defines database table structure for `PendingContractAwardNotice` entries
+
+    Keeps a contract award notice whose contract notice `ref_notice_ojs` isn't in the database
+    yet, so it can be created once the contract notice arrives without downloading its daily
+    package again. See `tasks.helpers.resolve_pending_contract_award_notices`
+    '''
+
+    added = models.DateTimeField('Added Timestamp', auto_now_add=True)
+    modified = models.DateTimeField('Modified Timestamp', auto_now=True)
+    ojs_ref = models.CharField('OJS Reference', max_length=17, unique=True)
+    ref_notice_ojs = models.CharField('Contract Notice OJS Reference', max_length=17,
+                                      db_index=True)
+    # Daily package the notice came from
+    status_entry = models.ForeignKey(DailyPackageDownloadStatus, on_delete=models.SET_NULL,
+                                     null=True, blank=True)
+    xml_data = models.BinaryField('XML Data')
+
+    class Meta:
+        app_label = 'tasks'
+        ordering = ['-added']
+        verbose_name = 'Pending Contract Award Notice'
+        verbose_name_plural = 'Pending Contract Award Notices'
+
+    def __str__(self):
+        '''
+        Defines the return string for a `PendingContractAwardNotice` entry
+        '''
+
+        return self.ojs_ref
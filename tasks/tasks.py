@@ -3,43 +3,236 @@ Celery tasks for `tenders` Django web app.
 '''
 
 
+import datetime
+
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.postgres.search import SearchVector
+from django.db.models import F
 from django.urls import reverse
 from django.utils import timezone
-from celery import shared_task
+from celery import chain, chord, shared_task
 from celery.exceptions import SoftTimeLimitExceeded
 
 from profiles.models import TedSearchTerm
 from profiles.helpers import get_search_term_matches
-from tasks import helpers
+from tasks import helpers, metrics
 from tasks.models import DailyPackageDownloadStatus, EmailNotificationStatus
 from tenders.forms import DailyPackageDownloadForm
 from tenders import models
 
 
-@shared_task(soft_time_limit=25, time_limit=28)
-def bulk_tender_create_task(file_name):
+@shared_task
+def backfill_daily_packages_task(from_date, to_date, reprocess=False):
+    '''
+    Task to call `backfill_daily_packages` to create new `tenders` and `lots` from every daily
+    package on the ftp server published between `from_date` and `to_date` inclusive
+
+    `from_date` and `to_date` should be strings in the format '%d/%m/%Y'. Progress for each daily
+    package is recorded in its `DailyPackageDownloadStatus` entry. If `reprocess` is True, the
+    packages in the daily package mirror are processed again
+    '''
+
+    status_entries = helpers.backfill_daily_packages(
+        datetime.datetime.strptime(from_date, '%d/%m/%Y').date(),
+        datetime.datetime.strptime(to_date, '%d/%m/%Y').date(),
+        reprocess=reprocess
+    )
+
+    error_count = sum(1 for status_entry in status_entries if status_entry.is_error())
+
+    return '{} - {}: {:d} daily package(s) processed, {:d} error(s).'.format(
+        from_date, to_date, len(status_entries), error_count
+    )
+
+
+@shared_task(bind=True, soft_time_limit=25, time_limit=28,
+             max_retries=settings.BULK_TENDER_CREATE_MAX_RETRIES)
+def bulk_tender_create_task(self, file_name):
     '''
     Task to call `bulk_tender_create` method to create new `tenders` and `lots` from file at
     `file_name`
+
+    If the task times out, progress is kept and the task is retried to carry on from where it
+    stopped. If another worker is already processing the file, the task does nothing
     '''
 
     task_status, _ = DailyPackageDownloadStatus.objects.get_or_create(file_name=file_name)
 
     try:
-        helpers.bulk_tender_create(task_status)
+        if not helpers.bulk_tender_create(task_status):
+            return '{} is already being processed.'.format(file_name)
 
     except SoftTimeLimitExceeded:
-        # Delete all the temporary files and record that the task timed out
-        helpers.clear_temp_files_dir()
-
+        # Record that the task timed out. The downloaded file and checkpoint are kept so the
+        # retry can resume processing
         task_status.set_status(
             DailyPackageDownloadStatus.TIMEOUT, 'bulk_tender_create_task timeout.'
         )
 
+        raise self.retry(countdown=settings.BULK_TENDER_CREATE_RETRY_DELAY)
+
+    return '{}: {}'.format(task_status.get_status_display(), task_status.status_msg)
+
+
+def bulk_tender_create_pipeline(file_name):
+    '''
+    Returns a celery canvas that creates new `tenders` and `lots` from the daily package at
+    `file_name` as a pipeline of tasks rather than one `bulk_tender_create_task`:
+
+     * `download_daily_package_task` downloads the file
+     * A chord of `settings.BULK_TENDER_CREATE_SHARDS` `parse_daily_package_shard_task` tasks each
+       pre-filter a shard of the files in the archive. These can run on different workers
+     * `commit_daily_package_task` creates the new entries from the candidates found by all the
+       shards and records the result
+
+    The daily package is claimed by `download_daily_package_task` and released by
+    `commit_daily_package_task`, or when the download or commit fails. If a parse task fails, the
+    claim runs out after `settings.DAILY_PACKAGE_CLAIM_TIMEOUT` seconds. Chords need a result
+    backend, see `settings.CELERY_RESULT_BACKEND`
+    '''
+
+    shard_count = settings.BULK_TENDER_CREATE_SHARDS
+
+    return chain(
+        download_daily_package_task.si(file_name),
+        chord(
+            [parse_daily_package_shard_task.si(file_name, shard_index, shard_count)
+             for shard_index in range(shard_count)],
+            commit_daily_package_task.s(file_name)
+        )
+    )
+
+
+@shared_task
+def catch_up_daily_packages_task():
+    '''
+    Task to find the daily packages published in the last `settings.CATCH_UP_DAYS` days that are
+    missing or didn't complete, using `find_incomplete_daily_packages`, and start processing them
+    in publication order
+
+    Packages are started so no more than `settings.CATCH_UP_MAX_PACKAGES` are processed at the same
+    time. The rest are left for the next run. Each start is counted in the package's
+    `catch_up_attempts` so packages that keep failing are eventually left out
+    '''
+
+    end_date = timezone.now().date()
+    start_date = end_date - datetime.timedelta(days=settings.CATCH_UP_DAYS)
+
+    file_names = helpers.find_incomplete_daily_packages(start_date, end_date)
+
+    # Leave room for the packages already being processed
+    claimed_count = DailyPackageDownloadStatus.objects.filter(
+        claimed_until__gt=timezone.now()
+    ).count()
+
+    started_file_names = file_names[:max(settings.CATCH_UP_MAX_PACKAGES - claimed_count, 0)]
+
+    for file_name in started_file_names:
+        # Create a new `DailyPackageDownloadStatus` entry to track processing progress
+        DailyPackageDownloadStatus.objects.get_or_create(file_name=file_name)
+
+        DailyPackageDownloadStatus.objects.filter(file_name=file_name).update(
+            catch_up_attempts=F('catch_up_attempts') + 1
+        )
+
+        if settings.BULK_TENDER_CREATE_PIPELINE:
+            bulk_tender_create_pipeline(file_name).delay()
+
+        else:
+            bulk_tender_create_task.delay(file_name)
+
+    return '{:d} of {:d} incomplete daily package(s) started.'.format(
+        len(started_file_names), len(file_names)
+    )
+
+
+@shared_task(bind=True, soft_time_limit=25, time_limit=28,
+             max_retries=settings.BULK_TENDER_CREATE_MAX_RETRIES)
+def commit_daily_package_task(self, shard_results, file_name):
+    '''
+    Final task of `bulk_tender_create_pipeline`. Calls `commit_daily_package_shards` to create new
+    `tenders` and `lots` from the candidates in `shard_results` returned by each
+    `parse_daily_package_shard_task`
+
+    Releases the claim on the daily package made by `download_daily_package_task` once finished
+    '''
+
+    task_status = DailyPackageDownloadStatus.objects.get(file_name=file_name)
+
+    # Add the commit to the measurements of the run started by `download_daily_package_task`
+    task_status.run_metrics = task_status.get_latest_metrics()
+
+    try:
+        helpers.commit_daily_package_shards(task_status, shard_results)
+
+    except SoftTimeLimitExceeded:
+        # Record that the task timed out. The checkpoint and claim are kept so the retry can
+        # resume
+        task_status.set_status(
+            DailyPackageDownloadStatus.TIMEOUT, 'commit_daily_package_task timeout.'
+        )
+
+        raise self.retry(countdown=settings.BULK_TENDER_CREATE_RETRY_DELAY)
+
+    except Exception:
+        task_status.release()
+
+        raise
+
+    task_status.release()
+
+    return '{}: {}'.format(task_status.get_status_display(), task_status.status_msg)
+
+
+@shared_task(bind=True, soft_time_limit=25, time_limit=28,
+             max_retries=settings.BULK_TENDER_CREATE_MAX_RETRIES)
+def download_daily_package_task(self, file_name):
+    '''
+    First task of `bulk_tender_create_pipeline`. Claims the daily package at `file_name` with
+    `DailyPackageDownloadStatus.claim` and calls `download_daily_package` to retrieve it from the
+    ftp server. Measurements of the download are recorded using `record_run_metrics`
+
+    If the task times out, the partial download is kept and the task is retried to carry on from
+    where it stopped. The rest of the pipeline isn't run if another worker is already processing
+    the daily package or the download fails
+    '''
+
+    task_status, _ = DailyPackageDownloadStatus.objects.get_or_create(file_name=file_name)
+
+    if not task_status.claim():
+        self.request.chain = None
+
+        return '{} is already being processed.'.format(file_name)
+
+    try:
+        with metrics.record_run_metrics(task_status):
+            helpers.download_daily_package(task_status)
+
+    except SoftTimeLimitExceeded:
+        # Record that the task timed out. The partial download is kept so the retry can carry on
+        # from where it stopped. Release the claim so the retry can claim the daily package again
+        task_status.set_status(
+            DailyPackageDownloadStatus.TIMEOUT, 'download_daily_package_task timeout.'
+        )
+        task_status.release()
+
+        raise self.retry(countdown=settings.BULK_TENDER_CREATE_RETRY_DELAY)
+
+    except Exception:
+        task_status.release()
+
+        raise
+
+    if task_status.is_error():
+        task_status.release()
+
+        self.request.chain = None
+
+    else:
+        task_status.set_status(DailyPackageDownloadStatus.PROCESSING)
+
     return '{}: {}'.format(task_status.get_status_display(), task_status.status_msg)
 
 
@@ -158,22 +351,32 @@ def get_daily_package_task(date=None):
     form = DailyPackageDownloadForm({'date': date})
 
     # If date has a good file on the ftp, download and process it
-    if form.is_valid():
+    if form.is_valid() and settings.BULK_TENDER_CREATE_PIPELINE:
+        # Hand processing over to a pipeline of tasks
+        bulk_tender_create_pipeline(form.file_name).delay()
+
+        return_str = '{} {} processing started.'.format(date, form.file_name)
+
+    elif form.is_valid():
         # Create a new `DailyPackageDownloadStatus` entry to track processing progress
         task_status, _ = DailyPackageDownloadStatus.objects.get_or_create(file_name=form.file_name)
 
         # Call `bulk_tender_create` and timeout if it takes too long
         try:
-            helpers.bulk_tender_create(task_status)
+            if not helpers.bulk_tender_create(task_status):
+                return '{} {} is already being processed.'.format(date, form.file_name)
 
         except SoftTimeLimitExceeded:
-            # Delete all the temporary files and record that the task timed out
-            helpers.clear_temp_files_dir()
-
+            # Record that the task timed out and carry on processing from the checkpoint in a
+            # new task
             task_status.set_status(
                 DailyPackageDownloadStatus.TIMEOUT, 'get_daily_package_task timeout.'
             )
 
+            bulk_tender_create_task.apply_async(
+                (form.file_name, ), countdown=settings.BULK_TENDER_CREATE_RETRY_DELAY
+            )
+
         return_str = '{}: {:%d/%m/%Y} {}'.format(
             task_status.get_status_display(), task_status.file_date, task_status.status_msg
         )
@@ -185,6 +388,33 @@ def get_daily_package_task(date=None):
     return return_str
 
 
+@shared_task(soft_time_limit=25, time_limit=28)
+def parse_daily_package_shard_task(file_name, shard_index, shard_count):
+    '''
+    Task of `bulk_tender_create_pipeline` that calls `parse_daily_package_shard` to find the
+    candidate files in one shard of the daily package at `file_name`
+    '''
+
+    task_status = DailyPackageDownloadStatus.objects.get(file_name=file_name)
+
+    return helpers.parse_daily_package_shard(task_status, shard_index, shard_count)
+
+
+@shared_task
+def sync_daily_package_mirror_task():
+    '''
+    Task to call `sync_daily_package_mirror` to copy new or changed daily packages published in the
+    last `settings.DAILY_PACKAGE_MIRROR_SYNC_DAYS` days to the daily package mirror
+    '''
+
+    end_date = timezone.now().date()
+    start_date = end_date - datetime.timedelta(days=settings.DAILY_PACKAGE_MIRROR_SYNC_DAYS)
+
+    file_names = helpers.sync_daily_package_mirror(start_date, end_date)
+
+    return '{:d} daily package(s) mirrored.'.format(len(file_names))
+
+
 @shared_task
 def update_lot_search_vector():
     '''
@@ -0,0 +1,66 @@
+'''
+Helpers for tests in the `tasks` Django web application
+'''
+
+
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+
+from tasks.fake_ftp import FakeFTP
+from tasks.ftp import FTP_SESSION_POOL
+
+
+def create_daily_package(dir_path, file_name, xml_file_names):
+    '''
+    Method creates a daily package .tar.gz archive file called `file_name` in `dir_path` that
+    contains the `xml_file_names` files from `settings.TEST_FILES_DIR`, and returns its path
+    '''
+
+    file_path = os.path.join(dir_path, file_name)
+    package_dir = file_name.split('.')[0]
+
+    with tarfile.open(file_path, 'w:gz') as tar:
+        tar.add(dir_path, arcname=package_dir, recursive=False)
+
+        for xml_file_name in xml_file_names:
+            tar.add(os.path.join(settings.TEST_FILES_DIR, xml_file_name),
+                    arcname=package_dir + '/' + xml_file_name)
+
+    return file_path
+
+
+def use_fake_ftp(test_case, packages, transfer_delay=0):
+    '''
+    Method patches `ftplib.FTP` with `FakeFTP` serving `packages` for the duration of the input
+    `test_case` test
+
+    `FTP_SESSION_POOL` and the cached ftp listings are cleared before and after the test so no
+    sessions or listings are shared with other tests. The daily package mirror is kept in a new
+    temporary folder for the test
+    '''
+
+    FakeFTP.reset(packages, transfer_delay)
+
+    FTP_SESSION_POOL.clear()
+    cache.clear()
+
+    mirror_dir = tempfile.mkdtemp()
+
+    patcher = mock.patch('ftplib.FTP', FakeFTP)
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+    mirror_settings = override_settings(DAILY_PACKAGE_MIRROR_OPTIONS={'location': mirror_dir})
+    mirror_settings.enable()
+    test_case.addCleanup(mirror_settings.disable)
+
+    test_case.addCleanup(shutil.rmtree, mirror_dir)
+    test_case.addCleanup(cache.clear)
+    test_case.addCleanup(FTP_SESSION_POOL.clear)
@@ -0,0 +1,204 @@
+'''
+Tests for benchmarks in the `tasks` Django web application
+'''
+
+
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase
+
+from tasks import benchmarks, ftp, helpers
+from tenders import models, parsing
+
+
+class CreateSyntheticDailyPackageTests(TestCase):
+    '''
+    TestCase class for the `create_synthetic_daily_package` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        self.package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.package_dir)
+
+        self.file_path = benchmarks.create_synthetic_daily_package(
+            self.package_dir, '20190801_201901.tar.gz', 40, match_rate=0.25, lot_counts=(3, 3)
+        )
+
+    def test_method_creates_notices(self):
+        '''
+        `create_synthetic_daily_package` method should create a package containing the requested
+        number of xml files
+        '''
+
+        self.assertEqual(
+            sum(1 for _ in helpers.iter_daily_package_members(self.file_path)), 40
+        )
+
+    def test_method_uses_match_rate(self):
+        '''
+        `create_synthetic_daily_package` method should make `match_rate` of the files pass the
+        pre-filter
+        '''
+
+        self.assertEqual(
+            sum(1 for _ in helpers.iter_daily_package_candidates(self.file_path)), 10
+        )
+
+    def test_method_uses_lot_counts(self):
+        '''
+        `create_synthetic_daily_package` method should give each notice a number of lots in the
+        `lot_counts` range
+        '''
+
+        with tarfile.open(self.file_path) as tar:
+            member = tar.getmembers()[1]
+
+            root, n_s = parsing.get_xml_root(tar.extractfile(member))
+
+        self.assertEqual(len(root.xpath('//def:OBJECT_DESCR', namespaces=n_s)), 3)
+
+    def test_method_is_repeatable(self):
+        '''
+        `create_synthetic_daily_package` method should create the same files for the same `seed`
+        '''
+
+        file_path = benchmarks.create_synthetic_daily_package(
+            tempfile.mkdtemp(dir=self.package_dir), '20190801_201901.tar.gz', 40,
+            match_rate=0.25, lot_counts=(3, 3)
+        )
+
+        self.assertEqual(
+            [xml_data for _, xml_data in helpers.iter_daily_package_candidates(file_path)],
+            [xml_data for _, xml_data in helpers.iter_daily_package_candidates(self.file_path)]
+        )
+
+
+class RunIngestBenchmarkTests(TestCase):
+    '''
+    TestCase class for the `run_ingest_benchmark` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Create a synthetic package with 5 contract notices and 5 contract award notices
+        '''
+
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+
+        self.results = benchmarks.run_ingest_benchmark([
+            benchmarks.create_synthetic_daily_package(
+                package_dir, '20190801_201901.tar.gz', 50, match_rate=0.2
+            )
+        ])
+
+    def test_method_creates_new_entries(self):
+        '''
+        `run_ingest_benchmark` method should create new entries from every matching file
+        '''
+
+        self.assertEqual(
+            (self.results[0]['contract_notices'], self.results[0]['contract_award_notices']),
+            (5, 5)
+        )
+
+    def test_method_measures_stages(self):
+        '''
+        `run_ingest_benchmark` method should measure the files handled by each stage
+        '''
+
+        self.assertEqual(
+            [(stage['stage'], stage['items']) for stage in self.results[0]['stages']],
+            [('download', 50), ('filter', 50), ('parse', 10), ('write', 10)]
+        )
+
+    def test_method_leaves_ftp_session_pool_and_cache(self):
+        '''
+        `run_ingest_benchmark` method should not use or clear `FTP_SESSION_POOL` or the default
+        cache, which a running ingest may be using
+        '''
+
+        cache.set('ted_ftp_listing:/daily-packages/2019/08', {})
+        self.addCleanup(cache.clear)
+
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+
+        with mock.patch.object(ftp.FTP_SESSION_POOL, 'run') as run:
+            benchmarks.run_ingest_benchmark([
+                benchmarks.create_synthetic_daily_package(
+                    package_dir, '20190802_201902.tar.gz', 10, match_rate=0
+                )
+            ])
+
+        self.assertEqual(
+            (run.called, cache.get('ted_ftp_listing:/daily-packages/2019/08')), (False, {})
+        )
+
+    def test_method_rolls_back_database(self):
+        '''
+        `run_ingest_benchmark` method should not leave any new entries in the database
+        '''
+
+        self.assertEqual(
+            (models.ContractNotice.objects.count(), models.ContractAwardNotice.objects.count()),
+            (0, 0)
+        )
+
+
+class RunParserBenchmarkTests(TestCase):
+    '''
+    TestCase class for the `run_parser_benchmark` method
+    '''
+
+    def test_method_measures_parsers(self):
+        '''
+        `run_parser_benchmark` method should time both parsers and count the nodes they build,
+        with fewer nodes from the shared parser as it drops whitespace between elements
+
+        TED export file 2017-OJS238-493624.xml is indented
+        '''
+
+        results = benchmarks.run_parser_benchmark(
+            [os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')], repeat=2
+        )
+
+        self.assertGreater(results['shared']['seconds'], 0)
+        self.assertLess(results['shared']['nodes'], results['default']['nodes'])
+
+
+class RunXpathBenchmarkTests(TestCase):
+    '''
+    TestCase class for the `run_xpath_benchmark` method
+    '''
+
+    def test_method_measures_evaluations(self):
+        '''
+        `run_xpath_benchmark` method should time every xpath constant on every file in both ways
+        '''
+
+        results = benchmarks.run_xpath_benchmark([
+            os.path.join(settings.TEST_FILES_DIR, file_name)
+            for file_name in ['2017-OJS238-493624.xml', '2019-OJS072-170256.xml']
+        ], repeat=2)
+
+        self.assertEqual(results['evaluations'] % 4, 0)
+        self.assertGreater(results['evaluations'], 0)
+        self.assertGreater(results['compiled_seconds'], 0)
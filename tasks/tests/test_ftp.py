@@ -0,0 +1,424 @@
+'''
+Tests for the TED ftp server functions in the `tasks` Django web application
+'''
+
+
+import datetime
+import ftplib
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from tasks import ftp, helpers
+from tasks.tests.helpers import FakeFTP, use_fake_ftp
+
+
+class CheckDailyPackageExistsTests(TestCase):
+    '''
+    TestCase class for the `check_daily_package_exists` method
+    '''
+
+    def test_method_returns_none_if_package_doesnt_exist(self):
+        '''
+        `check_daily_package_exists` method should return None if a daily package file for the
+        input date does not exist on the ftp server
+        '''
+
+        # Create a date in the future
+        future_date = datetime.datetime(2119, 9, 18).date()
+
+        self.assertIsNone(ftp.check_daily_package_exists(future_date))
+
+    def test_method_returns_filenam_if_package_does_exist(self):
+        '''
+        `check_daily_package_exists` method should return the correct filename if a daily package
+        file for the input date does exist on the ftp server
+        '''
+
+        # Create a date in the past
+        past_date = datetime.datetime(2019, 9, 17).date()
+
+        self.assertEqual(ftp.check_daily_package_exists(past_date), '20190917_2019179.tar.gz')
+
+    def test_method_finds_package_published_since_last_check(self):
+        '''
+        `check_daily_package_exists` method should list the folder on the ftp server again if the
+        daily package isn't in the cached listing, e.g. if it has been published since the last
+        check
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        first_check = ftp.check_daily_package_exists(datetime.date(2019, 8, 5))
+
+        # Package is published between the two checks
+        FakeFTP.packages['20190805_201902.tar.gz'] = '20190802_201901.tar.gz'
+
+        self.assertEqual(
+            (first_check, ftp.check_daily_package_exists(datetime.date(2019, 8, 5))),
+            (None, '20190805_201902.tar.gz')
+        )
+
+    def test_method_uses_cached_listing_if_package_in_it(self):
+        '''
+        `check_daily_package_exists` method should not list the folder on the ftp server again if
+        the daily package is in the cached listing
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        ftp.check_daily_package_exists(datetime.date(2019, 8, 2))
+        ftp.check_daily_package_exists(datetime.date(2019, 8, 2))
+
+        self.assertEqual(FakeFTP.listings_made, 1)
+
+
+class DownloadBufferTests(TestCase):
+    '''
+    TestCase class for the `DownloadBuffer` class
+    '''
+
+    def test_read_returns_blocks_in_order(self):
+        '''
+        `read` method should return the bytes written to the buffer in order, then empty bytes once
+        the file is finished
+        '''
+
+        download_buffer = ftp.DownloadBuffer()
+
+        download_buffer.write(b'abc')
+        download_buffer.write(b'def')
+        download_buffer.finish()
+
+        self.assertEqual(
+            [download_buffer.read(4), download_buffer.read(), download_buffer.read()],
+            [b'abcd', b'ef', b'']
+        )
+
+    def test_write_raises_error_once_closed(self):
+        '''
+        `write` method should raise an error to stop the download once the reader has closed the
+        buffer
+        '''
+
+        download_buffer = ftp.DownloadBuffer()
+        download_buffer.close()
+
+        with self.assertRaises(ftplib.Error):
+            download_buffer.write(b'abc')
+
+
+class FtpSessionPoolTests(TestCase):
+    '''
+    TestCase class for the `FtpSessionPool` class
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Serve 20190802_201901.tar.gz, a valid TED daily export archive file, from a local ftp
+        stand-in
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+    def test_sessions_are_reused(self):
+        '''
+        `check_daily_package_exists` and `retrieve_daily_package_file` methods should use the same
+        logged in ftp session
+        '''
+
+        file_name = ftp.check_daily_package_exists(datetime.date(2019, 8, 2))
+        helpers.retrieve_daily_package_file(file_name)
+
+        self.assertEqual(FakeFTP.connections_made, 1)
+
+    def test_session_is_kept_after_server_error(self):
+        '''
+        `run` method should keep the session in the pool if the ftp server replies with an error
+        '''
+
+        return_str = helpers.retrieve_daily_package_file('20190917_asdasdasd.tar.gz')
+
+        self.assertEqual(
+            (return_str, len(ftp.FTP_SESSION_POOL.idle_sessions)),
+            ('550 20190917_asdasdasd.tar.gz: No such file or directory', 1)
+        )
+
+    def test_run_reconnects_if_session_dropped(self):
+        '''
+        `run` method should reconnect and try again if a reused session has been dropped by the
+        ftp server
+        '''
+
+        ftp.check_daily_package_exists(datetime.date(2019, 8, 2))
+
+        # Server drops the idle session
+        ftp.FTP_SESSION_POOL.idle_sessions[0][0].dropped = True
+
+        return_str = helpers.retrieve_daily_package_file('20190802_201901.tar.gz')
+
+        self.assertEqual((return_str, FakeFTP.connections_made), ('226 Transfer complete', 2))
+
+    @override_settings(TED_FTP_KEEPALIVE=0)
+    def test_acquire_replaces_idle_session_that_fails_noop(self):
+        '''
+        `acquire` method should check an idle session with a NOOP and log in a new session if
+        the check fails
+        '''
+
+        session, _ = ftp.FTP_SESSION_POOL.acquire()
+        session.dropped = True
+        ftp.FTP_SESSION_POOL.release(session)
+
+        new_session, reused = ftp.FTP_SESSION_POOL.acquire()
+
+        self.assertEqual((new_session is session, reused), (False, False))
+
+
+class GetDailyPackageListingTests(TestCase):
+    '''
+    TestCase class for the `get_daily_package_listing` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+    def test_method_returns_file_names(self):
+        '''
+        `get_daily_package_listing` method should return the files in the daily packages folder for
+        the month
+        '''
+
+        self.assertEqual(list(ftp.get_daily_package_listing(2019, 8)),
+                         ['20190802_201901.tar.gz'])
+
+    def test_method_caches_listing(self):
+        '''
+        `get_daily_package_listing` method should only list the folder on the ftp server once
+        '''
+
+        ftp.get_daily_package_listing(2019, 8)
+        ftp.get_daily_package_listing(2019, 8)
+
+        self.assertEqual(FakeFTP.listings_made, 1)
+
+    def test_method_doesnt_cache_errors(self):
+        '''
+        `get_daily_package_listing` method should raise an error if the folder can't be listed and
+        try again next time
+        '''
+
+        for _ in range(2):
+            with self.assertRaises(ftplib.error_perm):
+                ftp.get_daily_package_listing(2019, 9)
+
+        self.assertEqual(FakeFTP.listings_made, 2)
+
+
+class ListDailyPackagesTests(TestCase):
+    '''
+    TestCase class for the `list_daily_packages` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        use_fake_ftp(self, {
+            '20190731_201900.tar.gz': '20190802_201901.tar.gz',
+            '20190802_201901.tar.gz': '20190802_201901.tar.gz',
+            '20190805_201902.tar.gz': '20190802_201901.tar.gz'
+        })
+
+    def test_method_returns_packages_in_date_range_across_months(self):
+        '''
+        `list_daily_packages` method should return the daily packages published in the date range
+        from each month
+        '''
+
+        self.assertEqual(
+            ftp.list_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 8, 2)),
+            ['20190731_201900.tar.gz', '20190802_201901.tar.gz']
+        )
+
+    def test_method_skips_months_not_on_ftp(self):
+        '''
+        `list_daily_packages` method should skip months that can't be listed on the ftp server
+        '''
+
+        self.assertEqual(
+            ftp.list_daily_packages(datetime.date(2019, 8, 5), datetime.date(2019, 10, 1)),
+            ['20190805_201902.tar.gz']
+        )
+
+
+class TransferDailyPackageFileTests(TestCase):
+    '''
+    TestCase class for the `transfer_daily_package_file` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        self.file_path = helpers.get_daily_package_file_path('20190802_201901.tar.gz')
+        self.part_file_path = self.file_path + ftp.PARTIAL_DOWNLOAD_SUFFIX
+        self.file_size = os.path.getsize(
+            os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz')
+        )
+
+    def test_method_downloads_file(self):
+        '''
+        `transfer_daily_package_file` method should download the whole file to its workspace
+        '''
+
+        self.assertEqual(
+            (ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path),
+             os.path.getsize(self.file_path), os.path.isfile(self.part_file_path)),
+            ('226 Transfer complete', self.file_size, False)
+        )
+
+    @override_settings(TED_FTP_DOWNLOAD_ATTEMPTS=1)
+    def test_method_keeps_partial_file(self):
+        '''
+        `transfer_daily_package_file` method should keep the bytes downloaded before the
+        connection was lost
+        '''
+
+        FakeFTP.failures = 10
+
+        ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path)
+
+        self.assertEqual(
+            (os.path.getsize(self.part_file_path) % 1000, os.path.isfile(self.file_path)),
+            (0, False)
+        )
+
+    @override_settings(TED_FTP_DOWNLOAD_ATTEMPTS=1)
+    def test_method_resumes_partial_file(self):
+        '''
+        `transfer_daily_package_file` method should only download the missing bytes of a partial
+        file and save the whole file
+        '''
+
+        FakeFTP.failures = 10
+
+        ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path)
+
+        FakeFTP.failures = 0
+
+        ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path)
+
+        with open(self.file_path, 'rb') as downloaded_file, \
+            open(os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz'), 'rb') as file:
+            self.assertEqual(
+                (FakeFTP.bytes_sent, downloaded_file.read() == file.read()), (self.file_size, True)
+            )
+
+    def test_method_retries_lost_connection(self):
+        '''
+        `transfer_daily_package_file` method should try again from the end of the partial file if
+        the connection is lost
+        '''
+
+        FakeFTP.failures = 1
+
+        self.assertEqual(
+            (ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path),
+             os.path.getsize(self.file_path), FakeFTP.bytes_sent),
+            ('226 Transfer complete', self.file_size, self.file_size)
+        )
+
+    def test_method_passes_on_partial_file_blocks(self):
+        '''
+        `transfer_daily_package_file` method should pass every block of the file to `on_block`,
+        including the blocks already in a partial file
+        '''
+
+        with override_settings(TED_FTP_DOWNLOAD_ATTEMPTS=1):
+            FakeFTP.failures = 10
+
+            ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path)
+
+        FakeFTP.failures = 0
+
+        blocks = []
+
+        ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path, blocks.append)
+
+        self.assertEqual(len(b''.join(blocks)), self.file_size)
+
+    def test_method_downloads_whole_file_if_rest_refused(self):
+        '''
+        `transfer_daily_package_file` method should download the whole file again if the ftp
+        server refuses to carry on from the end of a partial file, passing each block of the file
+        to `on_block` once
+        '''
+
+        with override_settings(TED_FTP_DOWNLOAD_ATTEMPTS=1):
+            FakeFTP.failures = 10
+
+            ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path)
+
+        FakeFTP.failures = 0
+        FakeFTP.rest_supported = False
+
+        blocks = []
+
+        return_str = ftp.transfer_daily_package_file(
+            '20190802_201901.tar.gz', self.file_path, blocks.append
+        )
+
+        with open(os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz'), 'rb') as file, \
+            open(self.file_path, 'rb') as downloaded_file:
+            file_data = file.read()
+
+            self.assertEqual(
+                (return_str, downloaded_file.read() == file_data, b''.join(blocks) == file_data),
+                ('226 Transfer complete', True, True)
+            )
+
+    def test_method_checks_size(self):
+        '''
+        `transfer_daily_package_file` method should return an error and delete the file if its
+        size doesn't match the size on the ftp
+        '''
+
+        listing = {'20190802_201901.tar.gz': {'size': str(self.file_size + 1)}}
+
+        with mock.patch('tasks.ftp.get_daily_package_listing', return_value=listing):
+            self.assertEqual(
+                (ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path),
+                 os.path.isfile(self.part_file_path), os.path.isfile(self.file_path)),
+                ('Downloaded file size does not match the size on the ftp.', False, False)
+            )
+
+    def test_method_doesnt_keep_empty_file(self):
+        '''
+        `transfer_daily_package_file` method should not keep an empty partial file if the file
+        isn't on the ftp
+        '''
+
+        FakeFTP.packages = {}
+
+        self.assertEqual(
+            (ftp.transfer_daily_package_file('20190802_201901.tar.gz', self.file_path),
+             os.path.isfile(self.part_file_path)),
+            ('550 20190802_201901.tar.gz: No such file or directory', False)
+        )
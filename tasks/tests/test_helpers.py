@@ -6,39 +6,800 @@ Tests for helpers in the `tasks` Django web application
 import datetime
 import os
 import shutil
+import tarfile
+import tempfile
+from unittest import mock
 
 from django.conf import settings
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
-from tasks import helpers
+from tasks import ftp, helpers, mirror
+from tasks.models import DailyPackageDownloadStatus, DailyPackageMirror, PendingContractAwardNotice
+from tasks.tests.helpers import create_daily_package, FakeFTP, use_fake_ftp
+from tenders import models
 
 
-class CheckDailyPackageExistsTests(TestCase):
+class BackfillDailyPackagesTests(TestCase):
     '''
-    TestCase class for the `check_daily_package_exists` method
+    TestCase class for the `backfill_daily_packages` method
     '''
 
-    def test_method_returns_none_if_package_doesnt_exist(self):
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Serve daily packages from a local ftp stand-in:
+         * 20190731_201900.tar.gz contains 2018-OJS191-431371.xml, a valid contract notice
+         * 20190801_201901.tar.gz is emptyarchive.tar.gz, an invalid archive file
+         * 20190802_201901.tar.gz contains 2019-OJS072-170256.xml, its contract award notice
+         * 20190805_201902.tar.gz is 20190802_201901.tar.gz, a valid TED daily export archive
+        '''
+
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+
+        use_fake_ftp(self, {
+            '20190731_201900.tar.gz': create_daily_package(
+                package_dir, '20190731_201900.tar.gz', ['2018-OJS191-431371.xml']
+            ),
+            '20190801_201901.tar.gz': 'emptyarchive.tar.gz',
+            '20190802_201901.tar.gz': create_daily_package(
+                package_dir, '20190802_201901.tar.gz', ['2019-OJS072-170256.xml']
+            ),
+            '20190805_201902.tar.gz': '20190802_201901.tar.gz'
+        }, transfer_delay=0.2)
+
+    def test_method_creates_new_entries(self):
+        '''
+        `backfill_daily_packages` method should create new entries from each daily package in the
+        date range in publication order
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 8, 2))
+
+        self.assertEqual(
+            (models.ContractNotice.objects.count(), models.ContractAwardNotice.objects.count()),
+            (1, 1)
+        )
+
+    def test_method_records_status_of_each_package(self):
+        '''
+        `backfill_daily_packages` method should record the result for each daily package in its
+        `DailyPackageDownloadStatus` entry
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 8, 2))
+
+        self.assertEqual(
+            list(DailyPackageDownloadStatus.objects.order_by('file_name')
+                 .values_list('file_name', 'status')),
+            [('20190731_201900.tar.gz', DailyPackageDownloadStatus.COMPLETE),
+             ('20190801_201901.tar.gz', DailyPackageDownloadStatus.ERROR),
+             ('20190802_201901.tar.gz', DailyPackageDownloadStatus.COMPLETE)]
+        )
+
+    def test_method_skips_complete_packages(self):
+        '''
+        `backfill_daily_packages` method should not process daily packages that have already
+        been processed
+        '''
+
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190731_201900.tar.gz', status=DailyPackageDownloadStatus.COMPLETE
+        )
+
+        status_entries = helpers.backfill_daily_packages(
+            datetime.date(2019, 7, 31), datetime.date(2019, 8, 2)
+        )
+
+        self.assertEqual(
+            [status_entry.file_name for status_entry in status_entries],
+            ['20190801_201901.tar.gz', '20190802_201901.tar.gz']
+        )
+
+    @override_settings(TED_FTP_MAX_CONNECTIONS=2)
+    def test_method_limits_ftp_connections(self):
+        '''
+        `backfill_daily_packages` method should download daily packages in parallel over no more
+        than `settings.TED_FTP_MAX_CONNECTIONS` connections at the same time
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 1), datetime.date(2019, 8, 31))
+
+        self.assertEqual(FakeFTP.max_open_connections, 2)
+
+    def test_method_records_run_metrics(self):
+        '''
+        `backfill_daily_packages` method should record the size and download time of each
+        package with its run metrics
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 7, 31))
+
+        metrics = DailyPackageDownloadStatus.objects.get(
+            file_name='20190731_201900.tar.gz'
+        ).get_latest_metrics()
+
+        self.assertEqual(
+            (metrics.bytes_downloaded, metrics.download_seconds >= 0.2, metrics.members_matched),
+            (FakeFTP.bytes_sent, True, 1)
+        )
+
+    def test_method_skips_claimed_packages(self):
+        '''
+        `backfill_daily_packages` method should not process daily packages another worker is
+        processing
+        '''
+
+        DailyPackageDownloadStatus.objects.create(file_name='20190731_201900.tar.gz').claim()
+
+        status_entries = helpers.backfill_daily_packages(
+            datetime.date(2019, 7, 31), datetime.date(2019, 8, 2)
+        )
+
+        self.assertEqual(
+            ([status_entry.file_name for status_entry in status_entries],
+             models.ContractNotice.objects.exists()),
+            (['20190801_201901.tar.gz', '20190802_201901.tar.gz'], False)
+        )
+
+    @override_settings(TED_FTP_MAX_CONNECTIONS=3)
+    def test_method_skips_packages_claimed_by_another_worker_since_download(self):
+        '''
+        `backfill_daily_packages` method should not process a downloaded daily package if its claim
+        ran out while earlier packages were processed and another worker has claimed it since, and
+        should leave the other worker's claim alone
+        '''
+
+        def take_over_last_package(status_entry):
+            if status_entry.file_name == '20190731_201900.tar.gz':
+                DailyPackageDownloadStatus.objects.filter(
+                    file_name='20190802_201901.tar.gz'
+                ).update(claimed_until=timezone.now() - datetime.timedelta(seconds=1))
+
+                DailyPackageDownloadStatus.objects.get(file_name='20190802_201901.tar.gz').claim()
+
+        status_entries = helpers.backfill_daily_packages(
+            datetime.date(2019, 7, 31), datetime.date(2019, 8, 2), take_over_last_package
+        )
+
+        self.assertEqual(
+            ([status_entry.file_name for status_entry in status_entries],
+             models.ContractAwardNotice.objects.exists(),
+             DailyPackageDownloadStatus.objects.get(
+                 file_name='20190802_201901.tar.gz'
+             ).claimed_until is not None),
+            (['20190731_201900.tar.gz', '20190801_201901.tar.gz'], False, True)
+        )
+
+    def test_method_releases_claims(self):
+        '''
+        `backfill_daily_packages` method should release the claim on each daily package once
+        processed
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 8, 2))
+
+        self.assertFalse(
+            DailyPackageDownloadStatus.objects.filter(claimed_until__isnull=False).exists()
+        )
+
+    def test_method_deletes_downloaded_packages(self):
+        '''
+        `backfill_daily_packages` method should delete each daily package once processed
+        '''
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 8, 2))
+
+        self.assertFalse(os.listdir(settings.TEMP_FILES_DIR))
+
+
+class BulkTenderCreateTests(TestCase):
+    '''
+    TestCase class for the `bulk_tender_create` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        File 20190802_201901.tar.gz is a valid TED daily export archive file. Copy it to its
+        workspace as if a previous run had downloaded it and timed out
+        '''
+
+        self.file_name = '20190802_201901.tar.gz'
+
+        shutil.copyfile(
+            os.path.join(settings.TEST_FILES_DIR, self.file_name),
+            helpers.get_daily_package_file_path(self.file_name)
+        )
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name=self.file_name, status=DailyPackageDownloadStatus.TIMEOUT,
+            last_member_name='20190802_201901/2019-OJS138-339819.xml', contract_notice_count=2
+        )
+
+    def test_method_resumes_from_checkpoint(self):
+        '''
+        `bulk_tender_create` method should carry on from the checkpoint of a previous run that
+        timed out without downloading the file again
+        '''
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        self.assertEqual(self.status_entry.status, DailyPackageDownloadStatus.COMPLETE)
+
+    def test_method_reports_counts_across_runs(self):
+        '''
+        `bulk_tender_create` method should report the entries created by previous runs in the
+        status message
+        '''
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        self.assertEqual(
+            self.status_entry.status_msg,
+            '0 new Contract Award Notice(s) and 2 new Contract Notice(s) added to the database ' + \
+            'successfully.'
+        )
+
+    def test_method_records_run_metrics(self):
+        '''
+        `bulk_tender_create` method should record the files scanned and matched, the database
+        queries and the peak memory of the run
+        '''
+
+        # Process the whole file
+        self.status_entry.last_member_name = None
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        metrics = self.status_entry.get_latest_metrics()
+
+        self.assertEqual(
+            (metrics.members_scanned, metrics.members_matched, metrics.query_count > 0,
+             metrics.peak_memory > 0, self.status_entry.run_metrics),
+            (3, 1, True, True, None)
+        )
+
+    def test_method_records_run_metrics_on_timeout(self):
+        '''
+        `bulk_tender_create` method should save the metrics of the run if it is stopped part way,
+        e.g. by the task timing out
+        '''
+
+        # Process the whole file
+        self.status_entry.last_member_name = None
+
+        with mock.patch('tasks.helpers.write_daily_package_batch', side_effect=TimeoutError):
+            with self.assertRaises(TimeoutError):
+                helpers.bulk_tender_create(self.status_entry)
+
+        self.assertEqual(self.status_entry.get_latest_metrics().members_matched, 1)
+
+    def test_method_deletes_temp_files_on_completion(self):
+        '''
+        `bulk_tender_create` method should delete the downloaded file once processing is complete
+        '''
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        self.assertFalse(os.listdir(settings.TEMP_FILES_DIR))
+
+    def test_method_skips_package_claimed_by_another_worker(self):
+        '''
+        `bulk_tender_create` method should return `False` and leave the daily package alone if
+        another worker is already processing it
+        '''
+
+        DailyPackageDownloadStatus.objects.get(pk=self.status_entry.pk).claim()
+
+        self.assertEqual(
+            (helpers.bulk_tender_create(self.status_entry), self.status_entry.status,
+             os.path.isfile(helpers.get_daily_package_file_path(self.file_name))),
+            (False, DailyPackageDownloadStatus.TIMEOUT, True)
+        )
+
+    def test_method_releases_claim(self):
+        '''
+        `bulk_tender_create` method should release its claim on the daily package once finished
+        '''
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        self.assertIsNone(DailyPackageDownloadStatus.objects.get().claimed_until)
+
+    def test_method_leaves_other_workspaces(self):
+        '''
+        `bulk_tender_create` method should not delete the files of other daily packages, which
+        could be being processed by other workers
+        '''
+
+        other_file_path = helpers.get_daily_package_file_path('20190805_201902.tar.gz')
+
+        shutil.copyfile(os.path.join(settings.TEST_FILES_DIR, self.file_name), other_file_path)
+
+        helpers.bulk_tender_create(self.status_entry)
+
+        self.assertEqual(os.listdir(settings.TEMP_FILES_DIR), ['20190805_201902'])
+
+
+class CommitDailyPackageShardsTests(TestCase):
+    '''
+    TestCase class for the `commit_daily_package_shards` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+        # File is a valid F02 contract notice
+        with open(os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml'), 'rb') as file:
+            xml_str = file.read().decode('latin-1')
+
+        self.shard_results = [[], [[3, '20190802_201901/2018-OJS191-431371.xml', xml_str]]]
+
+    def test_method_creates_new_entries(self):
+        '''
+        `commit_daily_package_shards` method should create new entries from the candidates
+        returned by each shard
+        '''
+
+        helpers.commit_daily_package_shards(self.status_entry, self.shard_results)
+
+        self.assertEqual(models.ContractNotice.objects.all().count(), 1)
+
+    def test_method_sets_status_complete(self):
+        '''
+        `commit_daily_package_shards` method should set the status to `COMPLETE` once finished
+        '''
+
+        helpers.commit_daily_package_shards(self.status_entry, self.shard_results)
+
+        self.assertEqual(self.status_entry.status, DailyPackageDownloadStatus.COMPLETE)
+
+    def test_method_skips_candidates_up_to_checkpoint(self):
+        '''
+        `commit_daily_package_shards` method should skip candidates processed by a previous
+        attempt that timed out
+        '''
+
+        self.status_entry.set_checkpoint('20190802_201901/2018-OJS191-431371.xml')
+
+        helpers.commit_daily_package_shards(self.status_entry, self.shard_results)
+
+        self.assertFalse(models.ContractNotice.objects.exists())
+
+
+class BackfillDailyPackagesReprocessTests(TestCase):
+    '''
+    TestCase class for the `backfill_daily_packages` method with `reprocess` set
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Backfill 20190731_201900.tar.gz, containing 2018-OJS191-431371.xml, a valid contract
+        notice, from a local ftp stand-in so it is mirrored
+        '''
+
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+
+        use_fake_ftp(self, {
+            '20190731_201900.tar.gz': create_daily_package(
+                package_dir, '20190731_201900.tar.gz', ['2018-OJS191-431371.xml']
+            )
+        })
+
+        helpers.backfill_daily_packages(datetime.date(2019, 7, 31), datetime.date(2019, 7, 31))
+
+        # Remove the entries as if they need processing again, and the package from the ftp
+        models.ContractNotice.objects.all().delete()
+        FakeFTP.packages = {}
+
+    def test_method_reprocesses_mirrored_packages(self):
+        '''
+        `backfill_daily_packages` method should process complete packages again from the mirror
+        without using the ftp server
+        '''
+
+        status_entries = helpers.backfill_daily_packages(
+            datetime.date(2019, 7, 31), datetime.date(2019, 7, 31), reprocess=True
+        )
+
+        self.assertEqual(
+            (status_entries[0].status, models.ContractNotice.objects.count()),
+            (DailyPackageDownloadStatus.COMPLETE, 1)
+        )
+
+
+class CreateTendersFromCandidatesTests(TestCase):
+    '''
+    TestCase class for the `create_tenders_from_candidates` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    @override_settings(BULK_TENDER_CREATE_WRITE_BATCH_SIZE=1)
+    def test_method_creates_award_notice_before_contract_notice(self):
+        '''
+        `create_tenders_from_candidates` method should create a contract award notice that comes
+        before its contract notice in a later batch
+        '''
+
+        status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+        candidates = []
+
+        for file_name in ['2019-OJS072-170256.xml', '2018-OJS191-431371.xml']:
+            with open(os.path.join(settings.TEST_FILES_DIR, file_name), 'rb') as file:
+                candidates.append(('20190802_201901/' + file_name, file.read()))
+
+        helpers.create_tenders_from_candidates(status_entry, candidates)
+
+        self.assertEqual(
+            (status_entry.contract_notice_count, status_entry.contract_award_notice_count,
+             models.ContractAwardNotice.objects.count(),
+             PendingContractAwardNotice.objects.exists()),
+            (1, 1, 1, False)
+        )
+
+    def test_method_checkpoints_rejected_files(self):
+        '''
+        `create_tenders_from_candidates` method should checkpoint the files rejected by the
+        pre-filter, so a run that times out carries on after them
+        '''
+
+        status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+        helpers.create_tenders_from_candidates(status_entry, [
+            ('20190802_201901/2019-OJS138-339819.xml', None),
+            ('20190802_201901/2019-OJS143-352044.xml', None)
+        ])
+
+        self.assertEqual(
+            DailyPackageDownloadStatus.objects.get().last_member_name,
+            '20190802_201901/2019-OJS143-352044.xml'
+        )
+
+
+class FindIncompleteDailyPackagesTests(TestCase):
+    '''
+    TestCase class for the `find_incomplete_daily_packages` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        use_fake_ftp(self, {
+            '20190801_201901.tar.gz': '20190802_201901.tar.gz',
+            '20190802_201902.tar.gz': '20190802_201901.tar.gz',
+            '20190805_201903.tar.gz': '20190802_201901.tar.gz',
+            '20190806_201904.tar.gz': '20190802_201901.tar.gz'
+        })
+
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190801_201901.tar.gz', status=DailyPackageDownloadStatus.COMPLETE
+        )
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201902.tar.gz', status=DailyPackageDownloadStatus.TIMEOUT
+        )
+
+    def test_method_returns_missing_and_incomplete_packages(self):
+        '''
+        `find_incomplete_daily_packages` method should return the daily packages without a
+        `DailyPackageDownloadStatus` entry or with an entry that isn't `COMPLETE`
+        '''
+
+        self.assertEqual(
+            helpers.find_incomplete_daily_packages(
+                datetime.date(2019, 8, 1), datetime.date(2019, 8, 31)
+            ),
+            ['20190802_201902.tar.gz', '20190805_201903.tar.gz', '20190806_201904.tar.gz']
+        )
+
+    def test_method_skips_claimed_packages(self):
+        '''
+        `find_incomplete_daily_packages` method should not return daily packages claimed by a
+        worker
+        '''
+
+        DailyPackageDownloadStatus.objects.get(file_name='20190802_201902.tar.gz').claim()
+
+        self.assertEqual(
+            helpers.find_incomplete_daily_packages(
+                datetime.date(2019, 8, 1), datetime.date(2019, 8, 2)
+            ),
+            []
+        )
+
+    def test_method_skips_packages_out_of_attempts(self):
+        '''
+        `find_incomplete_daily_packages` method should not return daily packages left in error
+        after `settings.CATCH_UP_MAX_ATTEMPTS` catch-up attempts
+        '''
+
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190805_201903.tar.gz', status=DailyPackageDownloadStatus.ERROR,
+            catch_up_attempts=3
+        )
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190806_201904.tar.gz', status=DailyPackageDownloadStatus.ERROR,
+            catch_up_attempts=2
+        )
+
+        with self.settings(CATCH_UP_MAX_ATTEMPTS=3):
+            self.assertEqual(
+                helpers.find_incomplete_daily_packages(
+                    datetime.date(2019, 8, 5), datetime.date(2019, 8, 6)
+                ),
+                ['20190806_201904.tar.gz']
+            )
+
+    def test_method_returns_stalled_packages(self):
+        '''
+        `find_incomplete_daily_packages` method should only return daily packages left
+        downloading or processing for longer than `settings.DAILY_PACKAGE_CLAIM_TIMEOUT`
+        '''
+
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190805_201903.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+        DailyPackageDownloadStatus.objects.filter(file_name='20190805_201903.tar.gz').update(
+            modified=datetime.datetime(2019, 8, 5, tzinfo=datetime.timezone.utc)
+        )
+        DailyPackageDownloadStatus.objects.create(
+            file_name='20190806_201904.tar.gz', status=DailyPackageDownloadStatus.DOWNLOADING
+        )
+
+        self.assertEqual(
+            helpers.find_incomplete_daily_packages(
+                datetime.date(2019, 8, 5), datetime.date(2019, 8, 6)
+            ),
+            ['20190805_201903.tar.gz']
+        )
+
+
+class IterDailyPackageCandidatesTests(TestCase):
+    '''
+    TestCase class for the `iter_daily_package_candidates` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        File 20190802_201901.tar.gz is a valid TED daily export archive file containing 1 file
+        that passes the `check_xml_header` pre-filter
+        '''
+
+        self.file_path = os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz')
+        self.expected_names = ['20190802_201901/2019-OJS138-339819.xml']
+
+    def test_method_yields_candidates_serially(self):
+        '''
+        `iter_daily_package_candidates` method should only yield files that pass the
+        `check_xml_header` pre-filter when `workers` is 0
+        '''
+
+        member_names = [
+            member_name
+            for member_name, _ in helpers.iter_daily_package_candidates(self.file_path)
+        ]
+
+        self.assertEqual(member_names, self.expected_names)
+
+    def test_method_yields_candidates_in_parallel(self):
+        '''
+        `iter_daily_package_candidates` method should yield the same files as the serial path
+        when `workers` is greater than 1
+        '''
+
+        member_names = [
+            member_name
+            for member_name, _ in helpers.iter_daily_package_candidates(self.file_path, 2)
+        ]
+
+        self.assertEqual(member_names, self.expected_names)
+
+
+class IterDailyPackageMembersTests(TestCase):
+    '''
+    TestCase class for the `iter_daily_package_members` method
+    '''
+
+    def test_method_yields_xml_files_in_archive(self):
+        '''
+        `iter_daily_package_members` method should yield a `(member_name, member_file)` tuple for
+        each xml file in a valid TED daily package archive
+
+        File 20190802_201901.tar.gz is a valid TED daily export archive file containing 3 files
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz')
+
+        member_names = [
+            member_name for member_name, _ in helpers.iter_daily_package_members(file_path)
+        ]
+
+        self.assertEqual(len(member_names), 3)
+
+    def test_method_doesnt_extract_files_to_disk(self):
+        '''
+        `iter_daily_package_members` method should stream the files out of the archive and not
+        write anything to `settings.TEMP_FILES_DIR`
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz')
+
+        for _, member_file in helpers.iter_daily_package_members(file_path):
+            self.assertTrue(member_file.read())
+
+        self.assertFalse(os.listdir(settings.TEMP_FILES_DIR))
+
+    def test_method_skips_members_up_to_resume_after(self):
         '''
-        `check_daily_package_exists` method should return None if a daily package file for the
-        input date does not exist on the ftp server
+        `iter_daily_package_members` method should skip the files up to and including
+        `resume_after` so processing can carry on from a checkpoint
         '''
 
-        # Create a date in the future
-        future_date = datetime.datetime(2119, 9, 18).date()
+        file_path = os.path.join(settings.TEST_FILES_DIR, '20190802_201901.tar.gz')
 
-        self.assertIsNone(helpers.check_daily_package_exists(future_date))
+        member_names = [
+            member_name for member_name, _ in helpers.iter_daily_package_members(
+                file_path, '20190802_201901/2019-OJS115-281492.xml'
+            )
+        ]
 
-    def test_method_returns_filenam_if_package_does_exist(self):
+        self.assertEqual(member_names, ['20190802_201901/2019-OJS143-352044.xml'])
+
+    def test_method_raises_error_if_first_member_not_directory(self):
+        '''
+        `iter_daily_package_members` method should raise `tarfile.ReadError` if the first member
+        of the archive is not the package directory
+
+        File invalidarchive.tar.gz is a .tar.gz archive with no package directory
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, 'invalidarchive.tar.gz')
+
+        with self.assertRaises(tarfile.ReadError):
+            list(helpers.iter_daily_package_members(file_path))
+
+    def test_method_raises_error_if_not_gzip_archive(self):
+        '''
+        `iter_daily_package_members` method should raise `tarfile.ReadError` if the file is not a
+        .tar.gz archive
+
+        File emptyarchive.tar.gz is not a gzip file
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, 'emptyarchive.tar.gz')
+
+        with self.assertRaises(tarfile.ReadError):
+            list(helpers.iter_daily_package_members(file_path))
+
+
+class ParseDailyPackageShardTests(TestCase):
+    '''
+    TestCase class for the `parse_daily_package_shard` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        File 20190802_201901.tar.gz is a valid TED daily export archive file containing 1 file
+        that passes the `check_xml_header` pre-filter. Copy it to its workspace as if it had
+        been downloaded
+        '''
+
+        self.file_name = '20190802_201901.tar.gz'
+
+        shutil.copyfile(
+            os.path.join(settings.TEST_FILES_DIR, self.file_name),
+            helpers.get_daily_package_file_path(self.file_name)
+        )
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name=self.file_name, status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+    def tearDown(self):
+        '''
+        Delete the copied file
+        '''
+
+        helpers.clear_temp_files_dir()
+
+    def test_method_returns_candidates_across_shards(self):
+        '''
+        `parse_daily_package_shard` method should return each candidate file in exactly one shard
+        '''
+
+        candidates = []
+
+        for shard_index in range(3):
+            candidates += helpers.parse_daily_package_shard(self.status_entry, shard_index, 3)
+
+        self.assertEqual(
+            [member_name for _, member_name, _ in candidates],
+            ['20190802_201901/2019-OJS138-339819.xml']
+        )
+
+    def test_method_returns_original_bytes(self):
+        '''
+        `parse_daily_package_shard` method should return a string that can be encoded back to the
+        original file exactly
+        '''
+
+        _, _, xml_str = helpers.parse_daily_package_shard(self.status_entry, 0, 1)[0]
+
+        with open(os.path.join(settings.TEST_FILES_DIR, '2019-OJS138-339819.xml'), 'rb') as file:
+            self.assertEqual(xml_str.encode('latin-1'), file.read())
+
+    def test_method_restores_missing_archive_from_mirror(self):
         '''
-        `check_daily_package_exists` method should return the correct filename if a daily package
-        file for the input date does exist on the ftp server
+        `parse_daily_package_shard` method should copy the archive from the daily package mirror
+        to a file of its own, rather than download it from the ftp server, if it isn't on this
+        machine
         '''
 
-        # Create a date in the past
-        past_date = datetime.datetime(2019, 9, 17).date()
+        use_fake_ftp(self, {})
+
+        file_path = helpers.get_daily_package_file_path(self.file_name)
+
+        mirror.mirror_daily_package_file(self.file_name, file_path)
+        os.remove(file_path)
 
-        self.assertEqual(helpers.check_daily_package_exists(past_date), '20190917_2019179.tar.gz')
+        candidates = helpers.parse_daily_package_shard(self.status_entry, 0, 1)
+
+        self.assertEqual(
+            ([member_name for _, member_name, _ in candidates], FakeFTP.bytes_sent,
+             os.listdir(helpers.get_daily_package_workspace(self.file_name))),
+            (['20190802_201901/2019-OJS138-339819.xml'], 0, [])
+        )
 
 
 class RetrieveDailyPackageFileTests(TestCase):
@@ -52,7 +813,7 @@ class RetrieveDailyPackageFileTests(TestCase):
         '''
 
         self.valid_file_name = '20190913_2019177.tar.gz'
-        self.expected_file_path = os.path.join(settings.TEMP_FILES_DIR, self.valid_file_name)
+        self.expected_file_path = helpers.get_daily_package_file_path(self.valid_file_name)
 
     def test_method_returns_error_string_if_retrieve_fails(self):
         '''
@@ -100,6 +861,430 @@ class RetrieveDailyPackageFileTests(TestCase):
         os.remove(self.expected_file_path)
 
 
+class StreamDailyPackageTests(TestCase):
+    '''
+    TestCase class for the `stream_daily_package` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Serve 20190731_201900.tar.gz, containing 2018-OJS191-431371.xml, a valid contract notice,
+        from a local ftp stand-in
+        '''
+
+        package_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, package_dir)
+
+        use_fake_ftp(self, {
+            '20190731_201900.tar.gz': create_daily_package(
+                package_dir, '20190731_201900.tar.gz', ['2018-OJS191-431371.xml']
+            )
+        })
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190731_201900.tar.gz'
+        )
+
+    def test_method_creates_new_entries(self):
+        '''
+        `stream_daily_package` method should create new entries from the daily package as it
+        downloads and set the status to `COMPLETE`
+        '''
+
+        helpers.stream_daily_package(self.status_entry)
+
+        self.assertEqual(
+            (self.status_entry.status, models.ContractNotice.objects.count()),
+            (DailyPackageDownloadStatus.COMPLETE, 1)
+        )
+
+    def test_method_doesnt_mirror_package(self):
+        '''
+        `stream_daily_package` method should leave mirroring the downloaded daily package to
+        `sync_daily_package_mirror_task`, so the upload doesn't count against the time limit of the
+        calling task
+        '''
+
+        helpers.stream_daily_package(self.status_entry)
+
+        self.assertFalse(DailyPackageMirror.objects.exists())
+
+    def test_method_records_download_error(self):
+        '''
+        `stream_daily_package` method should set the status to `ERROR` with the ftp error if the
+        download fails
+        '''
+
+        FakeFTP.packages = {}
+
+        helpers.stream_daily_package(self.status_entry)
+
+        self.assertEqual(
+            (self.status_entry.status, self.status_entry.status_msg),
+            (DailyPackageDownloadStatus.ERROR,
+             '550 20190731_201900.tar.gz: No such file or directory')
+        )
+
+    @override_settings(TED_FTP_DOWNLOAD_ATTEMPTS=1)
+    def test_method_resumes_partial_download(self):
+        '''
+        `stream_daily_package` method should carry on from a partial download kept by a failed
+        attempt and create the new entries from the whole file
+        '''
+
+        FakeFTP.failures = 10
+        FakeFTP.fail_after_bytes = 100
+
+        helpers.stream_daily_package(self.status_entry)
+
+        FakeFTP.failures = 0
+
+        helpers.stream_daily_package(self.status_entry)
+
+        self.assertEqual(
+            (self.status_entry.status, models.ContractNotice.objects.count()),
+            (DailyPackageDownloadStatus.COMPLETE, 1)
+        )
+
+    @override_settings(BULK_TENDER_CREATE_STREAMING=True)
+    def test_bulk_tender_create_streams_package(self):
+        '''
+        `bulk_tender_create` method should use `stream_daily_package` if
+        `settings.BULK_TENDER_CREATE_STREAMING` is True
+        '''
+
+        with mock.patch('tasks.helpers.stream_daily_package',
+                        wraps=helpers.stream_daily_package) as stream_daily_package:
+            helpers.bulk_tender_create(self.status_entry)
+
+        self.assertEqual(
+            (stream_daily_package.call_count, models.ContractNotice.objects.count()), (1, 1)
+        )
+
+
+class SyncDailyPackageMirrorTests(TestCase):
+    '''
+    TestCase class for the `sync_daily_package_mirror` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        use_fake_ftp(self, {
+            '20190802_201901.tar.gz': '20190802_201901.tar.gz',
+            '20190805_201902.tar.gz': 'emptyarchive.tar.gz'
+        })
+
+        self.start_date = datetime.date(2019, 8, 1)
+        self.end_date = datetime.date(2019, 8, 31)
+
+    def test_method_mirrors_new_packages(self):
+        '''
+        `sync_daily_package_mirror` method should mirror packages that aren't in the mirror
+        '''
+
+        self.assertEqual(
+            helpers.sync_daily_package_mirror(self.start_date, self.end_date),
+            ['20190802_201901.tar.gz', '20190805_201902.tar.gz']
+        )
+
+    def test_method_skips_packages_already_mirrored(self):
+        '''
+        `sync_daily_package_mirror` method should not mirror packages again if their size and
+        modify facts haven't changed
+        '''
+
+        helpers.sync_daily_package_mirror(self.start_date, self.end_date)
+
+        self.assertEqual(
+            helpers.sync_daily_package_mirror(self.start_date, self.end_date),
+            []
+        )
+
+    def test_method_mirrors_changed_packages(self):
+        '''
+        `sync_daily_package_mirror` method should mirror packages again if they have changed on the
+        ftp server
+        '''
+
+        helpers.sync_daily_package_mirror(self.start_date, self.end_date)
+
+        DailyPackageMirror.objects.filter(file_name='20190805_201902.tar.gz').update(size=1)
+
+        self.assertEqual(
+            helpers.sync_daily_package_mirror(self.start_date, self.end_date),
+            ['20190805_201902.tar.gz']
+        )
+
+
+class WriteDailyPackageBatchTests(TestCase):
+    '''
+    TestCase class for the `write_daily_package_batch` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+        '''
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+        # 2019-OJS072-170256.xml is a contract award notice for the 2018-OJS191-431371.xml
+        # contract notice. It comes first to check contract notices are written first
+        self.batch = []
+
+        for file_name in ['2019-OJS072-170256.xml', '2018-OJS191-431371.xml']:
+            with open(os.path.join(settings.TEST_FILES_DIR, file_name), 'rb') as file:
+                self.batch.append(('20190802_201901/' + file_name, file.read()))
+
+    def test_method_creates_new_entries(self):
+        '''
+        `write_daily_package_batch` method should create a contract award notice for a contract
+        notice in the same batch
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        self.assertEqual(
+            (models.ContractNotice.objects.count(), models.ContractAwardNotice.objects.count()),
+            (1, 1)
+        )
+
+    def test_method_skips_existing_entries(self):
+        '''
+        `write_daily_package_batch` method should not create entries that are already in the
+        database
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        self.assertEqual(
+            (models.ContractNotice.objects.count(), models.ContractAwardNotice.objects.count(),
+             self.status_entry.contract_notice_count,
+             self.status_entry.contract_award_notice_count),
+            (1, 1, 1, 1)
+        )
+
+    def test_method_queries_dont_grow_with_batch_size(self):
+        '''
+        `write_daily_package_batch` method should make the same number of queries for a batch of
+        files that are already in the database, however many files there are
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        with CaptureQueriesContext(connection) as small_batch_queries:
+            helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        with CaptureQueriesContext(connection) as large_batch_queries:
+            helpers.write_daily_package_batch(self.status_entry, self.batch * 20)
+
+        self.assertEqual(len(large_batch_queries), len(small_batch_queries))
+
+    def test_method_keeps_award_notice_without_contract_notice(self):
+        '''
+        `write_daily_package_batch` method should keep a contract award notice whose contract
+        notice isn't in the database as a `PendingContractAwardNotice` entry
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch[:1])
+        helpers.write_daily_package_batch(self.status_entry, self.batch[:1])
+
+        pending_entry = PendingContractAwardNotice.objects.get()
+
+        self.assertEqual(
+            (pending_entry.ojs_ref, pending_entry.ref_notice_ojs, pending_entry.status_entry,
+             bytes(pending_entry.xml_data), models.ContractAwardNotice.objects.count()),
+            ('2019/S 072-170256', '2018/S 191-431371', self.status_entry, self.batch[0][1], 0)
+        )
+
+    def test_method_reads_files_once(self):
+        '''
+        `write_daily_package_batch` method should not parse files again when a batch is processed
+        again
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        with mock.patch('tenders.parsing.get_xml_root') as mock_get_xml_root:
+            helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        mock_get_xml_root.assert_not_called()
+
+    @override_settings(DAILY_PACKAGE_VALIDATE_SCHEMA=True)
+    def test_method_validates_schema(self):
+        '''
+        `write_daily_package_batch` method should skip files that aren't valid against their xml
+        schema if `settings.DAILY_PACKAGE_VALIDATE_SCHEMA` is True, and record the number skipped
+        and the time taken
+        '''
+
+        # Add an element the schema doesn't allow to the contract notice
+        self.batch[1] = (self.batch[1][0], self.batch[1][1].replace(
+            b'</TECHNICAL_SECTION>', b'<UNKNOWN_ELEMENT/></TECHNICAL_SECTION>'
+        ))
+
+        self.status_entry.start_run_metrics()
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch)
+
+        metrics = self.status_entry.get_latest_metrics()
+
+        self.assertEqual(
+            (models.ContractNotice.objects.count(), PendingContractAwardNotice.objects.count(),
+             metrics.members_invalid, metrics.validate_seconds > 0),
+            (0, 1, 1, True)
+        )
+
+
+class ResolvePendingContractAwardNoticesTests(TestCase):
+    '''
+    TestCase class for the `resolve_pending_contract_award_notices` method
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Keep the 2019-OJS072-170256.xml contract award notice as a `PendingContractAwardNotice`
+        entry, as its 2018-OJS191-431371.xml contract notice isn't in the database
+        '''
+
+        self.status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+
+        self.batch = []
+
+        for file_name in ['2019-OJS072-170256.xml', '2018-OJS191-431371.xml']:
+            with open(os.path.join(settings.TEST_FILES_DIR, file_name), 'rb') as file:
+                self.batch.append(('20190802_201901/' + file_name, file.read()))
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch[:1])
+
+    def test_method_creates_award_notice(self):
+        '''
+        `resolve_pending_contract_award_notices` method should create the contract award notice
+        once its contract notice is in the database, and delete the pending entry
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch[1:])
+
+        self.assertEqual(
+            (helpers.resolve_pending_contract_award_notices(),
+             models.ContractAwardNotice.objects.get().ojs_ref,
+             PendingContractAwardNotice.objects.exists()),
+            (1, '2019/S 072-170256', False)
+        )
+
+    def test_method_keeps_award_notice_without_contract_notice(self):
+        '''
+        `resolve_pending_contract_award_notices` method should keep the pending entry while its
+        contract notice isn't in the database
+        '''
+
+        with self.assertNumQueries(1):
+            resolved_count = helpers.resolve_pending_contract_award_notices()
+
+        self.assertEqual((resolved_count, PendingContractAwardNotice.objects.count()), (0, 1))
+
+    def test_method_deletes_existing_award_notice(self):
+        '''
+        `resolve_pending_contract_award_notices` method should delete a pending entry if the
+        contract award notice is already in the database
+        '''
+
+        helpers.write_daily_package_batch(self.status_entry, self.batch[::-1])
+
+        self.assertEqual(
+            (helpers.resolve_pending_contract_award_notices(),
+             PendingContractAwardNotice.objects.exists()),
+            (0, False)
+        )
+
+
+class ClearDailyPackageWorkspaceTests(TestCase):
+    '''
+    TestCase class for the `clear_daily_package_workspace` method
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Put a downloaded file and a partially downloaded file in the workspaces of two daily
+        packages
+        '''
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        for file_name in ['20190802_201901.tar.gz', '20190805_201902.tar.gz']:
+            file_path = helpers.get_daily_package_file_path(file_name)
+
+            for path in [file_path, file_path + ftp.PARTIAL_DOWNLOAD_SUFFIX]:
+                with open(path, 'wb') as file:
+                    file.write(b'data')
+
+    def test_method_removes_workspace(self):
+        '''
+        `clear_daily_package_workspace` method should remove the workspace of the daily package
+        and leave the other workspaces alone
+        '''
+
+        helpers.clear_daily_package_workspace('20190802_201901.tar.gz')
+
+        self.assertEqual(os.listdir(settings.TEMP_FILES_DIR), ['20190805_201902'])
+
+    def test_method_keeps_partial_downloads(self):
+        '''
+        `clear_daily_package_workspace` method should keep a partially downloaded file if
+        `keep_partial_downloads` is True
+        '''
+
+        helpers.clear_daily_package_workspace(
+            '20190802_201901.tar.gz', keep_partial_downloads=True
+        )
+
+        self.assertEqual(
+            os.listdir(helpers.get_daily_package_workspace('20190802_201901.tar.gz')),
+            ['20190802_201901.tar.gz.part']
+        )
+
+    def test_method_doesnt_error_without_workspace(self):
+        '''
+        `clear_daily_package_workspace` method should not error if the daily package has no
+        workspace
+        '''
+
+        helpers.clear_daily_package_workspace('20190806_201903.tar.gz')
+
+        self.assertFalse(os.path.exists(os.path.join(settings.TEMP_FILES_DIR, '20190806_201903')))
+
+
 def copy_files():
     '''
     Copy some files from `TEST_FILES_DIR` to `TEMP_FILES_DIR`
@@ -173,3 +1358,21 @@ class ClearTempFilesDirTests(TestCase):
 
         # Confirm the folder is empty
         self.assertFalse(os.listdir(settings.TEMP_FILES_DIR))
+
+    def test_method_keeps_partial_downloads(self):
+        '''
+        `clear_temp_files_dir` helper method should keep partial downloads if
+        `keep_partial_downloads` is True
+        '''
+
+        copy_files()
+
+        part_file_path = os.path.join(settings.TEMP_FILES_DIR, '20190802_201901.tar.gz.part')
+
+        open(part_file_path, 'wb').close()
+
+        helpers.clear_temp_files_dir(keep_partial_downloads=True)
+
+        self.assertEqual(os.listdir(settings.TEMP_FILES_DIR), ['20190802_201901.tar.gz.part'])
+
+        os.remove(part_file_path)
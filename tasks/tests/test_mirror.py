@@ -0,0 +1,107 @@
+'''
+Tests for the daily package mirror functions in the `tasks` Django web application
+'''
+
+
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files import File
+from django.test import TestCase
+
+from tasks import helpers, mirror
+from tasks.models import DailyPackageMirror
+from tasks.tests.helpers import FakeFTP, use_fake_ftp
+
+
+class DailyPackageMirrorTests(TestCase):
+    '''
+    TestCase class for the daily package mirror methods `mirror_daily_package_file`,
+    `restore_daily_package_file` and `retrieve_daily_package_file`
+    '''
+
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        Serve 20190802_201901.tar.gz, a valid TED daily export archive file, from a local ftp
+        stand-in
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        self.file_name = '20190802_201901.tar.gz'
+        self.file_path = helpers.get_daily_package_file_path(self.file_name)
+
+    def test_retrieve_doesnt_add_file_to_mirror(self):
+        '''
+        `retrieve_daily_package_file` method should leave mirroring a file downloaded from the ftp
+        server to `sync_daily_package_mirror_task`, so the upload doesn't count against the time
+        limit of the calling task
+        '''
+
+        helpers.retrieve_daily_package_file(self.file_name)
+
+        self.assertFalse(DailyPackageMirror.objects.exists())
+
+    def test_retrieve_uses_mirror(self):
+        '''
+        `retrieve_daily_package_file` method should copy a file from the mirror rather than the
+        ftp server if it has been mirrored
+        '''
+
+        helpers.retrieve_daily_package_file(self.file_name)
+        mirror.mirror_daily_package_file(self.file_name, self.file_path)
+        os.remove(self.file_path)
+
+        # The file is no longer on the ftp server
+        FakeFTP.packages = {}
+
+        return_str = helpers.retrieve_daily_package_file(self.file_name)
+
+        self.assertEqual(
+            (return_str, os.path.isfile(self.file_path)), (mirror.MIRROR_RETURN_STR, True)
+        )
+
+    def test_mirror_records_file_details(self):
+        '''
+        `mirror_daily_package_file` method should record the size, checksum and ftp modify fact of
+        the mirrored file
+        '''
+
+        shutil.copyfile(os.path.join(settings.TEST_FILES_DIR, self.file_name), self.file_path)
+
+        mirror_entry = mirror.mirror_daily_package_file(
+            self.file_name, self.file_path, {'size': '10', 'modify': '20190802093013'}
+        )
+
+        self.assertEqual(
+            (mirror_entry.size, len(mirror_entry.checksum), mirror_entry.ftp_modify),
+            (os.path.getsize(self.file_path), 64, '20190802093013')
+        )
+
+    def test_restore_returns_false_if_checksum_doesnt_match(self):
+        '''
+        `restore_daily_package_file` method should not use a mirrored file if its checksum doesn't
+        match
+        '''
+
+        helpers.retrieve_daily_package_file(self.file_name)
+        mirror_entry = mirror.mirror_daily_package_file(self.file_name, self.file_path)
+        os.remove(self.file_path)
+
+        # Store a different file under the mirrored name
+        storage = mirror.get_daily_package_mirror_storage()
+        storage.delete(mirror_entry.storage_name)
+
+        with open(os.path.join(settings.TEST_FILES_DIR, 'emptyarchive.tar.gz'), 'rb') as file:
+            storage.save(mirror_entry.storage_name, File(file))
+
+        self.assertEqual(
+            (mirror.restore_daily_package_file(mirror_entry, self.file_path),
+             os.path.isfile(self.file_path)),
+            (False, False)
+        )
@@ -119,6 +119,246 @@ class DailyPackageDownloadStatusTests(TestCase):
 
         self.assertEqual(self.entry.file_date, expected_date)
 
+    def test_is_resumable_returns_false_by_default(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `is_resumable()` method should return `False` if
+        processing of the daily package hasn't started
+        '''
+
+        self.assertFalse(self.entry.is_resumable())
+
+    def test_is_resumable_returns_true_after_timeout(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `is_resumable()` method should return `True` if
+        processing of the daily package timed out
+        '''
+
+        self.entry.set_status(models.DailyPackageDownloadStatus.TIMEOUT)
+
+        self.assertTrue(self.entry.is_resumable())
+
+    def test_set_checkpoint_updates_last_member_name(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `set_checkpoint()` method should update and save
+        the `last_member_name` field
+        '''
+
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339819.xml')
+
+        self.entry.refresh_from_db()
+
+        self.assertEqual(self.entry.last_member_name, '20190801_2019147/2019-OJS138-339819.xml')
+
+    def test_set_checkpoint_increments_count(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `set_checkpoint()` method should increment the
+        counts by the input number of new entries
+        '''
+
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339819.xml',
+                                  contract_award_notice_count=2)
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339820.xml',
+                                  contract_award_notice_count=1)
+
+        self.assertEqual(self.entry.contract_award_notice_count, 3)
+
+    def test_reset_checkpoint_clears_checkpoint(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `reset_checkpoint()` method should clear the
+        checkpoint fields
+        '''
+
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339819.xml',
+                                  contract_notice_count=1)
+
+        self.entry.reset_checkpoint()
+
+        self.assertEqual(
+            (self.entry.last_member_name, self.entry.contract_notice_count), (None, 0)
+        )
+
+    def test_set_checkpoint_keeps_fields_updated_elsewhere(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `set_checkpoint()` method should not overwrite the
+        claim or the catch-up attempts updated by another worker
+        '''
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            catch_up_attempts=2
+        )
+        models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()
+
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339819.xml')
+
+        self.entry.refresh_from_db()
+
+        self.assertEqual(
+            (self.entry.catch_up_attempts, self.entry.claimed_until is not None), (2, True)
+        )
+
+    def test_set_status_keeps_fields_updated_elsewhere(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `set_status()` method should not overwrite the
+        claim or the catch-up attempts updated by another worker
+        '''
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            catch_up_attempts=2
+        )
+        models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()
+
+        self.entry.set_status(models.DailyPackageDownloadStatus.PROCESSING)
+
+        self.entry.refresh_from_db()
+
+        self.assertEqual(
+            (self.entry.status, self.entry.catch_up_attempts, self.entry.claimed_until is not None),
+            (models.DailyPackageDownloadStatus.PROCESSING, 2, True)
+        )
+
+    def test_reset_checkpoint_saves_checkpoint(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `reset_checkpoint()` method should save the
+        cleared checkpoint fields
+        '''
+
+        self.entry.set_checkpoint('20190801_2019147/2019-OJS138-339819.xml',
+                                  contract_notice_count=1)
+
+        self.entry.reset_checkpoint()
+
+        self.entry.refresh_from_db()
+
+        self.assertEqual(
+            (self.entry.last_member_name, self.entry.contract_notice_count), (None, 0)
+        )
+
+    def test_start_run_metrics_creates_metrics(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `start_run_metrics()` method should create a new
+        `DailyPackageMetrics` entry and keep it in `run_metrics`
+        '''
+
+        metrics = self.entry.start_run_metrics()
+
+        self.assertEqual(
+            (self.entry.run_metrics, list(self.entry.dailypackagemetrics_set.all())),
+            (metrics, [metrics])
+        )
+
+    def test_get_latest_metrics_returns_latest_run(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `get_latest_metrics()` method should return the
+        `DailyPackageMetrics` entry of the latest run
+        '''
+
+        self.entry.start_run_metrics()
+        metrics = self.entry.start_run_metrics()
+
+        self.assertEqual(self.entry.get_latest_metrics(), metrics)
+
+    def test_get_latest_metrics_returns_none_before_run(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `get_latest_metrics()` method should return None
+        if there hasn't been a run
+        '''
+
+        self.assertIsNone(self.entry.get_latest_metrics())
+
+    def test_claim_returns_true_if_not_claimed(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `claim()` method should claim the entry if no
+        other worker has claimed it
+        '''
+
+        self.assertTrue(self.entry.claim())
+
+    def test_claim_returns_false_if_already_claimed(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `claim()` method should not claim the entry if
+        another worker has claimed it
+        '''
+
+        models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()
+
+        self.assertFalse(self.entry.claim())
+
+    def test_claim_returns_true_if_claim_expired(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `claim()` method should claim the entry if the
+        claim of another worker has expired, e.g. the worker was killed
+        '''
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+
+        self.assertTrue(self.entry.claim())
+
+    def test_release_allows_new_claim(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `release()` method should let the entry be
+        claimed again
+        '''
+
+        self.entry.claim()
+        self.entry.release()
+
+        self.assertTrue(models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim())
+
+    def test_release_leaves_claim_of_another_worker(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `release()` method should not release the claim
+        of another worker that claimed the entry after this worker's claim ran out
+        '''
+
+        self.entry.claim()
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()
+
+        self.entry.release()
+
+        self.assertFalse(models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim())
+
+    def test_renew_claim_extends_claim(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `renew_claim()` method should extend the claim of
+        this worker, even if it has run out, if no other worker has claimed the entry since
+        '''
+
+        self.entry.claim()
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        self.entry.claimed_until = models.DailyPackageDownloadStatus.objects.get(
+            pk=self.entry.pk
+        ).claimed_until
+
+        self.assertEqual(
+            (self.entry.renew_claim(),
+             models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()),
+            (True, False)
+        )
+
+    def test_renew_claim_returns_false_if_claimed_by_another_worker(self):
+        '''
+        `DailyPackageDownloadStatus` model entry `renew_claim()` method should return `False` if
+        this worker's claim ran out and another worker has claimed the entry since
+        '''
+
+        self.entry.claim()
+
+        models.DailyPackageDownloadStatus.objects.filter(pk=self.entry.pk).update(
+            claimed_until=timezone.now() - datetime.timedelta(seconds=1)
+        )
+        models.DailyPackageDownloadStatus.objects.get(pk=self.entry.pk).claim()
+
+        self.assertFalse(self.entry.renew_claim())
+
 
 class EmailNotificationStatusTests(TestCase):
     '''
@@ -3,18 +3,58 @@ Tests for tasks in the `tasks` Django web application
 '''
 
 
+from unittest import mock
+
 from django.core import mail
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
+from celery.exceptions import Retry, SoftTimeLimitExceeded
 
 from profiles.models import TedSearchTerm
-from tasks import tasks
-from tasks.models import EmailNotificationStatus
+from tasks import helpers, tasks
+from tasks.models import DailyPackageDownloadStatus, EmailNotificationStatus
+from tasks.tests.helpers import FakeFTP, use_fake_ftp
 from tenders import models
 from tenders.tests.helpers import create_contract_notice_file_data
 
 
+class BackfillDailyPackagesTaskTests(TestCase):
+    '''
+    TestCase class for the `backfill_daily_packages_task` task
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        '''
+        Common across individual tests
+
+        Serve 20190802_201901.tar.gz, a valid TED daily export archive file, and
+        emptyarchive.tar.gz, an invalid archive file, from a local ftp stand-in
+        '''
+
+        use_fake_ftp(self, {
+            '20190801_201901.tar.gz': 'emptyarchive.tar.gz',
+            '20190802_201901.tar.gz': '20190802_201901.tar.gz'
+        })
+
+    def test_task_returns_summary_str(self):
+        '''
+        `backfill_daily_packages_task` should return the number of daily packages processed and
+        the number of errors
+        '''
+
+        return_str = tasks.backfill_daily_packages_task('01/08/2019', '02/08/2019')
+
+        self.assertEqual(
+            return_str, '01/08/2019 - 02/08/2019: 2 daily package(s) processed, 1 error(s).'
+        )
+
+
 class BulkTenderCreateTaskTests(TestCase):
     '''
     TestCase class for the `bulk_tender_create_task` task
@@ -64,6 +104,265 @@ class BulkTenderCreateTaskTests(TestCase):
         # File contains 11 relevant contract notices
         self.assertEqual(models.ContractNotice.objects.all().count(), 9)
 
+    @override_settings(BULK_TENDER_CREATE_CHECKPOINT_MEMBERS=1)
+    def test_task_resumes_after_timeout(self):
+        '''
+        `bulk_tender_create_task` should checkpoint the files read before it times out part way
+        through a daily package with fewer matching files than a write batch, so the retry carries
+        on from the next file without downloading the package again
+
+        File 20190802_201901.tar.gz is a valid TED daily export archive file with 3 files, 1 of
+        which passes the pre-filter
+        '''
+
+        file_name = '20190802_201901.tar.gz'
+
+        use_fake_ftp(self, {file_name: file_name})
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        filter_daily_package_member = helpers.filter_daily_package_member
+
+        def time_out_on_last_file(member):
+            if member[0] == '20190802_201901/2019-OJS143-352044.xml':
+                raise SoftTimeLimitExceeded()
+
+            return filter_daily_package_member(member)
+
+        with mock.patch('tasks.helpers.filter_daily_package_member',
+                        side_effect=time_out_on_last_file):
+            with self.assertRaises(Retry):
+                tasks.bulk_tender_create_task(file_name)
+
+        status_entry = DailyPackageDownloadStatus.objects.get(file_name=file_name)
+
+        self.assertEqual(
+            (status_entry.status, status_entry.last_member_name),
+            (DailyPackageDownloadStatus.TIMEOUT, '20190802_201901/2019-OJS115-281492.xml')
+        )
+
+        bytes_sent = FakeFTP.bytes_sent
+
+        # Run the retry
+        with mock.patch('tasks.helpers.filter_daily_package_member',
+                        wraps=filter_daily_package_member) as filter_mock:
+            tasks.bulk_tender_create_task(file_name)
+
+        status_entry.refresh_from_db()
+
+        self.assertEqual(
+            (status_entry.status, filter_mock.call_count, FakeFTP.bytes_sent),
+            (DailyPackageDownloadStatus.COMPLETE, 1, bytes_sent)
+        )
+
+
+class CatchUpDailyPackagesTaskTests(TestCase):
+    '''
+    TestCase class for the `catch_up_daily_packages_task` task
+    '''
+
+    def setUp(self):
+        '''
+        Common across individual tests
+
+        Five daily packages are missing and processing them is patched out
+        '''
+
+        self.file_names = ['201908{:02d}_2019{:02d}.tar.gz'.format(day, day) for day in range(1, 6)]
+
+        patcher = mock.patch('tasks.helpers.find_incomplete_daily_packages',
+                             return_value=self.file_names)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        patcher = mock.patch('tasks.tasks.bulk_tender_create_task.delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_task_starts_oldest_packages_up_to_limit(self):
+        '''
+        `catch_up_daily_packages_task` should start processing the oldest missing daily packages,
+        up to `settings.CATCH_UP_MAX_PACKAGES` of them
+        '''
+
+        with self.settings(CATCH_UP_MAX_PACKAGES=3):
+            return_str = tasks.catch_up_daily_packages_task()
+
+        self.assertEqual(
+            [call[0][0] for call in self.delay.call_args_list], self.file_names[:3]
+        )
+        self.assertEqual(return_str, '3 of 5 incomplete daily package(s) started.')
+
+    def test_task_creates_status_entries(self):
+        '''
+        `catch_up_daily_packages_task` should create a `DailyPackageDownloadStatus` entry for each
+        daily package it starts
+        '''
+
+        with self.settings(CATCH_UP_MAX_PACKAGES=2):
+            tasks.catch_up_daily_packages_task()
+
+        self.assertEqual(
+            list(DailyPackageDownloadStatus.objects.order_by('file_name').values_list(
+                'file_name', flat=True
+            )),
+            self.file_names[:2]
+        )
+
+    def test_task_leaves_room_for_claimed_packages(self):
+        '''
+        `catch_up_daily_packages_task` should count daily packages already being processed
+        against `settings.CATCH_UP_MAX_PACKAGES`
+        '''
+
+        DailyPackageDownloadStatus.objects.create(file_name='20190731_201900.tar.gz').claim()
+
+        with self.settings(CATCH_UP_MAX_PACKAGES=3):
+            tasks.catch_up_daily_packages_task()
+
+        self.assertEqual(self.delay.call_count, 2)
+
+    def test_task_counts_attempts(self):
+        '''
+        `catch_up_daily_packages_task` should add one to `catch_up_attempts` of each daily package
+        it starts
+        '''
+
+        DailyPackageDownloadStatus.objects.create(
+            file_name=self.file_names[0], status=DailyPackageDownloadStatus.ERROR,
+            catch_up_attempts=1
+        )
+
+        with self.settings(CATCH_UP_MAX_PACKAGES=2):
+            tasks.catch_up_daily_packages_task()
+
+        self.assertEqual(
+            list(DailyPackageDownloadStatus.objects.order_by('file_name').values_list(
+                'catch_up_attempts', flat=True
+            )),
+            [2, 1]
+        )
+
+
+class CommitDailyPackageTaskTests(TestCase):
+    '''
+    TestCase class for the `commit_daily_package_task` task
+    '''
+
+    def test_task_releases_claim(self):
+        '''
+        `commit_daily_package_task` should release the claim on the daily package made by
+        `download_daily_package_task` once finished
+        '''
+
+        status_entry = DailyPackageDownloadStatus.objects.create(
+            file_name='20190802_201901.tar.gz', status=DailyPackageDownloadStatus.PROCESSING
+        )
+        status_entry.claim()
+
+        tasks.commit_daily_package_task([], status_entry.file_name)
+
+        status_entry.refresh_from_db()
+
+        self.assertEqual(
+            (status_entry.status, status_entry.claimed_until),
+            (DailyPackageDownloadStatus.COMPLETE, None)
+        )
+
+
+class DownloadDailyPackageTaskTests(TestCase):
+    '''
+    TestCase class for the `download_daily_package_task` task
+    '''
+
+    def setUp(self):
+        '''
+        Common across individual tests
+
+        Serve 20190802_201901.tar.gz, a valid TED daily export archive file, from a local ftp
+        stand-in
+        '''
+
+        use_fake_ftp(self, {'20190802_201901.tar.gz': '20190802_201901.tar.gz'})
+
+        self.addCleanup(helpers.clear_temp_files_dir)
+
+        self.file_name = '20190802_201901.tar.gz'
+
+    def test_task_claims_package(self):
+        '''
+        `download_daily_package_task` should download the daily package and keep it claimed for
+        the rest of the pipeline
+        '''
+
+        tasks.download_daily_package_task(self.file_name)
+
+        status_entry = DailyPackageDownloadStatus.objects.get(file_name=self.file_name)
+
+        self.assertEqual(
+            (status_entry.status, status_entry.claimed_until is not None),
+            (DailyPackageDownloadStatus.PROCESSING, True)
+        )
+
+    def test_task_records_run_metrics(self):
+        '''
+        `download_daily_package_task` should record the size of the download with the run metrics
+        '''
+
+        tasks.download_daily_package_task(self.file_name)
+
+        status_entry = DailyPackageDownloadStatus.objects.get(file_name=self.file_name)
+
+        self.assertEqual(status_entry.get_latest_metrics().bytes_downloaded, FakeFTP.bytes_sent)
+
+    def test_task_retries_on_timeout(self):
+        '''
+        `download_daily_package_task` should record a timeout, release the claim on the daily
+        package and retry if the download takes too long
+        '''
+
+        with mock.patch('tasks.helpers.download_daily_package',
+                        side_effect=SoftTimeLimitExceeded()):
+            with self.assertRaises(Retry):
+                tasks.download_daily_package_task(self.file_name)
+
+        status_entry = DailyPackageDownloadStatus.objects.get(file_name=self.file_name)
+
+        self.assertEqual(
+            (status_entry.status, status_entry.claimed_until),
+            (DailyPackageDownloadStatus.TIMEOUT, None)
+        )
+
+    def test_task_skips_claimed_package(self):
+        '''
+        `download_daily_package_task` should not download a daily package another worker is
+        processing
+        '''
+
+        DailyPackageDownloadStatus.objects.create(file_name=self.file_name).claim()
+
+        return_str = tasks.download_daily_package_task(self.file_name)
+
+        self.assertEqual(
+            (return_str, FakeFTP.bytes_sent),
+            ('20190802_201901.tar.gz is already being processed.', 0)
+        )
+
+    def test_task_releases_claim_on_error(self):
+        '''
+        `download_daily_package_task` should release the claim on the daily package if the
+        download fails
+        '''
+
+        tasks.download_daily_package_task('20190803_201902.tar.gz')
+
+        status_entry = DailyPackageDownloadStatus.objects.get(file_name='20190803_201902.tar.gz')
+
+        self.assertEqual(
+            (status_entry.status, status_entry.claimed_until),
+            (DailyPackageDownloadStatus.ERROR, None)
+        )
+
 
 class EmailNotificationsTaskTests(TestCase):
     '''
@@ -301,3 +600,31 @@ class GetDailyPackageTaskTests(TestCase):
         # Check that todays_date is in the return string. This will confirm todays date has been
         # used
         self.assertTrue(todays_date.strftime('%d/%m/%Y') in return_str)
+
+
+class SyncDailyPackageMirrorTaskTests(TestCase):
+    '''
+    TestCase class for the `sync_daily_package_mirror_task` task
+    '''
+
+    def setUp(self):
+        '''
+        Common across individual tests
+
+        Serve a copy of 20190802_201901.tar.gz, a valid TED daily export archive file, published
+        today from a local ftp stand-in
+        '''
+
+        self.file_name = timezone.now().strftime('%Y%m%d') + '_201901.tar.gz'
+
+        use_fake_ftp(self, {self.file_name: '20190802_201901.tar.gz'})
+
+    def test_task_returns_number_of_packages_mirrored(self):
+        '''
+        `sync_daily_package_mirror_task` should mirror the daily packages published recently and
+        return the number mirrored
+        '''
+
+        return_str = tasks.sync_daily_package_mirror_task()
+
+        self.assertEqual(return_str, '1 daily package(s) mirrored.')
@@ -5,6 +5,7 @@ Generating views for `tasks` Django web app.
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.forms.models import model_to_dict
 from django.http import HttpResponseRedirect
 from django.http.response import JsonResponse
 from django.shortcuts import get_object_or_404, render
@@ -21,7 +22,8 @@ def bulk_upload_progress(request, file_name):
     Returns `DailyPackageDownloadStatus` entry which stores the progress of
     `tasks.bulk_tender_create_task`
 
-    If status is COMPLETE or ERROR, redirect to the `tenders:list` page with associated msg
+    If status is COMPLETE or ERROR, redirect to the `tenders:list` page with associated msg.
+    Otherwise show the progress, including the `DailyPackageMetrics` of the latest run
     '''
 
     status_entry = get_object_or_404(DailyPackageDownloadStatus, file_name=file_name)
@@ -40,7 +42,9 @@ def bulk_upload_progress(request, file_name):
         response = HttpResponseRedirect(reverse('tenders:contractnotice-list'))
 
     else:
-        response = render(request, 'tasks/bulk_upload_progress.html', {'status': status_entry})
+        response = render(request, 'tasks/bulk_upload_progress.html', {
+            'status': status_entry, 'metrics': status_entry.get_latest_metrics()
+        })
 
     return response
 
@@ -50,16 +54,19 @@ def bulk_upload_progress(request, file_name):
 def get_task_status(request, file_name):
     '''
     Returns json of status contained within `DailyPackageDownloadStatus` to show progress of
-    `tasks.bulk_tender_create_task`
+    `tasks.bulk_tender_create_task`, including the `DailyPackageMetrics` of the latest run
     '''
 
     status = get_object_or_404(DailyPackageDownloadStatus, file_name=file_name)
 
+    metrics = status.get_latest_metrics()
+
     context = {
         'file_name': status.file_name,
         'status': status.status,
         'status_msg': status.status_msg,
-        'get_status_display': status.get_status_display()
+        'get_status_display': status.get_status_display(),
+        'metrics': model_to_dict(metrics, exclude=['id', 'status_entry']) if metrics else None
     }
 
     return JsonResponse(context)
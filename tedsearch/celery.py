@@ -5,6 +5,8 @@ Celery configuration for the `tedsearch` web application
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
+from django.conf import settings
 
 
 app = Celery('tedsearch')
@@ -34,4 +36,33 @@ app.conf.beat_schedule = {
         'task': 'tasks.tasks.email_user_notifications_task',
         'schedule': crontab(minute=15, hour='9,12', day_of_week='mon-fri'),
     },
+    # Executes `sync_daily_package_mirror_task` every day at 12:30pm Monday to Friday
+    # Task is run after `get_daily_package_task` to mirror the packages it downloaded, which it
+    # doesn't mirror itself so the upload doesn't count against its time limit, and packages that
+    # have changed on the ftp server
+    'sync-daily-package-mirror': {
+        'task': 'tasks.tasks.sync_daily_package_mirror_task',
+        'schedule': crontab(minute=30, hour=12, day_of_week='mon-fri'),
+    },
+    # Executes `catch_up_daily_packages_task` every hour from 1:45pm to 11:45pm every day
+    # Task is run after the `get_daily_package_task` runs to pick up any daily packages they
+    # missed, including packages from earlier days
+    'catch-up-daily-packages': {
+        'task': 'tasks.tasks.catch_up_daily_packages_task',
+        'schedule': crontab(minute=45, hour='13-23'),
+    },
 }
+
+
+@worker_process_init.connect
+def warm_xml_schemas(**kwargs):
+    '''
+    Compiles the xml schemas in each worker process as it starts if daily package files are
+    validated, see `settings.DAILY_PACKAGE_VALIDATE_SCHEMA`
+    '''
+
+    if settings.DAILY_PACKAGE_VALIDATE_SCHEMA:
+        # Imported here as the apps aren't loaded when this module is imported
+        from tenders.parsing import load_xml_schemas
+
+        load_xml_schemas()
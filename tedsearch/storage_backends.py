@@ -14,3 +14,14 @@ class MediaStorage(S3Boto3Storage):
 
     location = settings.MEDIA_LOCATION
     file_overwrite = False
+
+
+class PackageMirrorStorage(S3Boto3Storage):
+    '''
+    Custom storage class for the daily package mirror. Files are private as they are only read by
+    the `tasks` app
+    '''
+
+    location = settings.DAILY_PACKAGE_MIRROR_LOCATION
+    default_acl = 'private'
+    file_overwrite = False
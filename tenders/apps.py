@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class TendersConfig(AppConfig):
     name = 'tenders'
+
+    def ready(self):
+        # Register the system checks
+        from tenders.checks import check_supported_schemas
+
+        checks.register(check_supported_schemas)
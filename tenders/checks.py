@@ -0,0 +1,30 @@
+'''
+System checks for the `tenders` Django app
+'''
+
+
+from django.conf import settings
+from django.core.checks import Error
+
+from tenders import xpaths
+
+
+def check_supported_schemas(app_configs, **kwargs):
+    '''
+    Check each schema version in `settings.SUPPORTED_SCHEMAS` has compatible lot xpaths in
+    `xpaths.LOT_SCHEMA_SPECIFIC_XPATHS`, otherwise contract award notices using it can't update
+    their lots
+
+    Registered by `tenders.apps.TendersConfig.ready`
+    '''
+
+    return [
+        Error(
+            'No lot xpaths for XML schema version "{}".'.format(schema_version),
+            hint='Add the version to tenders.xpaths.LOT_SCHEMA_SPECIFIC_XPATHS or remove it ' +
+            'from SUPPORTED_SCHEMAS.',
+            id='tenders.E001'
+        )
+        for schema_version in settings.SUPPORTED_SCHEMAS
+        if xpaths.get_compatible_schema_version(schema_version) is None
+    ]
@@ -7,8 +7,9 @@ import os
 
 from django import forms
 from django.conf import settings
+from django.db import transaction
 
-from tasks.helpers import check_daily_package_exists
+from tasks.ftp import check_daily_package_exists
 from tasks.models import DailyPackageDownloadStatus
 from tenders import models, helpers
 
@@ -41,19 +42,25 @@ class UploadXmlFileForm(forms.Form):
         # Default init
         super().__init__(*args, **kwargs)
 
-        self.n_s = None
-        self.root = None
+        self.notice_record = None
+        self.xml_data = None
         self.upload_file_path = self.save_temporary_file()
 
     def clean_upload_file(self):
         '''
-        Override field clean to check the uploaded file using `check_xml_file`
+        Override field clean to check the uploaded file using `check_notice_record`
+
+        The file is read into `self.notice_record` with `read_notice_record`, so a file uploaded
+        before isn't parsed again
         '''
 
-        self.root, self.n_s = helpers.get_xml_root(self.upload_file_path)
+        with open(self.upload_file_path, 'rb') as upload_file:
+            self.xml_data = upload_file.read()
+
+        self.notice_record, _ = helpers.read_notice_record(self.xml_data)
 
-        if self.root is not None and self.n_s is not None:
-            is_valid, error_strs = helpers.check_xml(self.root, self.n_s)
+        if self.notice_record is not None:
+            is_valid, error_strs = helpers.check_notice_record(self.notice_record)
 
             # If file is not valid, raise the errors
             if not is_valid:
@@ -61,7 +68,7 @@ class UploadXmlFileForm(forms.Form):
                     self.upload_file_field_error(error_str)
 
         else:
-            # If `self.root` is `None`, raise error
+            # If the file can't be read, raise error
             self.upload_file_field_error(
                 '"' + os.path.basename(self.upload_file_path) + '" file contains invalid syntax.'
             )
@@ -70,16 +77,31 @@ class UploadXmlFileForm(forms.Form):
 
     def save(self):
         '''
-        Method saves data contained within `self.root` to new database entries
+        Method saves data contained within `self.notice_record` to new database entries using
+        `create_new_tenders`, reading the lots from the uploaded file, and returns the new entry
 
          * If doc type is contract notice, save as `ContractNotice` and new `Lots`
          * If doc type is contract award notice, save as `ContractAwardNotice` and update existing
            `Lots`
+
+        If the file contains data that can't be saved, an error is added to the form and `None` is
+        returned
         '''
 
-        new_entry = helpers.create_new_tender(self.root, self.n_s)
+        with transaction.atomic():
+            new_entries = helpers.create_new_tenders(
+                [self.notice_record], {self.notice_record.ojs_ref: self.xml_data}
+            )
+
+        if not new_entries:
+            self.upload_file_field_error(
+                '"' + os.path.basename(self.upload_file_path) + '" file contains data that ' + \
+                'can\'t be saved.'
+            )
+
+            return None
 
-        return new_entry
+        return new_entries[0]
 
     def save_temporary_file(self):
         '''
@@ -3,24 +3,362 @@ Helper functions for the `tenders` Django app
 '''
 
 
+import dataclasses
 import datetime
+import decimal
+import hashlib
+import io
 import os
 import pytz
 
 import boto3
 from botocore.client import Config
 from django.conf import settings
-from lxml import etree
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
 
-from tenders import models, xpaths
+from tenders import models, parsing, records, xpaths
 
 
-def check_xml(root, n_s):
+# `Lot` fields updated from a contract award notice by `build_updated_lots`, and saved with
+# `bulk_update`
+UPDATED_LOT_FIELDS = [
+    'awarded_contract', 'awarded_to_group', 'conclusion_date', 'contractor_country',
+    'contractor_name', 'currency', 'value', 'value_estimated', 'value_per_unit'
+]
+
+# Errors that can be raised by `write_new_tenders` if a file contains data we can't save
+WRITE_ERRORS = (DatabaseError, ValidationError, KeyError, ValueError, decimal.InvalidOperation)
+
+
+def build_lot(lot, contract_notice):
+    '''
+    Returns a new unsaved `Lot` entry linked to the input `contract_notice` parent from the F02
+    OBJECT_DESCR element `lot`, or None if the lot has no title or its LOT_NO isn't an integer
+    '''
+
+    return build_lot_from_record(records.extract_lot_record(lot), contract_notice)
+
+
+def build_lot_from_record(lot_record, contract_notice):
+    '''
+    Returns a new unsaved `Lot` entry linked to the input `contract_notice` parent from the
+    `records.LotRecord` `lot_record`, or None if the lot has no title or its LOT_NO isn't an
+    integer
+    '''
+
+    # Check if. If fail, don't create:
+    # * the LOT_NO is just a standard integer
+    # * the Lot has a title
+    if not lot_record.title or not lot_record.lot_no.isdigit():
+        return None
+
+    # Default data used across all scenarios
+    lot_data = {
+        'contract_notice': contract_notice,
+        'lot_no': lot_record.lot_no,
+        'info_add': '\n'.join(lot_record.info_add),
+        'short_descr': '\n'.join(lot_record.short_descr),
+        'title': lot_record.title
+    }
+
+    return models.Lot(**lot_data)
+
+
+def build_lots(root, n_s, contract_notice):
+    '''
+    Returns a list of new unsaved `Lot` entries linked to the input `contract_notice` parent from
+    xml data defined by `root`
+
+    `root` should be a valid TED tender xml file
+    '''
+
+    # Create new `Lot` entries with `ContractNotice` parent
+    new_lots = [
+        build_lot(lot, contract_notice)
+        for lot in xpaths.evaluate(root, xpaths.F02_OBJECT_DESCR, n_s)
+    ]
+
+    return [new_lot for new_lot in new_lots if new_lot]
+
+
+def build_lots_from_file(upload_file, contract_notice):
+    '''
+    Streaming version of `build_lots`. Returns a list of new unsaved `Lot` entries linked to the
+    input `contract_notice` parent from the F02 TED xml file `upload_file`
+
+    The lots are read one at a time using `parsing.iter_lot_elements`, so memory use doesn't grow
+    with the number or size of the lots in the file
+    '''
+
+    new_lots = [
+        build_lot(lot, contract_notice)
+        for lot, _ in parsing.iter_lot_elements(upload_file, 'OBJECT_DESCR')
+    ]
+
+    return [new_lot for new_lot in new_lots if new_lot]
+
+
+def build_tender_from_record(notice_record, foreign_keys):
+    '''
+    Returns a new unsaved entry built from the `records.NoticeRecord` `notice_record` based on doc
+    type
+     * If doc type is contract notice, return a `ContractNotice`
+     * If doc type is contract award notice, return a `ContractAwardNotice`
+
+    Foreign keys are looked up in `foreign_keys`, a dictionary returned by `get_foreign_keys`.
+    Raises `KeyError` if a foreign key doesn't exist
+    '''
+
+    # Get correct class obj based on document type
+    new_entry_class = get_document_type_model(notice_record.doc_type_code)
+
+    # Find `Country` entry for foreignkeys
+    country = foreign_keys['country'][notice_record.country_code]
+
+    # Convert datestrings in `datetime.date` objects
+    dispatch_date = datetime.datetime.strptime(
+        notice_record.dispatch_date, settings.TED_TENDER_DATE_STR
+    )
+
+    publication_date = datetime.datetime.strptime(
+        notice_record.publication_date, settings.TED_TENDER_DATE_STR
+    )
+
+    data = {
+        'country': country,
+        'dispatch_date': dispatch_date,
+        'ojs_ref': notice_record.ojs_ref,
+        'publication_date': publication_date,
+        'url': notice_record.url
+    }
+
+    if notice_record.doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
+        # Find the corresponding contract notice for foreign key
+        contract_notice = foreign_keys['contract_notice'][notice_record.ref_notice_ojs]
+
+        doc_specific_data = {
+            'contract_notice': contract_notice,
+            'contracting_body_name': notice_record.contracting_body_name,
+            'short_descr': notice_record.short_descr,
+            'title': notice_record.title
+        }
+
+        # Only add currency and value if value is valid
+        if notice_record.value:
+            doc_specific_data['currency'] = \
+                foreign_keys['currency'][notice_record.value_currency]
+            doc_specific_data['value_of_procurement'] = notice_record.value
+
+    elif notice_record.doc_type_code == settings.CONTRACT_NOTICE_CODE:
+
+        doc_specific_data = {
+            'contracting_body_name': notice_record.contracting_body_name,
+            'closing_date': parse_tender_closing_datetime(
+                notice_record.date_receipt_tenders, notice_record.time_receipt_tenders
+            ),
+            'full_docs_available': notice_record.full_docs_available,
+            'procurement_ref': notice_record.procurement_ref,
+            'procurement_docs_url': notice_record.procurement_docs_url,
+            'short_descr': notice_record.short_descr,
+            'title': notice_record.title
+        }
+
+    # Add the doc specific fields to the data and create the new entry
+    data.update(doc_specific_data)
+
+    return new_entry_class(**data)
+
+
+def build_updated_lot(lot, award_contract, n_s, schema_xpaths, foreign_keys):
+    '''
+    Method updates the existing `Lot` entry `lot` from the F03 AWARD_CONTRACT element
+    `award_contract` for the lot. The lot is not saved
+
+    `schema_xpaths` is the dictionary returned by `xpaths.lot_schema_specific_xpaths` for the
+    schema of the file. Foreign keys are looked up in `foreign_keys`, a dictionary returned by
+    `get_foreign_keys`. Raises `KeyError` if a foreign key doesn't exist
+    '''
+
+    awarded_contract = xpaths.evaluate(award_contract, xpaths.F03_LOT_AWARDED_CONTRACT, n_s)
+
+    # Default data used across all scenarios
+    lot.awarded_contract = awarded_contract
+    lot.awarded_to_group = xpaths.evaluate(
+        award_contract, schema_xpaths['F03_LOT_AWARDED_TO_GROUP'], n_s
+    )
+
+    # Only include extra information if contract actually awarded
+    if awarded_contract:
+        # Convert datestrings in `datetime.date` objects
+        lot.conclusion_date = datetime.datetime.strptime(
+            xpaths.evaluate(award_contract, xpaths.F03_LOT_CONCLUSION_DATE, n_s),
+            settings.TED_LOT_DATE_STR
+        )
+
+        lot.contractor_country = foreign_keys['country'][
+            xpaths.evaluate(award_contract, schema_xpaths['F03_LOT_CONTRACTOR_COUNTRY'], n_s)
+        ]
+
+        lot.contractor_name = xpaths.evaluate(
+            award_contract, schema_xpaths['F03_LOT_CONTRACTOR_NAME'], n_s
+        )
+
+        val_total = xpaths.evaluate(award_contract, schema_xpaths['F03_LOT_VAL_TOTAL'], n_s)
+
+        # If LOT_VAL_TOTAL is not filled, don't save a value and mark as an estimated value
+        if val_total:
+            lot.currency = foreign_keys['currency'][
+                xpaths.evaluate(award_contract, schema_xpaths['F03_LOT_VAL_TOTAL_CURRENCY'], n_s)
+            ]
+
+            lot.value = decimal.Decimal(val_total)
+
+        else:
+            lot.value_estimated = True
+
+    # `bulk_update` doesn't call `save` so calculate this here
+    lot.set_value_per_unit()
+
+
+def build_updated_lots(root, n_s, lots, foreign_keys):
+    '''
+    Method updates the existing `Lot` entries in `lots` from contract award notice xml data defined
+    by `root` and returns a list of the lots that have been updated. The lots are not saved
+
+    Foreign keys are looked up in `foreign_keys`, a dictionary returned by `get_foreign_keys`.
+    Raises `KeyError` if a foreign key doesn't exist
+
+    `root` should be a valid F03 TED tender xml file
+    '''
+
+    updated_lots = []
+
+    # Grab the xpaths that are specific to the schema of the xml file. We know this file has a
+    # valid schema already as `check_xml` has already been called
+    schema_xpaths = xpaths.lot_schema_specific_xpaths(
+        xpaths.evaluate(root, xpaths.TED_EXPORT_VERSION, n_s)
+    )
+
+    # Index the AWARD_CONTRACT elements by LOT_NO in one pass, rather than searching the whole
+    # tree for each lot. The first AWARD_CONTRACT for a lot is used
+    award_contracts = {}
+
+    for award_contract in xpaths.evaluate(root, xpaths.F03_AWARD_CONTRACT, n_s):
+        try:
+            lot_no = int(xpaths.evaluate(award_contract, xpaths.LOT_NO, n_s))
+
+        except ValueError:
+            continue
+
+        award_contracts.setdefault(lot_no, award_contract)
+
+    for lot in lots:
+        award_contract = award_contracts.get(int(lot.lot_no))
+
+        # Only update if corresponding data is there
+        if award_contract is not None:
+            build_updated_lot(lot, award_contract, n_s, schema_xpaths, foreign_keys)
+
+            updated_lots.append(lot)
+
+    return updated_lots
+
+
+def build_updated_lots_from_file(upload_file, lots, foreign_keys):
+    '''
+    Streaming version of `build_updated_lots`. Updates the existing `Lot` entries in `lots` from
+    the F03 TED xml file `upload_file` and returns a list of the lots that have been updated
+
+    The AWARD_CONTRACT elements are read one at a time using `parsing.iter_lot_elements` and
+    matched to `lots` by LOT_NO, so memory use doesn't grow with the number or size of the lots in
+    the file
+    '''
+
+    lots_by_no = {lot.lot_no: lot for lot in lots}
+    updated_lots = {}
+
+    schema_xpaths = None
+
+    for award_contract, n_s in parsing.iter_lot_elements(upload_file, 'AWARD_CONTRACT'):
+        if schema_xpaths is None:
+            # TED_EXPORT has been read so the schema version is known
+            schema_xpaths = xpaths.lot_schema_specific_xpaths(
+                award_contract.getroottree().getroot().get('VERSION')
+            )
+
+        try:
+            lot_no = int(xpaths.evaluate(award_contract, xpaths.LOT_NO, n_s))
+
+        except ValueError:
+            continue
+
+        # Like `build_updated_lots`, the first AWARD_CONTRACT for a lot is used
+        if lot_no in lots_by_no and lot_no not in updated_lots:
+            build_updated_lot(
+                lots_by_no[lot_no], award_contract, n_s, schema_xpaths, foreign_keys
+            )
+
+            updated_lots[lot_no] = lots_by_no[lot_no]
+
+    return [lot for lot in lots if lot.lot_no in updated_lots]
+
+
+def check_notice_content(notice_record):
+    '''
+    Method performs the checks of `check_notice_record` that only depend on the data in the
+    `records.NoticeRecord` `notice_record`, not on the database, and returns a list of error
+    strings, which is empty if they all pass
     '''
-    Method looks through the `root` and performs the following checks:
 
-     * Check the uploaded xml file has the following data:
-        * TED_EXPORT_VERSION is in `settings.XML_SCHEMA_VER`
+    # File should have no errors by default
+    xml_file_error_list = []
+
+    if notice_record.schema_version not in settings.SUPPORTED_SCHEMAS:
+        # Raise error as this file is not in a supported schema
+        xml_file_error_list.append('XML schema version is not supported.')
+
+    else:
+
+        doc_type_code = notice_record.doc_type_code
+
+        if notice_record.contract_nature_code != settings.TARGET_CONTRACT_NATURE_CODE:
+            # Raise error as the contract nature is not Supplies
+            xml_file_error_list.append(
+                'Contract nature is not "' + settings.TARGET_CONTRACT_NATURE_CODE + '".'
+            )
+
+        if doc_type_code in settings.SUPPORTED_DOCUMENT_TYPE_CODES:
+            # Get the correct model
+            tender_model = get_document_type_model(doc_type_code)
+
+            # Check the contract is divided into lots
+            if not notice_record.lot_division:
+                # Raise error
+                xml_file_error_list.append(
+                    tender_model._meta.verbose_name + ' is not divided into Lots.'
+                )
+
+            # Check cpv code
+            if notice_record.cpv_code != settings.TARGET_CPV_CODE:
+                # Raise error as the CPV code is not Pharmaceutical Products
+                xml_file_error_list.append('CPV code is not "' + settings.TARGET_CPV_CODE + '".')
+
+        else:
+            # Raise error
+            xml_file_error_list.append('Document type is not supported.')
+
+    return xml_file_error_list
+
+
+def check_notice_record(notice_record, known_ojs_refs=None):
+    '''
+    Method looks through the `records.NoticeRecord` `notice_record` and performs the following
+    checks:
+
+     * Check the uploaded xml file has the following data, see `check_notice_content`:
+        * TED_EXPORT_VERSION is in `settings.SUPPORTED_SCHEMAS`
         * NC_CONTRACT_NATURE_CODE is "2" (Supplies)
         * TD_DOCUMENT_TYPE_CODE is "3" (Contract Notice) or "7" (Contract award notice)
         * If Contract Notice:
@@ -39,107 +377,67 @@ def check_xml(root, n_s):
              * Check the uploaded file has a corresponding `ContractNotice` already
                 * compare F03_REF_NOTICE_OJS with `ContractNotice` database
 
+    If supplied, `known_ojs_refs` is a dictionary returned by `get_known_ojs_refs` and the ojs_ref
+    comparisons use it instead of querying the database
+
     Returns an `is_valid` boolean and a list of `errors` if any are raised
      * if `is_valid` is True, `errors` will be empty
      * if `is_valid` is False, `errors` will contain one or more error strings
     '''
 
-    # File should have no errors by default
-    xml_file_error_list = []
+    xml_file_error_list = check_notice_content(notice_record)
 
-    # Check the xml for the data
-    export_version = root.xpath(xpaths.TED_EXPORT_VERSION, namespaces=n_s)
+    # If no errors so far, perform additional checks
+    if not xml_file_error_list:
+        doc_type_code = notice_record.doc_type_code
+        ojs_ref = notice_record.ojs_ref
 
-    if export_version not in settings.SUPPORTED_SCHEMAS:
-        # Raise error as this file is not in a supported schema
-        xml_file_error_list.append('XML schema version is not supported.')
+        tender_model = get_document_type_model(doc_type_code)
 
-    else:
+        if known_ojs_refs is None:
+            tender_exists = tender_model.objects.filter(ojs_ref=ojs_ref).exists()
 
-        contract_nature = root.xpath(xpaths.NC_CONTRACT_NATURE_CODE, namespaces=n_s)
-        doc_type_code = root.xpath(xpaths.TD_DOCUMENT_TYPE_CODE, namespaces=n_s)
-        ojs_ref = root.xpath(xpaths.NO_DOC_OJS, namespaces=n_s)
+        else:
+            tender_exists = ojs_ref in known_ojs_refs[tender_model]
 
-        if contract_nature != settings.TARGET_CONTRACT_NATURE_CODE:
-            # Raise error as the contract nature is not Supplies
+        # Check if we already have this data
+        if tender_exists:
+            # Raise error
             xml_file_error_list.append(
-                'Contract nature is not "' + settings.TARGET_CONTRACT_NATURE_CODE + '".'
+                tender_model._meta.verbose_name + ' ref "' + ojs_ref +
+                '" already exists in database.'
             )
 
-        if doc_type_code in settings.SUPPORTED_DOCUMENT_TYPE_CODES:
-            # Get the correct model
-            tender_model = get_tender_model(root, n_s)
+        # If contract award notice, check we have a corresponding contract notice
+        if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
+            contract_notice_ojs = notice_record.ref_notice_ojs
 
-            # Set the correct paths based on the document type
-            if doc_type_code == settings.CONTRACT_NOTICE_CODE:
-                lot_division_xpath = xpaths.F02_LOT_DIVISION
-                cpv_code_xpath = xpaths.F02_CPV_CODE
+            if known_ojs_refs is None:
+                contract_notice_exists = models.ContractNotice.objects \
+                    .filter(ojs_ref=contract_notice_ojs).exists()
 
-            elif doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-                lot_division_xpath = xpaths.F03_LOT_DIVISION
-                cpv_code_xpath = xpaths.F03_CPV_CODE
+            else:
+                contract_notice_exists = \
+                    contract_notice_ojs in known_ojs_refs[models.ContractNotice]
 
-            # Check the contract is divided into lots
-            if not root.xpath(lot_division_xpath, namespaces=n_s):
+            # Check if we have this contract notice
+            if not contract_notice_exists:
                 # Raise error
                 xml_file_error_list.append(
-                    tender_model._meta.verbose_name + ' is not divided into Lots.'
+                    'Contract Notice ref "' + contract_notice_ojs + '" does not exist ' + \
+                    'in database.'
                 )
 
-            # Check cpv code
-            if root.xpath(cpv_code_xpath, namespaces=n_s) != settings.TARGET_CPV_CODE:
-                # Raise error as the CPV code is not Pharmaceutical Products
-                xml_file_error_list.append('CPV code is not "' + settings.TARGET_CPV_CODE + '".')
-
-            # If no errors so far, perform additional checks
-            if not xml_file_error_list:
-                # Check if we already have this data
-                if tender_model.objects.filter(ojs_ref=ojs_ref).exists():
-                    # Raise error
-                    xml_file_error_list.append(
-                        tender_model._meta.verbose_name + ' ref "' + ojs_ref +
-                        '" already exists in database.'
-                    )
-
-                # If contract award notice, check we have a corresponding contract notice
-                if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-                    contract_notice_ojs = root.xpath(xpaths.F03_REF_NOTICE_OJS, namespaces=n_s)
-
-                    # Check if we have this contract notice
-                    if not models.ContractNotice.objects \
-                        .filter(ojs_ref=contract_notice_ojs).exists():
-                        # Raise error
-                        xml_file_error_list.append(
-                            'Contract Notice ref "' + contract_notice_ojs + '" does not exist ' + \
-                            'in database.'
-                        )
-
-        else:
-            # Raise error
-            xml_file_error_list.append('Document type is not supported.')
-
     return not bool(xml_file_error_list), xml_file_error_list
 
 
-def create_namespaces_dict(xml_root):
+def check_xml(root, n_s, known_ojs_refs=None):
     '''
-    Function gets the namespace out of the root and replaces the None default namespace with one
-    called 'def'
-
-    The TED export xml contains a default namespace with a None key. This breaks xpath so we need
-    to replace it with one with a 'def' key
+    Method checks the xml `root` using `check_notice_record`. See `check_notice_record` for the
+    checks performed and the return value
     '''
 
-    # Grab the namespaces and pop out the default one as this will break xpath
-    namespaces = xml_root.nsmap
-
-    default_ns = namespaces.pop(None, None)
-
-    if default_ns:
-        # Add to the namespaces with an actual name
-        namespaces['def'] = default_ns
-
-    return namespaces
+    return check_notice_record(records.extract_notice_record(root, n_s), known_ojs_refs)
 
 
 def create_lots(root, n_s, contract_notice):
@@ -150,31 +448,7 @@ def create_lots(root, n_s, contract_notice):
     `root` should be a valid TED tender xml file
     '''
 
-    new_lots = []
-
-    # Create new `Lot` entries with `ContractNotice` parent
-    for lot in root.xpath(xpaths.F02_OBJECT_DESCR, namespaces=n_s):
-
-        lot_no = lot.xpath(xpaths.LOT_NO, namespaces=n_s)
-        title = lot.xpath(xpaths.LOT_TITLE_P, namespaces=n_s)
-
-        # Check if. If fail, don't create:
-        # * the LOT_NO is just a standard integer
-        # * the Lot has a title
-        if title and lot_no.isdigit():
-            # Default data used across all scenarios
-            lot_data = {
-                'contract_notice': contract_notice,
-                'lot_no': lot_no,
-                'info_add': '\n'.join(lot.xpath(xpaths.LOT_INFO_ADD_P, namespaces=n_s)),
-                'short_descr': '\n'.join(lot.xpath(xpaths.LOT_SHORT_DESCR_P, namespaces=n_s)),
-                'title': title
-            }
-
-            # Append lot to list ready for bulk_create
-            new_lots.append(models.Lot(**lot_data))
-
-    models.Lot.objects.bulk_create(new_lots)
+    models.Lot.objects.bulk_create(build_lots(root, n_s, contract_notice))
 
 
 def create_new_tender(root, n_s):
@@ -188,87 +462,66 @@ def create_new_tender(root, n_s):
     Once new entry is created it is returned
     '''
 
-    # Get correct class obj based on document type
-    new_entry_class = get_tender_model(root, n_s)
-
-    # Common fields that use the same xpaths across both doc types
+    notice_record = records.extract_notice_record(root, n_s)
 
-    doc_type_code = root.xpath(xpaths.TD_DOCUMENT_TYPE_CODE, namespaces=n_s)
+    new_entry = build_tender_from_record(notice_record, get_foreign_keys([notice_record]))
+    new_entry.save()
 
-    # Find `Country` entry for foreignkeys
-    country = models.Country.objects.get(
-        iso_code=root.xpath(xpaths.ISO_COUNTRY_VALUE, namespaces=n_s)
-    )
+    doc_type_code = notice_record.doc_type_code
 
-    # Convert datestrings in `datetime.date` objects
-    dispatch_date = datetime.datetime.strptime(
-        root.xpath(xpaths.DS_DATE_DISPATCH, namespaces=n_s),
-        settings.TED_TENDER_DATE_STR
-    )
+    if doc_type_code == settings.CONTRACT_NOTICE_CODE:
+        # Create lots linked to parent `ContractNotice`
+        create_lots(root, n_s, new_entry)
 
-    publication_date = datetime.datetime.strptime(
-        root.xpath(xpaths.DATE_PUB, namespaces=n_s),
-        settings.TED_TENDER_DATE_STR
-    )
+    elif doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
+        # Update lots linked to related `ContractNotice` using ref contained in
+        # `ContractAwardNotice`
+        update_lots(root, n_s, new_entry)
 
-    data = {
-        'country': country,
-        'dispatch_date': dispatch_date,
-        'ojs_ref': root.xpath(xpaths.NO_DOC_OJS, namespaces=n_s),
-        'publication_date': publication_date,
-        'url': root.xpath(xpaths.URI_DOC, namespaces=n_s)
-    }
+    return new_entry
 
-    if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-        # Find the corresponding contract notice for foreign key
-        contract_notice = models.ContractNotice.objects.get(
-            ojs_ref=root.xpath(xpaths.F03_REF_NOTICE_OJS, namespaces=n_s)
-        )
 
-        value_of_procurement = root.xpath(xpaths.F03_VALUE, namespaces=n_s)
+def create_new_tenders(notice_records, lot_sources=None):
+    '''
+    Bulk version of `create_new_tender`. Saves data contained within each `records.NoticeRecord`
+    in `notice_records` to new database entries using a handful of queries in total rather than
+    several per file. Every file should have passed `check_notice_record` and have the same
+    document type
 
-        doc_specific_data = {
-            'contract_notice': contract_notice,
-            'contracting_body_name': root.xpath(xpaths.F03_OFFICIALNAME, namespaces=n_s),
-            'short_descr': root.xpath(xpaths.F03_SHORT_DESCR_P, namespaces=n_s),
-            'title': root.xpath(xpaths.F03_TITLE_P, namespaces=n_s)
-        }
+    If supplied, `lot_sources` is a dictionary of the raw xml data of files keyed by ojs_ref, and
+    the lots of those files are read from it by `write_new_tenders` rather than from the record.
+    Use this for records of roots returned by `parsing.get_xml_root` with `strip_lots`
 
-        # Only add currency and value if value is valid
-        if value_of_procurement:
-            doc_specific_data['currency'] = models.Currency.objects.get(
-                iso_code=root.xpath(xpaths.F03_VALUE_CURRENCY, namespaces=n_s)
-            )
-            doc_specific_data['value_of_procurement'] = value_of_procurement
+    The entries are first written together using `write_new_tenders`. If this fails, e.g. one file
+    contains bad data, each file is written in its own savepoint instead so only the bad files are
+    skipped. Should be called inside `transaction.atomic`
 
-    elif doc_type_code == settings.CONTRACT_NOTICE_CODE:
+    Returns a list of the new entries
+    '''
 
-        doc_specific_data = {
-            'contracting_body_name': root.xpath(xpaths.F02_OFFICIALNAME, namespaces=n_s),
-            'closing_date': get_tender_closing_datetime(root, n_s),
-            'full_docs_available': root.xpath(xpaths.F02_DOCUMENT_FULL, namespaces=n_s),
-            'procurement_ref': root.xpath(xpaths.F02_REFERENCE_NUMBER, namespaces=n_s),
-            'procurement_docs_url': root.xpath(xpaths.F02_URL_DOCUMENT, namespaces=n_s),
-            'short_descr': root.xpath(xpaths.F02_SHORT_DESCR_P, namespaces=n_s),
-            'title': root.xpath(xpaths.F02_TITLE_P, namespaces=n_s)
-        }
+    new_entries = []
 
-    # Add the doc specific fields to the data and create the new entry
-    data.update(doc_specific_data)
+    if notice_records:
+        foreign_keys = get_foreign_keys(notice_records)
 
-    new_entry = new_entry_class(**data)
-    new_entry.save()
+        try:
+            with transaction.atomic():
+                new_entries = write_new_tenders(notice_records, foreign_keys, lot_sources)
 
-    if doc_type_code == settings.CONTRACT_NOTICE_CODE:
-        # Create lots linked to parent `ContractNotice`
-        create_lots(root, n_s, new_entry)
+        except WRITE_ERRORS:
+            # Fall back to writing the files one at a time
+            for notice_record in notice_records:
+                try:
+                    with transaction.atomic():
+                        new_entries += write_new_tenders(
+                            [notice_record], foreign_keys, lot_sources
+                        )
 
-    elif doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-        # Update lots linked to related `ContractNotice` using ref contained in
-        # `ContractAwardNotice`
-        update_lots(root, n_s, new_entry)
+                except WRITE_ERRORS:
+                    # Skip the file as it contains data we can't save
+                    continue
 
-    return new_entry
+    return new_entries
 
 
 def delete_temporary_file(filepath):
@@ -282,13 +535,99 @@ def delete_temporary_file(filepath):
             os.remove(filepath)
 
 
+def get_document_type_model(doc_type_code):
+    '''
+    Returns the correct model required to save a file with the `doc_type_code` document type
+
+     * If `doc_type_code` is `settings.CONTRACT_AWARD_NOTICE_CODE`, return `ContractAwardNotice`
+     * If `doc_type_code` is `settings.CONTRACT_NOTICE_CODE`, return `ContractNotice`
+    '''
+
+    if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
+        return_obj = models.ContractAwardNotice
+
+    elif doc_type_code == settings.CONTRACT_NOTICE_CODE:
+        return_obj = models.ContractNotice
+
+    else:
+        return_obj = None
+
+    return return_obj
+
+
+def get_foreign_keys(notice_records):
+    '''
+    Returns a dictionary of the entries that could be needed as foreign keys when creating new
+    entries from `notice_records`, a list of `records.NoticeRecord` objects, using one query per
+    model:
+     * 'country': all `Country` entries keyed by `iso_code`
+     * 'currency': all `Currency` entries keyed by `iso_code`
+     * 'contract_notice': `ContractNotice` entries referenced by any contract award notices in
+       `notice_records` keyed by `ojs_ref`
+    '''
+
+    contract_notice_refs = [
+        notice_record.ref_notice_ojs for notice_record in notice_records
+        if notice_record.doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE
+    ]
+
+    return {
+        'country': models.Country.objects.in_bulk(field_name='iso_code'),
+        'currency': models.Currency.objects.in_bulk(field_name='iso_code'),
+        'contract_notice': models.ContractNotice.objects.in_bulk(
+            contract_notice_refs, field_name='ojs_ref'
+        ) if contract_notice_refs else {}
+    }
+
+
+def get_known_ojs_refs(notice_records):
+    '''
+    Returns a dictionary of the ojs_refs already in the database that `check_notice_record` could
+    look for when checking `notice_records`, a list of `records.NoticeRecord` objects, using one
+    `IN` query per model:
+     * `ContractNotice`: the set of `ContractNotice` ojs_refs of the contract notices in
+       `notice_records` and of the contract notices referenced by contract award notices
+     * `ContractAwardNotice`: the set of `ContractAwardNotice` ojs_refs of the contract award
+       notices in `notice_records`
+
+    Pass the dictionary to `check_notice_record` so it doesn't query the database for every file
+    '''
+
+    ojs_refs = {models.ContractNotice: set(), models.ContractAwardNotice: set()}
+
+    for notice_record in notice_records:
+        if notice_record.doc_type_code == settings.CONTRACT_NOTICE_CODE:
+            ojs_refs[models.ContractNotice].add(notice_record.ojs_ref)
+
+        elif notice_record.doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
+            ojs_refs[models.ContractAwardNotice].add(notice_record.ojs_ref)
+            ojs_refs[models.ContractNotice].add(notice_record.ref_notice_ojs)
+
+    return {
+        tender_model: set(
+            tender_model.objects.filter(ojs_ref__in=refs).values_list('ojs_ref', flat=True)
+        ) if refs else set()
+        for tender_model, refs in ojs_refs.items()
+    }
+
+
 def get_tender_closing_datetime(root, n_s):
     '''
     Returns a datetime object for the closing date and time for tender submissions
     '''
 
-    date_receipt = root.xpath(xpaths.F02_DATE_RECEIPT_TENDERS, namespaces=n_s)
-    time_receipt = root.xpath(xpaths.F02_TIME_RECEIPT_TENDERS, namespaces=n_s)
+    return parse_tender_closing_datetime(
+        xpaths.evaluate(root, xpaths.F02_DATE_RECEIPT_TENDERS, n_s),
+        xpaths.evaluate(root, xpaths.F02_TIME_RECEIPT_TENDERS, n_s)
+    )
+
+
+def parse_tender_closing_datetime(date_receipt, time_receipt):
+    '''
+    Returns a datetime object for the closing date and time for tender submissions from the
+    DATE_RECEIPT_TENDERS `date_receipt` and TIME_RECEIPT_TENDERS `time_receipt` strings, or None
+    if there is no date
+    '''
 
     if date_receipt:
         # Create datetime base on data available
@@ -319,63 +658,55 @@ def get_tender_model(root, n_s):
      * If `TD_DOCUMENT_TYPE_CODE` is `settings.CONTRACT_NOTICE_CODE`, return `ContractNotice`
     '''
 
-    doc_type_code = root.xpath(xpaths.TD_DOCUMENT_TYPE_CODE, namespaces=n_s)
+    return get_document_type_model(xpaths.evaluate(root, xpaths.TD_DOCUMENT_TYPE_CODE, n_s))
 
-    if doc_type_code == settings.CONTRACT_AWARD_NOTICE_CODE:
-        return_obj = models.ContractAwardNotice
 
-    elif doc_type_code == settings.CONTRACT_NOTICE_CODE:
-        return_obj = models.ContractNotice
+def new_s3_client():
+    '''
+    Returns an S3 client instance for use across the `tenders` application
 
-    else:
-        return_obj = None
+    Used for interacting with files stored on AWS S3. Client obtains credentials by default from
+    env variables
+    '''
 
-    return return_obj
+    return boto3.client('s3', config=Config(signature_version='s3v4'))
 
 
-def get_xml_schema():
-    '''
-    Returns an instance of `lxml.etree.XMLSchema` based on the structure of the `TED_EXPORT.xsd`
-    schema file
+def read_notice_record(xml_data):
     '''
+    Method reads the TED xml file `xml_data` bytes with `strip_lots` and returns a tuple of its
+    `records.NoticeRecord` and the list of errors found by `check_notice_content`, or
+    `(None, None)` if the file contains invalid syntax
 
-    xml_schema_doc = etree.parse(
-        os.path.join(settings.BASE_DIR, 'files', 'ted_schema', settings.XML_SCHEMA_VER,
-                     settings.XML_SCHEMA_FILE_NAME)
-    )
-
-    return etree.XMLSchema(xml_schema_doc)
-
+    Results are kept in the `settings.NOTICE_RECORD_CACHE` cache keyed by the SHA-1 checksum of
+    `xml_data`, so a file read before isn't parsed again, e.g. when a daily package is processed
+    again or the same file is uploaded again. The database checks of `check_notice_record` aren't
+    cached, as they change as entries are created
 
-def get_xml_root(upload_file):
+    The record doesn't keep the tree it was read from, so its lots should be read from `xml_data`
     '''
-    Returns the `etree.tree.root` object  and a namespaces dict from a `upload_file` object
 
-    If there is an error, returns `None`
-    '''
+    notice_record_cache = caches[settings.NOTICE_RECORD_CACHE]
+    checksum = hashlib.sha1(xml_data).hexdigest()
 
-    try:
-        tree = etree.parse(upload_file)
-        root = tree.getroot()
-        n_s = create_namespaces_dict(root)
+    result = notice_record_cache.get(checksum)
 
-    except etree.XMLSyntaxError:
-        # Return None if error
-        root = None
-        n_s = None
+    if result is None:
+        root, n_s = parsing.get_xml_root(io.BytesIO(xml_data), strip_lots=True)
 
-    return root, n_s
+        if root is None:
+            result = (None, None)
 
+        else:
+            notice_record = dataclasses.replace(
+                records.extract_notice_record(root, n_s), root=None, n_s=None
+            )
 
-def new_s3_client():
-    '''
-    Returns an S3 client instance for use across the `tenders` application
+            result = (notice_record, check_notice_content(notice_record))
 
-    Used for interacting with files stored on AWS S3. Client obtains credentials by default from
-    env variables
-    '''
+        notice_record_cache.set(checksum, result)
 
-    return boto3.client('s3', config=Config(signature_version='s3v4'))
+    return result
 
 
 def update_lots(root, n_s, contract_award_notice):
@@ -389,66 +720,110 @@ def update_lots(root, n_s, contract_award_notice):
     `ContractAwardNotice` TED tender xml file
 
     `root` should be a valid F03 TED tender xml file
+
+    The countries and currencies are looked up from `get_foreign_keys` and the updated lots are
+    saved with a single `bulk_update`, so the number of queries doesn't grow with the lots
     '''
 
-    # Grab the xpaths that are specific to the schema of the xml file. We know this file has a
-    # valid schema already as `check_xml` has already been called
-    schema_xpaths = xpaths.lot_schema_specific_xpaths(
-        root.xpath(xpaths.TED_EXPORT_VERSION, namespaces=n_s)
+    updated_lots = build_updated_lots(
+        root, n_s, contract_award_notice.contract_notice.lot_set.all(), get_foreign_keys([])
     )
 
-    for lot in contract_award_notice.contract_notice.lot_set.all():
+    models.Lot.objects.bulk_update(updated_lots, UPDATED_LOT_FIELDS)
 
-        # Get related xml parts based on lot_no from input `root`
-        award_contract = root.xpath('//def:AWARD_CONTRACT[def:LOT_NO={}]'.format(lot.lot_no),
-                                    namespaces=n_s)
 
-        # Only update if corresponding data is there
-        if award_contract:
+def write_new_tenders(notice_records, foreign_keys, lot_sources=None):
+    '''
+    Method writes new entries for each `records.NoticeRecord` in `notice_records` using
+    `bulk_create` and `bulk_update`, and returns a list of the new entries. Every file should have
+    the same document type
+     * If doc type is contract notice, create `ContractNotice` entries and new `Lots`
+     * If doc type is contract award notice, create `ContractAwardNotice` entries and update
+       existing `Lots`
+
+    Foreign keys are looked up in `foreign_keys`, a dictionary returned by `get_foreign_keys`. The
+    lots of files in `lot_sources` are streamed from the raw xml data, see `create_new_tenders`
+    '''
 
-            awarded_contract = award_contract[0].xpath(xpaths.F03_LOT_AWARDED_CONTRACT,
-                                                       namespaces=n_s)
+    lot_sources = lot_sources or {}
 
-            # Default data used across all scenarios
-            lot.awarded_contract = awarded_contract
-            lot.awarded_to_group = award_contract[0].xpath(
-                schema_xpaths['F03_LOT_AWARDED_TO_GROUP'], namespaces=n_s
-            )
+    new_entries = [
+        build_tender_from_record(notice_record, foreign_keys) for notice_record in notice_records
+    ]
 
-            # Only include extra information if contract actually awarded
-            if awarded_contract:
-                # Convert datestrings in `datetime.date` objects
-                lot.conclusion_date = datetime.datetime.strptime(
-                    award_contract[0].xpath(xpaths.F03_LOT_CONCLUSION_DATE, namespaces=n_s),
-                    settings.TED_LOT_DATE_STR
-                )
+    # `bulk_create` doesn't call `save` so prepare the entries here
+    for new_entry in new_entries:
+        new_entry.prepare_initial_save()
 
-                contractor_country = models.Country.objects.get(
-                    iso_code=award_contract[0].xpath(schema_xpaths['F03_LOT_CONTRACTOR_COUNTRY'],
-                                                     namespaces=n_s)
-                )
+    new_entry_class = type(new_entries[0])
+    new_entry_class.objects.bulk_create(new_entries)
+
+    # Only PostgreSQL sets the primary keys on `bulk_create`, so look them up if needed
+    if new_entries[0].pk is None:
+        saved_entries = new_entry_class.objects.in_bulk(
+            [new_entry.ojs_ref for new_entry in new_entries], field_name='ojs_ref'
+        )
+
+        for new_entry in new_entries:
+            new_entry.pk = saved_entries[new_entry.ojs_ref].pk
+
+    # Update `Country` and `Currency` ForeignKeys in one query each
+    models.Country.objects.filter(
+        id__in=[new_entry.country_id for new_entry in new_entries], is_active=False
+    ).update(is_active=True)
 
-                lot.contractor_country = contractor_country
-                lot.contractor_name = award_contract[0].xpath(
-                    schema_xpaths['F03_LOT_CONTRACTOR_NAME'], namespaces=n_s
+    if new_entry_class == models.ContractNotice:
+        new_lots = []
+
+        # Create lots linked to parent `ContractNotice`
+        for new_entry, notice_record in zip(new_entries, notice_records):
+            if new_entry.ojs_ref in lot_sources:
+                new_lots += build_lots_from_file(
+                    io.BytesIO(lot_sources[new_entry.ojs_ref]), new_entry
                 )
 
-                val_total = award_contract[0].xpath(schema_xpaths['F03_LOT_VAL_TOTAL'],
-                                                    namespaces=n_s)
+            else:
+                new_lots += [
+                    new_lot for new_lot in [
+                        build_lot_from_record(lot_record, new_entry)
+                        for lot_record in notice_record.lots
+                    ] if new_lot
+                ]
 
-                # If LOT_VAL_TOTAL is not filled, don't save a value and mark as an estimated value
-                if val_total:
-                    currency = models.Currency.objects.get(
-                        iso_code=award_contract[0].xpath(
-                            schema_xpaths['F03_LOT_VAL_TOTAL_CURRENCY'], namespaces=n_s
-                        )
-                    )
+        models.Lot.objects.bulk_create(new_lots)
+
+    else:
+        models.Currency.objects.filter(
+            id__in=[new_entry.currency_id for new_entry in new_entries], is_active=False
+        ).update(is_active=True)
+
+        # Grab the lots of all the referenced `ContractNotice` entries in one query
+        lots = {}
+
+        for lot in models.Lot.objects.filter(
+                contract_notice__in=[new_entry.contract_notice for new_entry in new_entries]):
+            lots.setdefault(lot.contract_notice_id, []).append(lot)
+
+        updated_lots = {}
+
+        # Update lots linked to related `ContractNotice` using ref contained in
+        # `ContractAwardNotice`
+        for new_entry, notice_record in zip(new_entries, notice_records):
+            contract_notice_lots = lots.get(new_entry.contract_notice_id, [])
+
+            if new_entry.ojs_ref in lot_sources:
+                contract_notice_lots = build_updated_lots_from_file(
+                    io.BytesIO(lot_sources[new_entry.ojs_ref]), contract_notice_lots, foreign_keys
+                )
+
+            else:
+                contract_notice_lots = build_updated_lots(
+                    notice_record.root, notice_record.n_s, contract_notice_lots, foreign_keys
+                )
 
-                    lot.currency = currency
-                    lot.value = val_total
+            for lot in contract_notice_lots:
+                updated_lots[lot.id] = lot
 
-                else:
-                    lot.value_estimated = True
+        models.Lot.objects.bulk_update(updated_lots.values(), UPDATED_LOT_FIELDS)
 
-            # Update the lot with this new info
-            lot.save()
+    return new_entries
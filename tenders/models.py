@@ -178,31 +178,40 @@ class ContractNotice(models.Model):
         ordering = ['ojs_ref']
         verbose_name = 'Contract Notice'
 
-    def save(self, *args, **kwargs):
+    def prepare_initial_save(self):
         '''
-        Override default save to:
+        Modifies fields before the entry is first saved. Called by `save`, and should be called
+        before entries are created with `bulk_create` as this doesn't call `save`:
          * Modify url to include the 'EN' language tab using `update_url_language_tab`
-         * Call `Country` ForeignKey `set_is_active`
          * If `short_descr` is list, concatenate using `concatenate_list_of_strings`
          * If `procurement_docs_url` doesn't start with http, add this to make sure it's not
            treated as a relative url when displaying in future
         '''
 
+        # Modify `self.url`
+        self.url = update_url_language_tab(self.url)
+
+        # If a list is provided to `short_descr`, concatenate list elements with newlines
+        self.short_descr = concatenate_list_of_strings(self.short_descr)
+
+        # Modify `self.procurement_docs_url`
+        if not self.procurement_docs_url.startswith('http'):
+            self.procurement_docs_url = 'http://' + self.procurement_docs_url
+
+    def save(self, *args, **kwargs):
+        '''
+        Override default save to:
+         * Call `prepare_initial_save`
+         * Call `Country` ForeignKey `set_is_active`
+        '''
+
         # Only do on initial save
         if self.pk is None:
-            # Modify `self.url`
-            self.url = update_url_language_tab(self.url)
+            self.prepare_initial_save()
 
             # Update `Country` and `Currency` ForeignKeys
             self.country.set_is_active()
 
-            # If a list is provided to `short_descr`, concatenate list elements with newlines
-            self.short_descr = concatenate_list_of_strings(self.short_descr)
-
-            # Modify `self.procurement_docs_url`
-            if not self.procurement_docs_url.startswith('http'):
-                self.procurement_docs_url = 'http://' + self.procurement_docs_url
-
         # Call default save
         super().save(*args, **kwargs)
 
@@ -262,18 +271,30 @@ class ContractAwardNotice(models.Model):
         ordering = ['ojs_ref']
         verbose_name = 'Contract Award Notice'
 
+    def prepare_initial_save(self):
+        '''
+        Modifies fields before the entry is first saved. Called by `save`, and should be called
+        before entries are created with `bulk_create` as this doesn't call `save`:
+         * Modify url to include the 'EN' language tab
+         * If `short_descr` is list, concatenate with newlines
+        '''
+
+        # Modify `self.url`
+        self.url = update_url_language_tab(self.url)
+
+        # If a list is provided to `short_descr`, concatenate list elements with newlines
+        self.short_descr = concatenate_list_of_strings(self.short_descr)
+
     def save(self, *args, **kwargs):
         '''
         Override default save to:
-         * Modify url to include the 'EN' language tab
+         * Call `prepare_initial_save`
          * Call `Country` and `Currency` ForeignKeys `set_is_active`
-         * If `short_descr` is list, concatenate with newlines
         '''
 
         # Only do on initial save
         if self.pk is None:
-            # Modify `self.url`
-            self.url = update_url_language_tab(self.url)
+            self.prepare_initial_save()
 
             # Update `Country` and `Currency` ForeignKeys
             self.country.set_is_active()
@@ -281,9 +302,6 @@ class ContractAwardNotice(models.Model):
             if self.currency:
                 self.currency.set_is_active()
 
-            # If a list is provided to `short_descr`, concatenate list elements with newlines
-            self.short_descr = concatenate_list_of_strings(self.short_descr)
-
         # Call default save
         super().save(*args, **kwargs)
 
@@ -334,7 +352,7 @@ class Lot(models.Model):
          * `Country` and `Currency` ForeignKeys `set_is_active`
          * If `info_add` is list, concatenate with newlines
          * If `short_descr` is list, concatenate with newlines
-         * If `value` and `number_of_units` are filled, calculate `value_per_unit`
+         * Call `set_value_per_unit`
         '''
 
         # Only do on initial save
@@ -352,6 +370,18 @@ class Lot(models.Model):
             # If a list is provided to `short_descr`, concatenate list elements with newlines
             self.short_descr = concatenate_list_of_strings(self.short_descr)
 
+        self.set_value_per_unit()
+
+        # Call default save
+        super().save(*args, **kwargs)
+
+    def set_value_per_unit(self):
+        '''
+        Calculates `value_per_unit` if `value` and `number_of_units` are filled, otherwise clears
+        it. Called by `save`, and should be called before entries are updated with `bulk_update`
+        as this doesn't call `save`
+        '''
+
         # Calculate `value_per_unit` if data is available
         if self.number_of_units and self.value:
             self.value_per_unit = self.value / self.number_of_units
@@ -360,9 +390,6 @@ class Lot(models.Model):
             # If both are not present, clear `value_per_unit`
             self.value_per_unit = None
 
-        # Call default save
-        super().save(*args, **kwargs)
-
     def __str__(self):
         '''
         Defines the return string for a `Lot` entry
@@ -0,0 +1,238 @@
+'''
+Functions for parsing TED xml files and validating them against their xml schema in the `tenders`
+Django web app
+'''
+
+
+import functools
+import os
+import threading
+
+from django.conf import settings
+from lxml import etree
+
+
+# Elements describing the lots of a notice. F02 lots are OBJECT_DESCR and F03 lots are
+# AWARD_CONTRACT. F03 files also have OBJECT_DESCR elements, which aren't used
+LOT_ELEMENT_TAGS = ['OBJECT_DESCR', 'AWARD_CONTRACT']
+
+# Options used to parse TED xml files, see `get_xml_parser`. The whitespace between elements isn't
+# read so isn't kept, ID attributes aren't looked up so aren't indexed, and nothing outside the file
+# is loaded
+XML_PARSER_OPTIONS = {
+    'collect_ids': False,
+    'no_network': True,
+    'remove_blank_text': True,
+    'resolve_entities': False
+}
+
+# `etree.XMLParser` for each thread, see `get_xml_parser`
+XML_PARSERS = threading.local()
+
+
+def check_xml_header(upload_file):
+    '''
+    Method performs a cheap pre-filter on `upload_file` so that files we are not interested in can
+    be rejected before `get_xml_root` and `tenders.helpers.check_xml` are called
+
+    Only the start of the file is read using `etree.iterparse` and parsing stops as soon as the
+    `CODED_DATA_SECTION` element ends. Returns `True` if the following checks pass, otherwise
+    `False`:
+
+     * TED_EXPORT_VERSION is in `settings.SUPPORTED_SCHEMAS`
+     * TD_DOCUMENT_TYPE_CODE is in `settings.SUPPORTED_DOCUMENT_TYPE_CODES`
+     * NC_CONTRACT_NATURE_CODE is `settings.TARGET_CONTRACT_NATURE_CODE`
+     * One of the ORIGINAL_CPV codes is `settings.TARGET_CPV_CODE`. ORIGINAL_CPV lists every cpv
+       code in the notice so will always contain the F02_CPV_CODE or F03_CPV_CODE
+
+    Files that pass should still be checked fully using `tenders.helpers.check_xml`
+    '''
+
+    header = {}
+    original_cpv_codes = []
+
+    try:
+        for event, elem in etree.iterparse(upload_file, events=('start', 'end'),
+                                           huge_tree=settings.XML_PARSER_HUGE_TREE,
+                                           **XML_PARSER_OPTIONS):
+            # Strip the namespace from the tag
+            tag = elem.tag.rpartition('}')[2]
+
+            if event == 'start':
+                if tag == 'TED_EXPORT':
+                    header['version'] = elem.get('VERSION')
+
+            elif tag == 'ORIGINAL_CPV':
+                original_cpv_codes.append(elem.get('CODE'))
+
+            elif tag == 'TD_DOCUMENT_TYPE':
+                header['doc_type_code'] = elem.get('CODE')
+
+            elif tag == 'NC_CONTRACT_NATURE':
+                header['contract_nature'] = elem.get('CODE')
+
+            elif tag == 'CODED_DATA_SECTION':
+                # We have everything we need so stop parsing
+                break
+
+    except etree.XMLSyntaxError:
+        # File can't be parsed so is no use to us
+        return False
+
+    return header.get('version') in settings.SUPPORTED_SCHEMAS and \
+        header.get('doc_type_code') in settings.SUPPORTED_DOCUMENT_TYPE_CODES and \
+        header.get('contract_nature') == settings.TARGET_CONTRACT_NATURE_CODE and \
+        settings.TARGET_CPV_CODE in original_cpv_codes
+
+
+def check_xml_schema(root):
+    '''
+    Method validates the xml `root` against the schema of its TED_EXPORT_VERSION, see
+    `get_xml_schema`
+
+    Returns an `is_valid` boolean and a list of `errors` like `tenders.helpers.check_xml`
+    '''
+
+    xml_schema = get_xml_schema(root.get('VERSION', ''))
+
+    if xml_schema is None:
+        return False, ['XML schema version is not supported.']
+
+    if xml_schema.validate(root):
+        return True, []
+
+    return False, [error.message for error in xml_schema.error_log]
+
+
+def create_namespaces_dict(xml_root):
+    '''
+    Function gets the namespace out of the root and replaces the None default namespace with one
+    called 'def'
+
+    The TED export xml contains a default namespace with a None key. This breaks xpath so we need
+    to replace it with one with a 'def' key
+    '''
+
+    # Grab the namespaces and pop out the default one as this will break xpath
+    namespaces = xml_root.nsmap
+
+    default_ns = namespaces.pop(None, None)
+
+    if default_ns:
+        # Add to the namespaces with an actual name
+        namespaces['def'] = default_ns
+
+    return namespaces
+
+
+def get_xml_parser():
+    '''
+    Returns the `etree.XMLParser` used to parse TED xml files in this thread, with the
+    `XML_PARSER_OPTIONS` and `settings.XML_PARSER_HUGE_TREE`
+
+    A parser can't be used by more than one thread at a time, so each thread creates one and keeps
+    it for reuse
+    '''
+
+    if getattr(XML_PARSERS, 'huge_tree', None) != settings.XML_PARSER_HUGE_TREE:
+        XML_PARSERS.parser = etree.XMLParser(
+            huge_tree=settings.XML_PARSER_HUGE_TREE, **XML_PARSER_OPTIONS
+        )
+        XML_PARSERS.huge_tree = settings.XML_PARSER_HUGE_TREE
+
+    return XML_PARSERS.parser
+
+
+@functools.lru_cache(maxsize=None)
+def get_xml_schema(schema_version):
+    '''
+    Returns an instance of `lxml.etree.XMLSchema` based on the structure of the `TED_EXPORT.xsd`
+    schema file of `schema_version`, e.g. 'R2.0.9.S03.E01', or `None` if there's no schema for it
+    in files/ted_schema
+
+    The schema file includes the large cpv and nuts code lists, so each schema is only compiled
+    once per process and kept for reuse. `load_xml_schemas` compiles them ahead of time
+    '''
+
+    xml_schema_file_path = os.path.join(
+        settings.BASE_DIR, 'files', 'ted_schema', schema_version.replace('.', '_'),
+        settings.XML_SCHEMA_FILE_NAME
+    )
+
+    if not os.path.isfile(xml_schema_file_path):
+        return None
+
+    return etree.XMLSchema(etree.parse(xml_schema_file_path))
+
+
+def get_xml_root(upload_file, strip_lots=False):
+    '''
+    Returns the `etree.tree.root` object  and a namespaces dict from a `upload_file` object
+
+    If `strip_lots` is True, the file is read with `etree.iterparse` and the `LOT_ELEMENT_TAGS`
+    lot elements are dropped from the tree as soon as they are parsed, so the tree stays small
+    however many lots the file has. `check_xml` and `build_tender_from_record` in `tenders.helpers`
+    don't need the lots, which can be read from the file afterwards with `build_lots_from_file` or
+    `build_updated_lots_from_file`
+
+    Otherwise the file is read with the parser from `get_xml_parser`. Both ways use the
+    `XML_PARSER_OPTIONS`
+
+    If there is an error, returns `None`
+    '''
+
+    try:
+        if strip_lots:
+            context = etree.iterparse(
+                upload_file, events=('end', ), tag=['{*}' + tag for tag in LOT_ELEMENT_TAGS],
+                huge_tree=settings.XML_PARSER_HUGE_TREE, **XML_PARSER_OPTIONS
+            )
+
+            for _, elem in context:
+                elem.clear()
+                elem.getparent().remove(elem)
+
+            root = context.root
+
+        else:
+            tree = etree.parse(upload_file, get_xml_parser())
+            root = tree.getroot()
+
+        n_s = create_namespaces_dict(root)
+
+    except etree.XMLSyntaxError:
+        # Return None if error
+        root = None
+        n_s = None
+
+    return root, n_s
+
+
+def iter_lot_elements(upload_file, tag):
+    '''
+    Generator yields an `(element, n_s)` tuple for each lot element with the `tag` local name,
+    e.g. OBJECT_DESCR or AWARD_CONTRACT, in the TED xml file `upload_file`
+
+    The file is read with `etree.iterparse`. Once the caller has finished with an element it is
+    cleared, along with the elements before it, so only one lot is held in memory at a time
+    '''
+
+    for _, elem in etree.iterparse(upload_file, events=('end', ), tag='{*}' + tag,
+                                   huge_tree=settings.XML_PARSER_HUGE_TREE, **XML_PARSER_OPTIONS):
+        yield elem, create_namespaces_dict(elem)
+
+        # Free the lot and anything before it
+        elem.clear()
+
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def load_xml_schemas():
+    '''
+    Method compiles the schema of each version in `settings.SUPPORTED_SCHEMAS` with
+    `get_xml_schema`, so the first files validated don't wait for it
+    '''
+
+    for schema_version in settings.SUPPORTED_SCHEMAS:
+        get_xml_schema(schema_version)
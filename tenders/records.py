@@ -0,0 +1,289 @@
+'''
+Compact records of the data read from TED export xml files
+
+`extract_notice_record` walks a notice tree once, only going down the branches that hold data we
+use, and fills a `NoticeRecord`. `check_notice_record` and `build_tender_from_record` in
+`tenders.helpers` read from the record rather than evaluating an xpath down from the root for each
+field
+
+Values match the equivalent xpaths in `tenders.xpaths`, e.g. a text field is the first text of
+the elements on its path, like 'string(path/text())'
+'''
+
+
+import dataclasses
+import typing
+
+
+# Kinds of value read from the elements on a path
+FIRST_TEXT = 'first_text' # First text of the elements, like 'string(path/text())'
+ALL_TEXTS = 'all_texts' # List of all the texts of the elements, like 'path/text()'
+STRING = 'string' # Text of the first element and its descendants, like 'string(path)'
+EXISTS = 'exists' # Whether an element exists, like 'boolean(path)'
+LOT = 'lot' # `LotRecord` of each element
+
+# Fields read from an OBJECT_DESCR lot element, keyed by the path of local element names below it
+LOT_FIELDS = {
+    ('LOT_NO',): ('lot_no', FIRST_TEXT),
+    ('TITLE', 'P'): ('title', FIRST_TEXT),
+    ('INFO_ADD', 'P'): ('info_add', ALL_TEXTS),
+    ('SHORT_DESCR', 'P'): ('short_descr', ALL_TEXTS)
+}
+
+# Fields read from the CODED_DATA_SECTION of a notice, keyed by the path of local element names
+# below TED_EXPORT. A path ending in '@NAME' reads the NAME attribute of the elements
+CODED_DATA_FIELDS = {
+    ('CODED_DATA_SECTION', 'REF_OJS', 'DATE_PUB'): ('publication_date', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'NO_DOC_OJS'): ('ojs_ref', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'URI_LIST', 'URI_DOC'): ('url', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'ISO_COUNTRY', '@VALUE'): ('country_code', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'VALUES', 'VALUE'): ('value', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'VALUES', 'VALUE', '@CURRENCY'): \
+        ('value_currency', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'NOTICE_DATA', 'REF_NOTICE', 'NO_DOC_OJS'): \
+        ('ref_notice_ojs', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'CODIF_DATA', 'DS_DATE_DISPATCH'): ('dispatch_date', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'CODIF_DATA', 'TD_DOCUMENT_TYPE', '@CODE'): \
+        ('doc_type_code', FIRST_TEXT),
+    ('CODED_DATA_SECTION', 'CODIF_DATA', 'NC_CONTRACT_NATURE', '@CODE'): \
+        ('contract_nature_code', FIRST_TEXT)
+}
+
+# Fields read from the F02_2014 or F03_2014 form of a notice, keyed by the path of local element
+# names below the form element
+FORM_FIELDS = {
+    ('CONTRACTING_BODY', 'ADDRESS_CONTRACTING_BODY', 'OFFICIALNAME'): \
+        ('contracting_body_name', FIRST_TEXT),
+    ('OBJECT_CONTRACT', 'CPV_MAIN', 'CPV_CODE', '@CODE'): ('cpv_code', FIRST_TEXT),
+    ('OBJECT_CONTRACT', 'LOT_DIVISION'): ('lot_division', EXISTS),
+    ('OBJECT_CONTRACT', 'SHORT_DESCR', 'P'): ('short_descr', ALL_TEXTS),
+    ('OBJECT_CONTRACT', 'TITLE', 'P'): ('title', FIRST_TEXT)
+}
+
+F02_FORM_FIELDS = {
+    **FORM_FIELDS,
+    ('CONTRACTING_BODY', 'DOCUMENT_FULL'): ('full_docs_available', EXISTS),
+    ('CONTRACTING_BODY', 'URL_DOCUMENT'): ('procurement_docs_url', STRING),
+    ('OBJECT_CONTRACT', 'REFERENCE_NUMBER'): ('procurement_ref', FIRST_TEXT),
+    ('OBJECT_CONTRACT', 'OBJECT_DESCR'): ('lots', LOT),
+    ('PROCEDURE', 'DATE_RECEIPT_TENDERS'): ('date_receipt_tenders', FIRST_TEXT),
+    ('PROCEDURE', 'TIME_RECEIPT_TENDERS'): ('time_receipt_tenders', FIRST_TEXT)
+}
+
+# Form element and form fields read for each document type code
+FORMS = {
+    '3': ('F02_2014', F02_FORM_FIELDS), # Contract Notice
+    '7': ('F03_2014', FORM_FIELDS) # Contract Award Notice
+}
+
+
+@dataclasses.dataclass
+class LotRecord():
+    '''
+    Data read from an OBJECT_DESCR lot element of a contract notice
+    '''
+
+    lot_no: str = ''
+    title: str = ''
+    info_add: typing.List[str] = dataclasses.field(default_factory=list)
+    short_descr: typing.List[str] = dataclasses.field(default_factory=list)
+
+
+@dataclasses.dataclass
+class NoticeRecord():
+    '''
+    Data read from a TED export xml file. Fields that aren't in the file are left empty
+
+    Form fields are read from the F02_2014 form of contract notices and the F03_2014 form of
+    contract award notices. `lots` holds a `LotRecord` for each OBJECT_DESCR element of a contract
+    notice still in the tree, so is empty for trees read with `strip_lots`
+    '''
+
+    # Header fields
+    schema_version: str = ''
+    doc_type_code: str = ''
+    contract_nature_code: str = ''
+    ojs_ref: str = ''
+    dispatch_date: str = ''
+    publication_date: str = ''
+    country_code: str = ''
+    url: str = ''
+
+    # Contract award notice fields
+    ref_notice_ojs: str = ''
+    value: str = ''
+    value_currency: str = ''
+
+    # Form fields
+    contracting_body_name: str = ''
+    cpv_code: str = ''
+    lot_division: bool = False
+    short_descr: typing.List[str] = dataclasses.field(default_factory=list)
+    title: str = ''
+
+    # Contract notice fields
+    full_docs_available: bool = False
+    procurement_docs_url: str = ''
+    procurement_ref: str = ''
+    date_receipt_tenders: str = ''
+    time_receipt_tenders: str = ''
+
+    lots: typing.List[LotRecord] = dataclasses.field(default_factory=list)
+
+    # Tree the record was read from. Contract award notice lots are read from the tree as their
+    # xpaths depend on the schema version
+    root: typing.Any = dataclasses.field(default=None, repr=False, compare=False)
+    n_s: dict = dataclasses.field(default=None, repr=False, compare=False)
+
+
+def extract_lot_record(lot):
+    '''
+    Method returns a `LotRecord` of the data in the `lot` OBJECT_DESCR element
+    '''
+
+    record = LotRecord()
+
+    walk_fields(lot, LOT_FIELDS, record, set())
+
+    return record
+
+
+def extract_notice_record(root, n_s=None):
+    '''
+    Method returns a `NoticeRecord` of the data in the TED_EXPORT `root` element. `root` and its
+    `n_s` namespace dictionary are kept in the record
+
+    The CODED_DATA_SECTION is read first to find the document type, which sets the form read from
+    FORM_SECTION. No form is read for unsupported document types
+    '''
+
+    record = NoticeRecord(schema_version=root.get('VERSION', ''), root=root, n_s=n_s)
+    found = set()
+
+    walk_fields(root, CODED_DATA_FIELDS, record, found)
+
+    if record.doc_type_code in FORMS:
+        form_tag, form_fields = FORMS[record.doc_type_code]
+
+        for form_section in iter_children(root, 'FORM_SECTION'):
+            for form in iter_children(form_section, form_tag):
+                walk_fields(form, form_fields, record, found)
+
+    return record
+
+
+def get_element_texts(elem):
+    '''
+    Method returns a list of the text nodes directly inside `elem`, like 'text()'
+    '''
+
+    return [text for text in [elem.text] + [child.tail for child in elem] if text is not None]
+
+
+def get_field_paths(fields):
+    '''
+    Method returns a tuple of dictionaries used by `walk_fields` to read the `fields` dictionary:
+
+     * Element fields keyed by path
+     * Lists of `(attribute, field)` tuples keyed by the path of the element with the attributes
+     * Every path leading to a field, which are the only branches walked
+
+    Tuples are kept so each one is only built once
+    '''
+
+    if id(fields) not in FIELD_PATHS:
+        elem_fields = {}
+        attribute_fields = {}
+
+        prefixes = set()
+
+        for path, field in fields.items():
+            if path[-1].startswith('@'):
+                path, attribute = path[:-1], path[-1][1:]
+
+                attribute_fields.setdefault(path, []).append((attribute, field))
+
+            else:
+                elem_fields[path] = field
+
+            prefixes.update(path[:index] for index in range(1, len(path)))
+
+        FIELD_PATHS[id(fields)] = (elem_fields, attribute_fields, prefixes)
+
+    return FIELD_PATHS[id(fields)]
+
+
+def get_local_name(elem):
+    '''
+    Method returns the tag of `elem` without its namespace, or None if `elem` isn't an element,
+    e.g. a comment
+    '''
+
+    return elem.tag.rpartition('}')[2] if isinstance(elem.tag, str) else None
+
+
+def iter_children(elem, local_name):
+    '''
+    Generator yields the child elements of `elem` with the `local_name` tag
+    '''
+
+    for child in elem:
+        if get_local_name(child) == local_name:
+            yield child
+
+
+def set_field(record, found, field, value):
+    '''
+    Method sets a `(field_name, kind)` `field` of `record` from `value`, the element on the field
+    path or its attribute. Fields read from the first element or value are added to `found` once
+    set so later ones are ignored
+    '''
+
+    field_name, kind = field
+
+    if kind == LOT:
+        record.lots.append(extract_lot_record(value))
+
+    elif kind == EXISTS:
+        setattr(record, field_name, True)
+
+    elif kind == ALL_TEXTS:
+        getattr(record, field_name).extend(get_element_texts(value))
+
+    elif field_name not in found:
+        if kind == STRING:
+            value = ''.join(value.itertext())
+
+        elif not isinstance(value, str):
+            texts = get_element_texts(value)
+            value = texts[0] if texts else None
+
+        # 'string(path/text())' skips elements without text, but 'string(path)' doesn't
+        if value is not None:
+            setattr(record, field_name, value)
+            found.add(field_name)
+
+
+def walk_fields(elem, fields, record, found, path=()):
+    '''
+    Method walks down the children of `elem` setting the fields of `record` from the elements and
+    attributes on the paths in `fields`. Branches that don't lead to a field are skipped
+    '''
+
+    elem_fields, attribute_fields, prefixes = get_field_paths(fields)
+
+    for child in elem:
+        child_path = path + (get_local_name(child),)
+
+        if child_path in elem_fields:
+            set_field(record, found, elem_fields[child_path], child)
+
+        for attribute, field in attribute_fields.get(child_path, []):
+            set_field(record, found, field, child.get(attribute))
+
+        if child_path in prefixes:
+            walk_fields(child, fields, record, found, child_path)
+
+
+# Tuples built by `get_field_paths`
+FIELD_PATHS = {}
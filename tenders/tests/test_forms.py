@@ -4,6 +4,7 @@ Tests for `tenders.forms` in the `tenders` Django web application
 
 
 import os
+from unittest import mock
 
 from django.conf import settings
 from django.test import TestCase
@@ -513,6 +514,29 @@ class UploadXmlFileFormTests(TestCase):
         # New entry should be ref 2019/S 097-234233
         self.assertEqual(str(new_entry), '2019/S 097-234233')
 
+    def test_form_save_doesnt_parse_file_again(self):
+        '''
+        `UploadXmlFileForm` `.save()` method should save the record read by `.is_valid()` and read
+        the lots from the uploaded file, rather than parsing the whole file again
+
+        TED export file 2017-OJS238-493624.xml is valid cpv code, document type and contract type
+        '''
+
+        upload_file = helpers.create_files_data('2017-OJS238-493624.xml', settings.TEST_FILES_DIR)
+
+        form = forms.UploadXmlFileForm(self.post_data, upload_file)
+
+        form.is_valid()
+
+        with mock.patch('tenders.parsing.get_xml_root') as mock_get_xml_root:
+            new_entry = form.save()
+
+        mock_get_xml_root.assert_not_called()
+
+        self.assertEqual(
+            (str(new_entry), new_entry.lot_set.count()), ('2017/S 238-493624', 1)
+        )
+
     def test_form_save_f03_updates_lots(self):
         '''
         `UploadXmlFileForm` `.save()` method should save data to a new `ContractAwardNotice` entry
@@ -4,13 +4,16 @@ Tests for `tenders.helpers` in the `tenders` Django web application
 
 
 import datetime
+import io
 import os
 import pytz
+from unittest import mock
 
 from django.conf import settings
+from django.core.cache import caches
 from django.test import TestCase
 
-from tenders import helpers, models
+from tenders import helpers, models, parsing, records, xpaths
 from tenders.tests import helpers as t_helpers
 
 
@@ -37,7 +40,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F03 TED export with incorrect cpv code
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS143-352044.xml')
         )
 
@@ -59,7 +62,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F03 TED export with incorrect cpv code
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS143-352044.xml')
         )
 
@@ -85,7 +88,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F02 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS156-384676.xml')
         )
 
@@ -110,7 +113,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F02 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS156-384676.xml')
         )
 
@@ -136,7 +139,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F03 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
         )
 
@@ -162,7 +165,7 @@ class CheckXmlTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F03 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
         )
 
@@ -194,7 +197,7 @@ class CheckXmlTests(TestCase):
         t_helpers.load_fixtures(self, 'test_is_valid_true_ted_file_contract_award_notice.xml')
 
         # Get the xml root and namespace. File is a valid F03 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
         )
 
@@ -203,57 +206,313 @@ class CheckXmlTests(TestCase):
         #  Confirm `is_valid` is `True`
         self.assertTrue(is_valid)
 
+    def test_is_valid_true_known_ojs_refs_contract_award_notice(self):
+        '''
+        `check_xml` should use the input `known_ojs_refs` instead of querying the database to
+        check a contract award notice
+
+        TED export file 2019-OJS072-170256.xml is a valid contract award notice referencing
+        2018/S 191-431371, which is only in `known_ojs_refs`
+        '''
+
+        root, n_s = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
+        )
+
+        known_ojs_refs = {
+            models.ContractNotice: {'2018/S 191-431371'}, models.ContractAwardNotice: set()
+        }
+
+        with self.assertNumQueries(0):
+            is_valid, _ = helpers.check_xml(root, n_s, known_ojs_refs)
+
+        self.assertTrue(is_valid)
+
+    def test_is_valid_false_known_ojs_refs_contract_notice(self):
+        '''
+        `check_xml` should return `is_valid` `False` if the ojs_ref of the input xml `root` is in
+        the input `known_ojs_refs`
+
+        TED export file 2018-OJS191-431371.xml is a valid contract notice
+        '''
+
+        root, n_s = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml')
+        )
+
+        known_ojs_refs = {
+            models.ContractNotice: {'2018/S 191-431371'}, models.ContractAwardNotice: set()
+        }
+
+        is_valid, error_list = helpers.check_xml(root, n_s, known_ojs_refs)
+
+        self.assertEqual((is_valid, len(error_list)), (False, 1))
+
+
+class CreateNewTendersTests(TestCase):
+    '''
+    TestCase class for the `create_new_tenders` helper function
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        # TED export file 2018-OJS191-431371.xml is a valid contract notice and
+        # 2019-OJS072-170256.xml is its corresponding contract award notice
+        self.contract_notice_root = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml')
+        )
+        self.contract_award_notice_root = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
+        )
+
+        self.contract_notice_record = records.extract_notice_record(*self.contract_notice_root)
+        self.contract_award_notice_record = \
+            records.extract_notice_record(*self.contract_award_notice_root)
+
+    def test_method_creates_contract_notice_and_lots(self):
+        '''
+        `create_new_tenders` method should create a new `ContractNotice` entry and its `Lot` entries
+        from a valid contract notice
+        '''
+
+        new_entries = helpers.create_new_tenders([self.contract_notice_record])
+
+        self.assertEqual(
+            (models.ContractNotice.objects.get().ojs_ref, models.Lot.objects.count()),
+            (new_entries[0].ojs_ref, 10)
+        )
+
+    def test_method_updates_lots_from_contract_award_notice(self):
+        '''
+        `create_new_tenders` method should create a new `ContractAwardNotice` entry and update the
+        `Lot` entries of the corresponding `ContractNotice` in the same way as `create_new_tender`
+        '''
+
+        helpers.create_new_tenders([self.contract_notice_record])
+        helpers.create_new_tenders([self.contract_award_notice_record])
+
+        bulk_lots = list(models.Lot.objects.values_list(
+            *helpers.UPDATED_LOT_FIELDS).order_by('lot_no'))
+
+        # Write the same files again one at a time
+        models.ContractAwardNotice.objects.all().delete()
+        models.ContractNotice.objects.all().delete()
+
+        helpers.create_new_tender(*self.contract_notice_root)
+        helpers.create_new_tender(*self.contract_award_notice_root)
+
+        self.assertEqual(
+            bulk_lots,
+            list(models.Lot.objects.values_list(*helpers.UPDATED_LOT_FIELDS).order_by('lot_no'))
+        )
+
+    def test_method_skips_files_that_cant_be_saved(self):
+        '''
+        `create_new_tenders` method should skip a file that can't be saved and still create
+        entries for the rest of the files
+        '''
+
+        # The second copy of the contract notice has a duplicate `ojs_ref`
+        new_entries = helpers.create_new_tenders(
+            [self.contract_notice_record, self.contract_notice_record]
+        )
+
+        self.assertEqual(
+            (len(new_entries), models.ContractNotice.objects.count()), (1, 1)
+        )
+
+    def test_method_streams_lots_from_lot_sources(self):
+        '''
+        `create_new_tenders` method should read the lots of files parsed with `strip_lots` from
+        `lot_sources` and write the same lots as from the full trees
+        '''
+
+        helpers.create_new_tenders([self.contract_notice_record])
+        helpers.create_new_tenders([self.contract_award_notice_record])
+
+        tree_lots = list(models.Lot.objects.values_list(
+            'lot_no', 'title', 'short_descr', 'info_add', *helpers.UPDATED_LOT_FIELDS
+        ).order_by('lot_no'))
 
+        models.ContractAwardNotice.objects.all().delete()
+        models.ContractNotice.objects.all().delete()
 
-class GetXmlRootTests(TestCase):
+        for file_name in ['2018-OJS191-431371.xml', '2019-OJS072-170256.xml']:
+            with open(os.path.join(settings.TEST_FILES_DIR, file_name), 'rb') as file:
+                xml_data = file.read()
+
+            root, n_s = parsing.get_xml_root(io.BytesIO(xml_data), strip_lots=True)
+
+            helpers.create_new_tenders(
+                [records.extract_notice_record(root, n_s)],
+                {root.xpath(xpaths.NO_DOC_OJS, namespaces=n_s): xml_data}
+            )
+
+        self.assertEqual(
+            tree_lots,
+            list(models.Lot.objects.values_list(
+                'lot_no', 'title', 'short_descr', 'info_add', *helpers.UPDATED_LOT_FIELDS
+            ).order_by('lot_no'))
+        )
+
+
+class ReadNoticeRecordTests(TestCase):
     '''
-    TestCase class for the `get_xml_root` helper function
+    TestCase class for the `read_notice_record` helper function
     '''
 
-    def test_root_is_none_if_file_is_invalid(self):
+    def setUp(self):
+        '''
+        Common setup across the tests
+
+        TED export file 2019-OJS115-281492.xml is a contract notice with the wrong contract nature
+        '''
+
+        caches[settings.NOTICE_RECORD_CACHE].clear()
+        self.addCleanup(caches[settings.NOTICE_RECORD_CACHE].clear)
+
+        with open(os.path.join(settings.TEST_FILES_DIR, '2019-OJS115-281492.xml'), 'rb') as file:
+            self.xml_data = file.read()
+
+    def test_method_returns_record_and_content_errors(self):
+        '''
+        `read_notice_record` method should return the record of the file without its tree, and
+        the errors `check_notice_content` finds in it without querying the database
         '''
-        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
-        for the xml file
 
-        If the file is not a valid xml file, the returned tuple should be (`None`, `None`)
+        root, n_s = parsing.get_xml_root(io.BytesIO(self.xml_data), strip_lots=True)
+
+        with self.assertNumQueries(0):
+            notice_record, content_errors = helpers.read_notice_record(self.xml_data)
+
+        self.assertEqual(
+            (notice_record, notice_record.root, content_errors),
+            (records.extract_notice_record(root, n_s), None, ['Contract nature is not "2".'])
+        )
+
+    def test_method_reads_file_once(self):
+        '''
+        `read_notice_record` method should return the cached result for a file that has been read
+        before rather than parsing it again
         '''
 
-        root, _ = helpers.get_xml_root(os.path.join(settings.TEST_FILES_DIR, 'export.xml'))
+        result = helpers.read_notice_record(self.xml_data)
 
-        # Confirm `root` is `None`
-        self.assertIsNone(root)
+        with mock.patch('tenders.parsing.get_xml_root') as mock_get_xml_root:
+            self.assertEqual(helpers.read_notice_record(self.xml_data), result)
 
-    def test_root_is_not_none_if_file_is_valid(self):
+        mock_get_xml_root.assert_not_called()
+
+    def test_method_returns_none_for_invalid_syntax(self):
+        '''
+        `read_notice_record` method should return `(None, None)` if the file is not a valid xml
+        file
         '''
-        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
-        for the xml file
 
-        If the file is a valid xml file, the returned tuple should be (`root`, `ns`)
+        self.assertEqual(helpers.read_notice_record(self.xml_data[:1000]), (None, None))
+
+
+class UpdateLotsTests(TestCase):
+    '''
+    TestCase class for the `update_lots` helper function
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
         '''
+        Common setup across the tests
 
-        # File is a valid TED export xml file
-        root, _ = helpers.get_xml_root(
-            os.path.join(settings.TEST_FILES_DIR, '2017-OJS184-376771.xml')
+        TED export file 2018-OJS191-431371.xml is a valid contract notice with 10 lots and
+        2019-OJS072-170256.xml is its corresponding contract award notice
+        '''
+
+        helpers.create_new_tender(*parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml')
+        ))
+
+        self.contract_award_notice_root = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
         )
+        self.contract_award_notice = helpers.create_new_tender(*self.contract_award_notice_root)
 
-        # Confirm `root` is not `None`
-        self.assertIsNotNone(root)
+        self.updated_lots = list(models.Lot.objects.values_list(
+            *helpers.UPDATED_LOT_FIELDS).order_by('lot_no'))
 
-    def test_ns_is_not_none_if_file_is_valid(self):
+        # Clear the data read from the contract award notice
+        models.Lot.objects.update(
+            awarded_contract=False, contractor_name='', value=None, value_per_unit=None
+        )
+
+    def test_method_updates_lots(self):
         '''
-        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
-        for the xml file
+        `update_lots` method should update each lot from the AWARD_CONTRACT with its LOT_NO
+        '''
+
+        helpers.update_lots(*self.contract_award_notice_root, self.contract_award_notice)
 
-        If the file is a valid xml file, the returned tuple should be (`root`, `ns`)
+        self.assertEqual(
+            list(models.Lot.objects.values_list(*helpers.UPDATED_LOT_FIELDS).order_by('lot_no')),
+            self.updated_lots
+        )
+
+    def test_method_queries_dont_grow_with_lots(self):
+        '''
+        `update_lots` method should read the lots, look up the foreign keys and save every lot
+        with a fixed number of queries
         '''
 
-        # File is a valid TED export xml file
-        _, n_s = helpers.get_xml_root(
-            os.path.join(settings.TEST_FILES_DIR, '2017-OJS184-376771.xml')
+        with self.assertNumQueries(4):
+            helpers.update_lots(*self.contract_award_notice_root, self.contract_award_notice)
+
+
+class GetKnownOjsRefsTests(TestCase):
+    '''
+    TestCase class for the `get_known_ojs_refs` helper function
+    '''
+
+    fixtures = [
+        './files/initial_data/countries.xml',
+        './files/initial_data/currencies.xml'
+    ]
+
+    def setUp(self):
+        # TED export file 2018-OJS191-431371.xml is a valid contract notice and
+        # 2019-OJS072-170256.xml is its corresponding contract award notice
+        self.notice_records = [
+            records.extract_notice_record(
+                *parsing.get_xml_root(os.path.join(settings.TEST_FILES_DIR, file_name))
+            )
+            for file_name in ['2018-OJS191-431371.xml', '2019-OJS072-170256.xml']
+        ]
+
+    def test_method_returns_ojs_refs_in_database(self):
+        '''
+        `get_known_ojs_refs` method should return the ojs_refs of the files, and of the contract
+        notices they reference, that are already in the database
+        '''
+
+        helpers.create_new_tenders(self.notice_records[:1])
+
+        self.assertEqual(
+            helpers.get_known_ojs_refs(self.notice_records),
+            {models.ContractNotice: {'2018/S 191-431371'}, models.ContractAwardNotice: set()}
         )
 
-        # Confirm `root` is not `None`
-        self.assertIsNotNone(n_s)
+    def test_method_uses_one_query_per_model(self):
+        '''
+        `get_known_ojs_refs` method should look up the ojs_refs with one query per model
+        '''
+
+        with self.assertNumQueries(2):
+            helpers.get_known_ojs_refs(self.notice_records * 10)
 
 
 class GetTenderClosingDatetimeTests(TestCase):
@@ -271,7 +530,7 @@ class GetTenderClosingDatetimeTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F02 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS224-550752.xml')
         )
 
@@ -294,7 +553,7 @@ class GetTenderClosingDatetimeTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F02 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')
         )
 
@@ -317,7 +576,7 @@ class GetTenderClosingDatetimeTests(TestCase):
 
         # Get the xml root and namespace. File is a F03 TED export that will not have data at the
         # xpath locations
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS147-361481.xml')
         )
 
@@ -342,7 +601,7 @@ class GetTenderModelTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F03 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml')
         )
 
@@ -357,7 +616,7 @@ class GetTenderModelTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F02 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS156-384676.xml')
         )
 
@@ -372,7 +631,7 @@ class GetTenderModelTests(TestCase):
         '''
 
         # Get the xml root and namespace. File is a valid F15 TED export with correct attributes
-        root, n_s = helpers.get_xml_root(
+        root, n_s = parsing.get_xml_root(
             os.path.join(settings.TEST_FILES_DIR, '2019-OJS222-544536.xml')
         )
 
@@ -0,0 +1,323 @@
+'''
+Tests for `tenders.parsing` in the `tenders` Django web application
+'''
+
+
+import io
+import os
+import threading
+
+from django.conf import settings
+from django.test import TestCase
+from lxml import etree
+
+from tenders import helpers, parsing, records, xpaths
+
+
+class CheckXmlHeaderTests(TestCase):
+    '''
+    TestCase class for the `check_xml_header` helper function
+    '''
+
+    def test_returns_true_for_valid_contract_notice(self):
+        '''
+        `check_xml_header` should return `True` if the file header could pass `check_xml`
+
+        TED export file 2017-OJS238-493624.xml is a valid F02 contract notice
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')
+
+        self.assertTrue(parsing.check_xml_header(file_path))
+
+    def test_returns_true_for_valid_contract_award_notice(self):
+        '''
+        `check_xml_header` should return `True` if the file header could pass `check_xml`
+
+        TED export file 2017-OJS184-376771.xml is a valid F03 contract award notice
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '2017-OJS184-376771.xml')
+
+        self.assertTrue(parsing.check_xml_header(file_path))
+
+    def test_returns_false_for_bad_cpv_code(self):
+        '''
+        `check_xml_header` should return `False` if no ORIGINAL_CPV code is
+        `settings.TARGET_CPV_CODE`
+
+        TED export file 2019-OJS143-352044.xml is valid contract award notice and document type,
+        but wrong cpv code
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '2019-OJS143-352044.xml')
+
+        self.assertFalse(parsing.check_xml_header(file_path))
+
+    def test_returns_false_for_bad_contract_nature(self):
+        '''
+        `check_xml_header` should return `False` if the contract nature is not
+        `settings.TARGET_CONTRACT_NATURE_CODE`
+
+        TED export file 2019-OJS115-281492.xml is valid cpv code and document type, but wrong
+        contract nature
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '2019-OJS115-281492.xml')
+
+        self.assertFalse(parsing.check_xml_header(file_path))
+
+    def test_returns_false_for_invalid_syntax(self):
+        '''
+        `check_xml_header` should return `False` if the file is not a valid xml file
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, 'export.xml')
+
+        self.assertFalse(parsing.check_xml_header(file_path))
+
+
+class CheckXmlSchemaTests(TestCase):
+    '''
+    TestCase class for the `check_xml_schema` helper function
+    '''
+
+    def test_returns_true_for_valid_file(self):
+        '''
+        `check_xml_schema` should return `True` and no errors if the file is valid against the
+        schema of its version
+
+        TED export file 2017-OJS238-493624.xml is a valid R2.0.9.S02.E01 contract notice
+        '''
+
+        root, _ = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')
+        )
+
+        self.assertEqual(parsing.check_xml_schema(root), (True, []))
+
+    def test_returns_false_for_invalid_file(self):
+        '''
+        `check_xml_schema` should return `False` and the schema errors if the file isn't valid
+        against the schema of its version
+        '''
+
+        with open(os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml'), 'rb') as file:
+            xml_data = file.read().replace(
+                b'</TECHNICAL_SECTION>', b'<UNKNOWN_ELEMENT/></TECHNICAL_SECTION>'
+            )
+
+        root, _ = parsing.get_xml_root(io.BytesIO(xml_data))
+
+        is_valid, error_list = parsing.check_xml_schema(root)
+
+        self.assertEqual((is_valid, len(error_list)), (False, 1))
+        self.assertIn('UNKNOWN_ELEMENT', error_list[0])
+
+    def test_returns_false_for_unknown_schema_version(self):
+        '''
+        `check_xml_schema` should return `False` if there's no schema for the file version
+        '''
+
+        root, _ = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')
+        )
+        root.set('VERSION', 'R2.0.8.S02.E01')
+
+        self.assertEqual(
+            parsing.check_xml_schema(root), (False, ['XML schema version is not supported.'])
+        )
+
+
+class IterLotElementsTests(TestCase):
+    '''
+    TestCase class for the `iter_lot_elements` helper function
+    '''
+
+    def test_method_yields_lot_elements(self):
+        '''
+        `iter_lot_elements` method should yield the lot elements in the file in order
+
+        TED export file 2018-OJS191-431371.xml is a valid contract notice with 10 lots
+        '''
+
+        lot_nos = [
+            lot.xpath(xpaths.LOT_NO, namespaces=n_s) for lot, n_s in parsing.iter_lot_elements(
+                os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml'), 'OBJECT_DESCR'
+            )
+        ]
+
+        self.assertEqual(lot_nos, [str(lot_no) for lot_no in range(1, 11)])
+
+    def test_method_clears_previous_lots(self):
+        '''
+        `iter_lot_elements` method should clear each lot and the elements before it once the
+        next lot is reached
+        '''
+
+        previous_lots = []
+
+        for lot, _ in parsing.iter_lot_elements(
+                os.path.join(settings.TEST_FILES_DIR, '2018-OJS191-431371.xml'), 'OBJECT_DESCR'):
+            if previous_lots:
+                # Only the emptied previous lot is left before the lot
+                self.assertEqual(
+                    (lot.getprevious(), len(lot.getprevious()),
+                     lot.getprevious().getprevious()),
+                    (previous_lots[-1], 0, None)
+                )
+
+            previous_lots.append(lot)
+
+        self.assertEqual(len(previous_lots), 10)
+
+
+class GetXmlRootTests(TestCase):
+    '''
+    TestCase class for the `get_xml_root` helper function
+    '''
+
+    def test_root_is_none_if_file_is_invalid(self):
+        '''
+        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
+        for the xml file
+
+        If the file is not a valid xml file, the returned tuple should be (`None`, `None`)
+        '''
+
+        root, _ = parsing.get_xml_root(os.path.join(settings.TEST_FILES_DIR, 'export.xml'))
+
+        # Confirm `root` is `None`
+        self.assertIsNone(root)
+
+    def test_root_is_not_none_if_file_is_valid(self):
+        '''
+        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
+        for the xml file
+
+        If the file is a valid xml file, the returned tuple should be (`root`, `ns`)
+        '''
+
+        # File is a valid TED export xml file
+        root, _ = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2017-OJS184-376771.xml')
+        )
+
+        # Confirm `root` is not `None`
+        self.assertIsNotNone(root)
+
+    def test_ns_is_not_none_if_file_is_valid(self):
+        '''
+        `get_xml_root` method should return a tuple containg the xml root and namespaces dictionary
+        for the xml file
+
+        If the file is a valid xml file, the returned tuple should be (`root`, `ns`)
+        '''
+
+        # File is a valid TED export xml file
+        _, n_s = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2017-OJS184-376771.xml')
+        )
+
+        # Confirm `root` is not `None`
+        self.assertIsNotNone(n_s)
+
+    def test_strip_lots_removes_lots(self):
+        '''
+        `get_xml_root` method should drop the lot elements from the tree if `strip_lots` is True
+        and keep the rest of the file
+
+        TED export file 2019-OJS072-170256.xml is a valid contract award notice
+        '''
+
+        root, n_s = parsing.get_xml_root(
+            os.path.join(settings.TEST_FILES_DIR, '2019-OJS072-170256.xml'), strip_lots=True
+        )
+
+        self.assertEqual(
+            (root.xpath(xpaths.NO_DOC_OJS, namespaces=n_s),
+             root.xpath(xpaths.F03_AWARD_CONTRACT, namespaces=n_s),
+             root.xpath(xpaths.F03_OBJECT_DESCR, namespaces=n_s),
+             helpers.check_xml(root, n_s)[1]),
+            ('2019/S 072-170256', [], [],
+             ['Contract Notice ref "2018/S 191-431371" does not exist in database.'])
+        )
+
+
+class GetXmlParserTests(TestCase):
+    '''
+    TestCase class for the `get_xml_parser` helper function
+    '''
+
+    def test_method_reuses_parser(self):
+        '''
+        `get_xml_parser` method should return the same parser each time it is called in a thread
+        '''
+
+        self.assertIs(parsing.get_xml_parser(), parsing.get_xml_parser())
+
+    def test_method_creates_parser_for_each_thread(self):
+        '''
+        `get_xml_parser` method should give each thread its own parser
+        '''
+
+        thread_parsers = []
+
+        thread = threading.Thread(target=lambda: thread_parsers.append(parsing.get_xml_parser()))
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(thread_parsers[0], parsing.get_xml_parser())
+
+    def test_get_xml_root_drops_blank_text(self):
+        '''
+        `get_xml_root` method should drop the whitespace between elements and keep the same data
+
+        TED export file 2017-OJS238-493624.xml is an indented contract notice
+        '''
+
+        file_path = os.path.join(settings.TEST_FILES_DIR, '2017-OJS238-493624.xml')
+
+        root, n_s = parsing.get_xml_root(file_path)
+        default_root = etree.parse(file_path).getroot()
+
+        self.assertEqual(
+            (root.text, root[0].tail, records.extract_notice_record(root, n_s)),
+            (None, None, records.extract_notice_record(default_root))
+        )
+
+
+class GetXmlSchemaTests(TestCase):
+    '''
+    TestCase class for the `get_xml_schema` helper function
+    '''
+
+    def test_method_reuses_schema(self):
+        '''
+        `get_xml_schema` method should compile each schema version once and return it again
+        '''
+
+        self.assertIs(
+            parsing.get_xml_schema('R2.0.9.S03.E01'), parsing.get_xml_schema('R2.0.9.S03.E01')
+        )
+
+    def test_method_returns_none_for_unknown_schema_version(self):
+        '''
+        `get_xml_schema` method should return `None` if there's no schema for the version in
+        files/ted_schema
+        '''
+
+        self.assertIsNone(parsing.get_xml_schema('R2.0.8.S02.E01'))
+
+    def test_load_xml_schemas_compiles_supported_schemas(self):
+        '''
+        `load_xml_schemas` method should compile the schema of every supported version
+        '''
+
+        parsing.get_xml_schema.cache_clear()
+
+        parsing.load_xml_schemas()
+
+        self.assertEqual(
+            parsing.get_xml_schema.cache_info().currsize, len(settings.SUPPORTED_SCHEMAS)
+        )
@@ -0,0 +1,109 @@
+'''
+Tests for `tenders.records` in the `tenders` Django web application
+'''
+
+
+import os
+
+from django.conf import settings
+from django.test import TestCase
+
+from lxml import etree
+
+from tenders import records, xpaths
+from tenders.parsing import create_namespaces_dict
+
+
+class ExtractNoticeRecordTests(TestCase):
+    '''
+    TestCase class for the `extract_notice_record` method
+    '''
+
+    def get_root(self, file_name):
+        '''
+        Returns the root and namespaces dictionary of the `file_name` TED export file
+        '''
+
+        root = etree.parse(os.path.join(settings.TEST_FILES_DIR, file_name)).getroot()
+
+        return root, create_namespaces_dict(root)
+
+    def test_method_matches_contract_notice_xpaths(self):
+        '''
+        `extract_notice_record` method should read the same values from a contract notice as the
+        F02 xpaths
+
+        File 2018-OJS191-431371.xml is a valid F02 Contract Notice
+        '''
+
+        root, n_s = self.get_root('2018-OJS191-431371.xml')
+
+        notice_record = records.extract_notice_record(root, n_s)
+
+        self.assertEqual(
+            [notice_record.doc_type_code, notice_record.ojs_ref, notice_record.cpv_code,
+             notice_record.lot_division, notice_record.title, notice_record.short_descr,
+             notice_record.procurement_docs_url, notice_record.date_receipt_tenders],
+            [root.xpath(xpath, namespaces=n_s) for xpath in [
+                xpaths.TD_DOCUMENT_TYPE_CODE, xpaths.NO_DOC_OJS, xpaths.F02_CPV_CODE,
+                xpaths.F02_LOT_DIVISION, xpaths.F02_TITLE_P, xpaths.F02_SHORT_DESCR_P,
+                xpaths.F02_URL_DOCUMENT, xpaths.F02_DATE_RECEIPT_TENDERS
+            ]]
+        )
+
+    def test_method_matches_contract_award_notice_xpaths(self):
+        '''
+        `extract_notice_record` method should read the same values from a contract award notice
+        as the F03 xpaths
+
+        File 2017-OJS247-518290.xml is a valid F03 Contract Award Notice using the R2.0.9.S02.E01
+        schema
+        '''
+
+        root, n_s = self.get_root('2017-OJS247-518290.xml')
+
+        notice_record = records.extract_notice_record(root, n_s)
+
+        self.assertEqual(
+            [notice_record.schema_version, notice_record.ref_notice_ojs, notice_record.value,
+             notice_record.value_currency, notice_record.contracting_body_name,
+             notice_record.lot_division],
+            [root.xpath(xpath, namespaces=n_s) for xpath in [
+                xpaths.TED_EXPORT_VERSION, xpaths.F03_REF_NOTICE_OJS, xpaths.F03_VALUE,
+                xpaths.F03_VALUE_CURRENCY, xpaths.F03_OFFICIALNAME, xpaths.F03_LOT_DIVISION
+            ]]
+        )
+
+    def test_method_reads_contract_notice_lots(self):
+        '''
+        `extract_notice_record` method should read a `LotRecord` from each OBJECT_DESCR element
+        of a contract notice
+        '''
+
+        root, n_s = self.get_root('2018-OJS191-431371.xml')
+
+        notice_record = records.extract_notice_record(root, n_s)
+
+        self.assertEqual(
+            [(lot_record.lot_no, lot_record.title) for lot_record in notice_record.lots],
+            [(lot.xpath(xpaths.LOT_NO, namespaces=n_s),
+              lot.xpath(xpaths.LOT_TITLE_P, namespaces=n_s))
+             for lot in root.xpath(xpaths.F02_OBJECT_DESCR, namespaces=n_s)]
+        )
+
+    def test_method_skips_form_of_unsupported_document_types(self):
+        '''
+        `extract_notice_record` method should only read the header fields of a file with an
+        unsupported document type
+        '''
+
+        root, n_s = self.get_root('2018-OJS191-431371.xml')
+
+        root.xpath('//def:TD_DOCUMENT_TYPE', namespaces=n_s)[0].set('CODE', '0')
+
+        notice_record = records.extract_notice_record(root, n_s)
+
+        self.assertEqual(
+            (notice_record.ojs_ref, notice_record.title, notice_record.lots),
+            ('2018/S 191-431371', '', [])
+        )
@@ -11,7 +11,8 @@ from django.test import TestCase
 from lxml import etree
 
 from tenders import xpaths
-from tenders.helpers import create_namespaces_dict
+from tenders.checks import check_supported_schemas
+from tenders.parsing import create_namespaces_dict
 
 
 class XPathTestsF02R209S02E01(TestCase):
@@ -1287,3 +1288,128 @@ class XPathTestsF03R209S03E012(TestCase):
         result = self.od_elem[0].xpath(xpaths.LOT_INFO_ADD_P, namespaces=self.namespaces)
 
         self.assertEqual(result, info_add)
+
+
+class CompiledXPathTests(TestCase):
+    '''
+    TestCase class for the precompiled xpaths returned by `compile_xpath` and used by `evaluate`
+    '''
+
+    def setUp(self):
+        '''
+        Common setup for each test
+
+        Read an F03 Contract Award Notice for each schema version, which use different TED
+        namespaces
+        '''
+
+        self.xml_roots = []
+
+        for file_name in ['2017-OJS247-518290.xml', '2019-OJS072-170256.xml']:
+            root = etree.parse(os.path.join(settings.TEST_FILES_DIR, file_name)).getroot()
+
+            self.xml_roots.append((root, create_namespaces_dict(root)))
+
+    def test_evaluate_matches_string_xpaths(self):
+        '''
+        `evaluate` should return the same results as evaluating the xpath strings with
+        `element.xpath`
+        '''
+
+        for root, n_s in self.xml_roots:
+            for xpath in [xpaths.NO_DOC_OJS, xpaths.F03_REF_NOTICE_OJS, xpaths.F03_LOT_DIVISION,
+                          xpaths.F03_SHORT_DESCR_P]:
+                self.assertEqual(xpaths.evaluate(root, xpath, n_s),
+                                 root.xpath(xpath, namespaces=n_s))
+
+    def test_evaluate_uses_element_as_context(self):
+        '''
+        `evaluate` should evaluate relative xpaths from the input element
+        '''
+
+        root, n_s = self.xml_roots[1]
+
+        award_contract = xpaths.evaluate(root, xpaths.F03_AWARD_CONTRACT, n_s)[0]
+
+        self.assertEqual(xpaths.evaluate(award_contract, xpaths.LOT_NO, n_s),
+                         award_contract.xpath(xpaths.LOT_NO, namespaces=n_s))
+
+    def test_compile_xpath_compiles_once_per_namespace(self):
+        '''
+        `compile_xpath` should return the same `etree.XPath` object for an xpath and namespace,
+        and a different one for each TED namespace
+        '''
+
+        namespaces = [n_s['def'] for _, n_s in self.xml_roots]
+
+        self.assertIs(xpaths.compile_xpath(xpaths.NO_DOC_OJS, namespaces[0]),
+                      xpaths.compile_xpath(xpaths.NO_DOC_OJS, namespaces[0]))
+        self.assertIsNot(xpaths.compile_xpath(xpaths.NO_DOC_OJS, namespaces[0]),
+                         xpaths.compile_xpath(xpaths.NO_DOC_OJS, namespaces[1]))
+
+
+class LotSchemaSpecificXPathsTests(TestCase):
+    '''
+    TestCase class for the `lot_schema_specific_xpaths` registry lookup
+    '''
+
+    def test_method_returns_registered_version_xpaths(self):
+        '''
+        `lot_schema_specific_xpaths` should return the xpaths registered for a schema version
+        '''
+
+        self.assertEqual(
+            xpaths.lot_schema_specific_xpaths('R2.0.9.S02.E01')['F03_LOT_VAL_TOTAL'],
+            xpaths.F03_LOT_VAL_TOTAL_R2_0_9_S02_E01
+        )
+
+    def test_method_falls_back_to_nearest_older_version(self):
+        '''
+        `lot_schema_specific_xpaths` should return the xpaths of the newest older version of the
+        same release for a version that isn't registered
+        '''
+
+        self.assertIs(
+            xpaths.lot_schema_specific_xpaths('R2.0.9.S05.E01'),
+            xpaths.LOT_SCHEMA_SPECIFIC_XPATHS['R2.0.9.S03.E01']
+        )
+
+    def test_method_falls_back_to_oldest_version_of_release(self):
+        '''
+        `lot_schema_specific_xpaths` should return the xpaths of the oldest version of the same
+        release for a version older than every registered version
+        '''
+
+        self.assertIs(
+            xpaths.lot_schema_specific_xpaths('R2.0.9.S01.E01'),
+            xpaths.LOT_SCHEMA_SPECIFIC_XPATHS['R2.0.9.S02.E01']
+        )
+
+    def test_method_raises_value_error_for_other_releases(self):
+        '''
+        `lot_schema_specific_xpaths` should raise `ValueError` for a version with no compatible
+        lot xpaths
+        '''
+
+        for schema_version in ['R2.0.8.S02.E01', 'unknown', '']:
+            with self.assertRaises(ValueError):
+                xpaths.lot_schema_specific_xpaths(schema_version)
+
+    def test_method_returns_read_only_xpaths(self):
+        '''
+        `lot_schema_specific_xpaths` should return xpaths that can't be changed by callers
+        '''
+
+        with self.assertRaises(TypeError):
+            xpaths.lot_schema_specific_xpaths('R2.0.9.S03.E01')['F03_LOT_VAL_TOTAL'] = ''
+
+    def test_supported_schemas_check(self):
+        '''
+        `check_supported_schemas` system check should report schema versions in
+        `settings.SUPPORTED_SCHEMAS` without compatible lot xpaths
+        '''
+
+        with self.settings(SUPPORTED_SCHEMAS=['R2.0.9.S03.E01', 'R2.0.8.S02.E01']):
+            errors = check_supported_schemas(None)
+
+        self.assertEqual([error.id for error in errors], ['tenders.E001'])
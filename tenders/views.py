@@ -301,10 +301,9 @@ class TenderSingleCreateView(LoginRequiredMixin, ContextMixin, View):
         form = self.form_class(request.POST, request.FILES)
 
         # If data entered is valid, call `form.save()` to create new entries
-        if form.is_valid():
-
-            new_entry = form.save()
+        new_entry = form.save() if form.is_valid() else None
 
+        if new_entry is not None:
             # Create the success message
             messages.add_message(
                 request,
@@ -320,7 +319,7 @@ class TenderSingleCreateView(LoginRequiredMixin, ContextMixin, View):
             )
 
         else:
-            # If not valid, return the form with associated errors
+            # If not valid or not saved, return the form with associated errors
             # Build context ready to pass to render
             context = self.get_context_data(form=form)
 
@@ -4,6 +4,9 @@ still allowing us to access them via the `tenders.xpaths` notation elsewhere
 '''
 
 
+from .compiled import compile_xpath
+from .compiled import evaluate
+
 from .common_2014 import DATE_PUB
 from .common_2014 import DS_DATE_DISPATCH
 from .common_2014 import IA_URL_GENERAL
@@ -63,4 +66,6 @@ from .f03_2014 import F03_LOT_VAL_TOTAL_CURRENCY_R2_0_9_S03_E01
 from .f03_2014 import F03_LOT_VAL_EST_TOTAL_R2_0_9_S03_E01
 from .f03_2014 import F03_LOT_VAL_EST_CURRENCY_R2_0_9_S03_E01
 
+from .f03_2014 import LOT_SCHEMA_SPECIFIC_XPATHS
+from .f03_2014 import get_compatible_schema_version
 from .f03_2014 import lot_schema_specific_xpaths
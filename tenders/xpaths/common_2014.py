@@ -2,7 +2,7 @@
 Defines common xpaths used to grab data out of TED export xml files
 
 Xpaths defined below use a 'def' namespace. The default namespace used by TED is None, but this
-breaks `lxml.xpath` so we change the None namespace to 'def' using `helpers.create_namespaces_dict`
+breaks `lxml.xpath` so we change the None namespace to 'def' using `parsing.create_namespaces_dict`
 '''
 
 
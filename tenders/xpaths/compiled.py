@@ -0,0 +1,33 @@
+'''
+Precompiled versions of the xpaths defined in the other `tenders.xpaths` modules
+
+lxml compiles an xpath string every time `element.xpath` is called with it. `compile_xpath`
+compiles each xpath into an `etree.XPath` object once for each TED namespace, which changes with
+the schema version, e.g. 'ted/R2.0.9.S02/publication', and `evaluate` calls it on an element
+'''
+
+
+import functools
+
+from lxml import etree
+
+
+@functools.lru_cache(maxsize=None)
+def compile_xpath(xpath, namespace=None):
+    '''
+    Method returns an `etree.XPath` object for the `xpath` string with the 'def' prefix bound to
+    the `namespace` TED namespace. Objects are kept so each xpath is only compiled once for each
+    namespace
+    '''
+
+    return etree.XPath(xpath, namespaces={'def': namespace} if namespace else None)
+
+
+def evaluate(element, xpath, n_s):
+    '''
+    Method returns the result of the `xpath` string evaluated on `element`, like
+    `element.xpath(xpath, namespaces=n_s)`, using the precompiled xpath for the 'def' namespace in
+    the `n_s` namespace dictionary
+    '''
+
+    return compile_xpath(xpath, (n_s or {}).get('def'))(element)
@@ -2,38 +2,78 @@
 Defines xpaths used to grab data out of F03_2014 (Contract Award Notice) TED export xml files
 
 Xpaths defined below use a 'def' namespace. The default namespace used by TED is None, but this
-breaks `lxml.xpath` so we change the None namespace to 'def' using `helpers.create_namespaces_dict`
+breaks `lxml.xpath` so we change the None namespace to 'def' using `parsing.create_namespaces_dict`
 '''
 
 
+import functools
+import re
+import types
+
+
+# TED_EXPORT/@VERSION format, e.g. 'R2.0.9.S03.E01'
+SCHEMA_VERSION_RE = re.compile(r'^R(\d+)\.(\d+)\.(\d+)\.S(\d+)\.E(\d+)$')
+
+
 def lot_schema_specific_xpaths(schema_version):
     '''
-    Method returns a dictionary of the correct lot xpaths for the input `schema_version`
+    Method returns a read-only dictionary of the correct lot xpaths for the input `schema_version`
+    from `LOT_SCHEMA_SPECIFIC_XPATHS`, using `get_compatible_schema_version`
+
+    Raises `ValueError` if there are no compatible lot xpaths for `schema_version`
+    '''
+
+    compatible_version = get_compatible_schema_version(schema_version)
+
+    if compatible_version is None:
+        raise ValueError('No lot xpaths for XML schema version "{}".'.format(schema_version))
+
+    return LOT_SCHEMA_SPECIFIC_XPATHS[compatible_version]
+
+
+@functools.lru_cache(maxsize=None)
+def get_compatible_schema_version(schema_version):
+    '''
+    Method returns the version in `LOT_SCHEMA_SPECIFIC_XPATHS` whose lot xpaths should be used for
+    the input `schema_version`, e.g. 'R2.0.9.S03.E01', or None if there isn't one:
+
+     * `schema_version` itself if it is registered
+     * Otherwise the newest registered version of the same release, e.g. R2.0.9, that is older
+       than `schema_version`, as a new edition keeps the paths of the one before it
+     * Otherwise the oldest registered version of the same release
+
+    Results are kept so each version is only looked up once
     '''
 
-    if schema_version == 'R2.0.9.S02.E01':
-        xpath_dict = {
-            'F03_LOT_AWARDED_TO_GROUP': F03_LOT_AWARDED_TO_GROUP_R2_0_9_S02_E01,
-            'F03_LOT_CONTRACTOR_COUNTRY': F03_LOT_CONTRACTOR_COUNTRY_R2_0_9_S02_E01,
-            'F03_LOT_CONTRACTOR_NAME': F03_LOT_CONTRACTOR_NAME_R2_0_9_S02_E01,
-            'F03_LOT_VAL_TOTAL': F03_LOT_VAL_TOTAL_R2_0_9_S02_E01,
-            'F03_LOT_VAL_TOTAL_CURRENCY': F03_LOT_VAL_TOTAL_CURRENCY_R2_0_9_S02_E01,
-            'F03_LOT_VAL_EST_TOTAL': F03_LOT_VAL_EST_TOTAL_R2_0_9_S02_E01,
-            'F03_LOT_VAL_EST_CURRENCY': F03_LOT_VAL_EST_CURRENCY_R2_0_9_S02_E01
-        }
-
-    elif schema_version == 'R2.0.9.S03.E01':
-        xpath_dict = {
-            'F03_LOT_AWARDED_TO_GROUP': F03_LOT_AWARDED_TO_GROUP_R2_0_9_S03_E01,
-            'F03_LOT_CONTRACTOR_COUNTRY': F03_LOT_CONTRACTOR_COUNTRY_R2_0_9_S03_E01,
-            'F03_LOT_CONTRACTOR_NAME': F03_LOT_CONTRACTOR_NAME_R2_0_9_S03_E01,
-            'F03_LOT_VAL_TOTAL': F03_LOT_VAL_TOTAL_R2_0_9_S03_E01,
-            'F03_LOT_VAL_TOTAL_CURRENCY': F03_LOT_VAL_TOTAL_CURRENCY_R2_0_9_S03_E01,
-            'F03_LOT_VAL_EST_TOTAL': F03_LOT_VAL_EST_TOTAL_R2_0_9_S03_E01,
-            'F03_LOT_VAL_EST_CURRENCY': F03_LOT_VAL_EST_CURRENCY_R2_0_9_S03_E01
-        }
-
-    return xpath_dict
+    version = parse_schema_version(schema_version)
+
+    if version is None:
+        return None
+
+    same_release = sorted(
+        (parse_schema_version(registered_version), registered_version)
+        for registered_version in LOT_SCHEMA_SPECIFIC_XPATHS
+        if parse_schema_version(registered_version)[:3] == version[:3]
+    )
+
+    if not same_release:
+        return None
+
+    older = [registered_version for parsed, registered_version in same_release
+             if parsed <= version]
+
+    return older[-1] if older else same_release[0][1]
+
+
+def parse_schema_version(schema_version):
+    '''
+    Method returns a tuple of the release, schema and edition numbers of a TED_EXPORT/@VERSION
+    string, e.g. (2, 0, 9, 3, 1) for 'R2.0.9.S03.E01', or None if it isn't in this format
+    '''
+
+    match = SCHEMA_VERSION_RE.match(schema_version or '')
+
+    return tuple(int(number) for number in match.groups()) if match else None
 
 
 # TENDER xpaths
@@ -123,3 +163,29 @@ F03_LOT_VAL_RANGE_LOW = 'string(def:AWARDED_CONTRACT/def:VALUES/def:VAL_RANGE_TO
 
 F03_LOT_VAL_RANGE_HIGH = 'string(def:AWARDED_CONTRACT/def:VALUES/def:VAL_RANGE_TOTAL/def:HIGH' + \
                          '/text())'
+
+
+# Lot xpaths local to `AWARD_CONTRACT` that differ between schema versions, keyed by the
+# TED_EXPORT/@VERSION they are used from. Versions that aren't listed use the xpaths of the
+# nearest compatible version, see `get_compatible_schema_version`, so a new schema version only
+# needs adding here if its paths change
+LOT_SCHEMA_SPECIFIC_XPATHS = {
+    'R2.0.9.S02.E01': types.MappingProxyType({
+        'F03_LOT_AWARDED_TO_GROUP': F03_LOT_AWARDED_TO_GROUP_R2_0_9_S02_E01,
+        'F03_LOT_CONTRACTOR_COUNTRY': F03_LOT_CONTRACTOR_COUNTRY_R2_0_9_S02_E01,
+        'F03_LOT_CONTRACTOR_NAME': F03_LOT_CONTRACTOR_NAME_R2_0_9_S02_E01,
+        'F03_LOT_VAL_TOTAL': F03_LOT_VAL_TOTAL_R2_0_9_S02_E01,
+        'F03_LOT_VAL_TOTAL_CURRENCY': F03_LOT_VAL_TOTAL_CURRENCY_R2_0_9_S02_E01,
+        'F03_LOT_VAL_EST_TOTAL': F03_LOT_VAL_EST_TOTAL_R2_0_9_S02_E01,
+        'F03_LOT_VAL_EST_CURRENCY': F03_LOT_VAL_EST_CURRENCY_R2_0_9_S02_E01
+    }),
+    'R2.0.9.S03.E01': types.MappingProxyType({
+        'F03_LOT_AWARDED_TO_GROUP': F03_LOT_AWARDED_TO_GROUP_R2_0_9_S03_E01,
+        'F03_LOT_CONTRACTOR_COUNTRY': F03_LOT_CONTRACTOR_COUNTRY_R2_0_9_S03_E01,
+        'F03_LOT_CONTRACTOR_NAME': F03_LOT_CONTRACTOR_NAME_R2_0_9_S03_E01,
+        'F03_LOT_VAL_TOTAL': F03_LOT_VAL_TOTAL_R2_0_9_S03_E01,
+        'F03_LOT_VAL_TOTAL_CURRENCY': F03_LOT_VAL_TOTAL_CURRENCY_R2_0_9_S03_E01,
+        'F03_LOT_VAL_EST_TOTAL': F03_LOT_VAL_EST_TOTAL_R2_0_9_S03_E01,
+        'F03_LOT_VAL_EST_CURRENCY': F03_LOT_VAL_EST_CURRENCY_R2_0_9_S03_E01
+    })
+}